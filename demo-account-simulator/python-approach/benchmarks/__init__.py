@@ -0,0 +1,8 @@
+"""
+Simulator and DB write benchmarks (run from python-approach/):
+
+    python -m benchmarks --preset quick
+    python -m benchmarks --db-url postgresql+asyncpg://localhost/demo --create-schema --suite db
+
+See benchmarks/run.py for the presets, baselines and regression check.
+"""
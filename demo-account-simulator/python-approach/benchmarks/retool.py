@@ -0,0 +1,31 @@
+"""
+Load the functions / classes of a Retool Python block without running its entry point.
+Blocks are scripts with a top-level `return` (the Retool entry point), so they cannot be imported;
+this keeps only imports, UPPER_CASE constants, functions and classes from the parsed module.
+"""
+import ast
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict
+
+RETOOL_BLOCKS_DIR = Path(__file__).resolve().parents[2] / "retool-blocks"
+
+
+def _is_constant(node: ast.stmt) -> bool:
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target] if isinstance(node, ast.AnnAssign) else []
+    return bool(targets) and all(isinstance(t, ast.Name) and t.id.isupper() for t in targets)
+
+
+def _keep(node: ast.stmt) -> bool:
+    return isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)) or _is_constant(node)
+
+
+@lru_cache(maxsize=None)
+def load_block(name: str) -> Dict[str, Any]:
+    """Namespace of retool-blocks/<name>.py (definitions only), e.g. load_block("simulate_stocks")["simulate_one_product"]."""
+    path = RETOOL_BLOCKS_DIR / f"{name}.py"
+    tree = ast.parse(path.read_text(), filename=str(path))
+    module = ast.Module(body=[node for node in tree.body if _keep(node)], type_ignores=[])
+    namespace: Dict[str, Any] = {"__name__": f"retool_block_{name}", "__file__": str(path)}
+    exec(compile(module, str(path), "exec"), namespace)
+    return namespace
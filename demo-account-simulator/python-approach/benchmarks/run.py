@@ -0,0 +1,231 @@
+"""
+Benchmark runner: scaling curves along products, horizon days and lead time (open orders), one axis at a
+time from a base point, plus every archetype at the base point. Reports seconds, µs per product-day and
+peak traced memory per case, the knee of each curve, and the ratio to the stored baseline.
+
+    python -m benchmarks                                  # default preset, compare to baselines.json
+    python -m benchmarks --preset quick --save-baseline   # refresh the stored baselines
+    python -m benchmarks --preset full --check            # exit 1 on a regression
+    python -m benchmarks --db-url postgresql://localhost/demo --create-schema --suite db
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.workloads import ARCHETYPE_LABELS, SIM_SUITES, Workload, case_id, create_schema, db_write
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+# A case regresses when its µs/product-day or peak memory exceeds the baseline by more than this fraction.
+DEFAULT_TOLERANCE = 0.5
+# A curve's knee: the first point whose µs/product-day is this many times the curve's first point.
+KNEE_FACTOR = 1.5
+# Extra timed runs (best one counts) while the case's total time stays under this many seconds.
+REPEAT_BUDGET_SECONDS = 1.0
+MAX_REPEATS = 5
+
+@dataclass(frozen=True)
+class Preset:
+    products: Tuple[int, ...]
+    days: Tuple[int, ...]
+    lead_times: Tuple[int, ...]
+    db_products: Tuple[int, ...]
+    archetypes: bool = True
+    # Every curve passes through this point; the archetype cases run at it
+    base: Tuple[Tuple[str, int], ...] = (("products", 32), ("days", 365), ("lead_time", 14))
+
+
+PRESETS = {
+    "quick": Preset(products=(32, 320), days=(365, 730), lead_times=(14, 60), db_products=(32,), archetypes=False),
+    "default": Preset(products=(32, 100, 1000), days=(365, 730, 1825), lead_times=(7, 14, 30, 90), db_products=(32, 320)),
+    "full": Preset(
+        products=(32, 100, 1000, 10000), days=(365, 730, 1095, 1825), lead_times=(7, 14, 30, 60, 90),
+        db_products=(32, 320, 1000, 3200),
+    ),
+}
+
+
+@dataclass
+class Measurement:
+    case: str
+    suite: str
+    axis: str  # products / days / lead_time / archetype
+    products: int
+    days: int
+    lead_time: int
+    seconds: float
+    us_per_product_day: float
+    peak_mb: Optional[float]
+    extra: Dict[str, Any] = field(default_factory=dict)
+    baseline_ratio: Optional[float] = None
+    regressed: bool = False
+
+
+def measure(workload: Workload, memory: bool = True) -> Tuple[float, Optional[float], Dict[str, Any]]:
+    """(best seconds, peak traced MB, extra stats). Memory is traced in a separate, untimed run."""
+    gc.collect()
+    best, total, runs, extra = float("inf"), 0.0, 0, {}
+    while runs < MAX_REPEATS and (runs == 0 or total < REPEAT_BUDGET_SECONDS):
+        started = time.perf_counter()
+        extra = workload() or {}
+        elapsed = time.perf_counter() - started
+        best, total, runs = min(best, elapsed), total + elapsed, runs + 1
+    peak_mb = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            workload()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return best, peak_mb, extra
+
+
+def plan(preset: Preset, suites: List[str]) -> List[Tuple[str, str, int, int, int, Optional[str]]]:
+    """(suite, axis, products, days, lead_time, archetype) per case: one curve per axis through preset.base."""
+    base = dict(preset.base)
+    cases = []
+    for suite in suites:
+        axes = [("products", preset.db_products if suite == "db" else preset.products)]
+        if suite != "db":
+            axes += [("days", preset.days), ("lead_time", preset.lead_times)]
+        for axis, values in axes:
+            for value in values:
+                point = dict(base, **{axis: value})
+                cases.append((suite, axis, point["products"], point["days"], point["lead_time"], None))
+        if preset.archetypes and suite != "db":
+            for archetype in ARCHETYPE_LABELS:
+                cases.append((suite, "archetype", base["products"], base["days"], base["lead_time"], archetype))
+    return cases
+
+
+def run_cases(preset: Preset, suites: List[str], db_url: Optional[str] = None, memory: bool = True) -> List[Measurement]:
+    results: List[Measurement] = []
+    measured: Dict[str, Measurement] = {}
+    for suite, axis, products, days, lead_time, archetype in plan(preset, suites):
+        case = case_id(suite, products, days, lead_time, archetype)
+        if case in measured:  # The base point sits on every curve; measure it once
+            results.append(replace(measured[case], axis=axis))
+            continue
+        if suite == "db":
+            workload = db_write(db_url, products, days)
+        else:
+            workload = SIM_SUITES[suite](products, days, lead_time, archetype)
+        seconds, peak_mb, extra = measure(workload, memory=memory)
+        measured[case] = Measurement(
+            case=case, suite=suite, axis=axis, products=products, days=days, lead_time=lead_time,
+            seconds=round(seconds, 4), us_per_product_day=round(seconds / (products * days) * 1e6, 3),
+            peak_mb=round(peak_mb, 2) if peak_mb is not None else None, extra=extra,
+        )
+        results.append(measured[case])
+        print(_format(measured[case]), flush=True)
+    return results
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> Dict[str, Dict[str, Any]]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text()).get("cases", {})
+
+
+def save_baselines(results: List[Measurement], path: Path = BASELINES_PATH) -> None:
+    existing = load_baselines(path)
+    existing.update({r.case: {"us_per_product_day": r.us_per_product_day, "peak_mb": r.peak_mb} for r in results})
+    path.write_text(json.dumps({
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "cases": dict(sorted(existing.items())),
+    }, indent=2) + "\n")
+
+
+def compare(results: List[Measurement], baselines: Dict[str, Dict[str, Any]], tolerance: float = DEFAULT_TOLERANCE) -> List[Measurement]:
+    """Annotate results with the time ratio to their baseline. Returns the regressed ones."""
+    regressed = []
+    for r in results:
+        base = baselines.get(r.case)
+        if not base:
+            continue
+        r.baseline_ratio = round(r.us_per_product_day / base["us_per_product_day"], 2) if base["us_per_product_day"] else None
+        slower = r.baseline_ratio is not None and r.baseline_ratio > 1 + tolerance
+        bigger = r.peak_mb is not None and base.get("peak_mb") and r.peak_mb > base["peak_mb"] * (1 + tolerance)
+        r.regressed = bool(slower or bigger)
+        if r.regressed:
+            regressed.append(r)
+    return regressed
+
+
+def knees(results: List[Measurement]) -> Dict[Tuple[str, str], Optional[int]]:
+    """(suite, axis) -> first axis value whose µs/product-day is KNEE_FACTOR × the curve's first point (None: linear)."""
+    curves: Dict[Tuple[str, str], List[Measurement]] = {}
+    for r in results:
+        if r.axis != "archetype":
+            curves.setdefault((r.suite, r.axis), []).append(r)
+    out = {}
+    for key, points in curves.items():
+        points.sort(key=lambda r: getattr(r, key[1]))
+        first = points[0].us_per_product_day
+        out[key] = next((getattr(r, key[1]) for r in points[1:] if first and r.us_per_product_day > first * KNEE_FACTOR), None)
+    return out
+
+
+def _format(r: Measurement) -> str:
+    peak = f"{r.peak_mb:8.1f} MB" if r.peak_mb is not None else "       - MB"
+    ratio = f"  x{r.baseline_ratio:.2f} vs baseline" if r.baseline_ratio is not None else ""
+    flag = "  REGRESSION" if r.regressed else ""
+    extra = "  " + " ".join(f"{k}={v}" for k, v in r.extra.items()) if r.extra else ""
+    return f"{r.case:<90} {r.seconds:9.4f}s {r.us_per_product_day:9.3f} µs/product-day {peak}{ratio}{flag}{extra}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="default")
+    parser.add_argument("--suite", action="append", choices=sorted(SIM_SUITES) + ["db"],
+                        help="Suites to run (repeatable). Default: all simulator suites, plus db when a URL is set.")
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Database for the db suite (local PostgreSQL; sqlite+aiosqlite works as a smoke test).")
+    parser.add_argument("--create-schema", action="store_true", help="CREATE TABLE IF NOT EXISTS stocks before the db suite.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced-memory run of each case.")
+    parser.add_argument("--baselines", type=Path, default=BASELINES_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baselines.")
+    parser.add_argument("--check", action="store_true", help="Exit 1 when a case regressed beyond --tolerance.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--json", type=Path, help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    suites = args.suite or sorted(SIM_SUITES) + (["db"] if args.db_url else [])
+    if "db" in suites and not args.db_url:
+        parser.error("the db suite needs --db-url or BENCH_DATABASE_URL")
+    if "db" in suites and args.create_schema:
+        asyncio.run(create_schema(args.db_url))
+
+    results = run_cases(PRESETS[args.preset], suites, db_url=args.db_url, memory=not args.no_memory)
+    regressed = compare(results, load_baselines(args.baselines), args.tolerance)
+
+    print("\nScaling knees (µs/product-day above %.1fx the curve's first point):" % KNEE_FACTOR)
+    for (suite, axis), knee in sorted(knees(results).items()):
+        print(f"  {suite:<42} {axis:<10} {'none (linear)' if knee is None else f'{axis}={knee}'}")
+    if any(r.baseline_ratio is not None for r in results):
+        print(f"\nBaseline comparison (tolerance {args.tolerance:.0%}): {len(regressed)} regression(s)")
+        for r in regressed:
+            print("  " + _format(r))
+
+    if args.json:
+        args.json.write_text(json.dumps([asdict(r) for r in results], indent=2) + "\n")
+    if args.save_baseline:
+        save_baselines(results, args.baselines)
+        print(f"\nSaved {len({r.case for r in results})} baselines to {args.baselines}")
+    return 1 if args.check and regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
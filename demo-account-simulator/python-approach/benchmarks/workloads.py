@@ -0,0 +1,187 @@
+"""
+Benchmark workloads. Each factory does its setup (products, sales, calendars, rows) up front and returns
+a zero-argument callable that runs only the measured work; it returns a dict of extra stats (or None).
+Products cycle through ARCHETYPE_LABELS so every archetype is exercised.
+"""
+import asyncio
+import random
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.retool import load_block
+from src.async_database import AsyncDatabaseManager
+from src.simulation import SupplyChainSimulator
+
+Workload = Callable[[], Optional[Dict[str, Any]]]
+
+BENCH_WEBSHOP_ID = 999999  # DB suite writes here; never a real shop
+BENCH_START = date(2024, 1, 1)
+# Distinct sales histories shared by the Retool products (keeps 10k-product setups small).
+SALES_SERIES = 32
+
+# One scenario label per canonical archetype (src/scenarios.py ARCHETYPE_RULES + the "stable" default).
+ARCHETYPE_LABELS: Dict[str, str] = {
+    "stable": "Stable Fast",
+    "stockout_prone": "Stockout Prone",
+    "seasonal_summer": "Seasonal Summer",
+    "seasonal_winter": "Seasonal Winter",
+    "trend_down": "Negative Trend",
+    "trend_up": "Positive Trend",
+    "step_up": "Step Change Up",
+    "step_down": "Step Change Down",
+    "new_launch": "New Launch",
+    "obsolete": "Obsolete",
+    "lumpy": "Lumpy",
+    "outlier": "Outlier",
+    "container_filler": "Container Filler",
+    "micro_seasonal": "Micro-Seasonality",
+}
+
+
+def _labels(products: int, archetype: Optional[str]) -> List[str]:
+    if archetype is not None:
+        return [ARCHETYPE_LABELS[archetype]] * products
+    labels = list(ARCHETYPE_LABELS.values())
+    return [labels[i % len(labels)] for i in range(products)]
+
+
+def python_simulator(products: int, days: int, lead_time: int, archetype: Optional[str] = None, rows: bool = False) -> Workload:
+    """SupplyChainSimulator over `products` products; rows=True also materializes the row dicts (simulate_product)."""
+    simulator = SupplyChainSimulator(history_days=days, start_date=datetime.combine(BENCH_START, datetime.min.time()), seed=0)
+    tasks = [
+        ({
+            "id": i + 1, "sku": f"BENCH-{i + 1}", "supplier_id": 1, "shop_id": BENCH_WEBSHOP_ID,
+            "selling_price": 20.0, "purchase_price": 8.0, "current_stock_on_hand": 100, "product_delivery_time": lead_time,
+        }, label)
+        for i, label in enumerate(_labels(products, archetype))
+    ]
+
+    def run():
+        if rows:
+            for product, label in tasks:
+                simulator.simulate_product(product, label)
+            return None
+        open_order_days = 0
+        for product, label in tasks:
+            result = simulator.simulate_product_columnar(product, label)
+            open_order_days += int(np.sum(np.minimum(result.bo_delivery_day, days) - result.bo_day))
+        return {"avg_open_orders": round(open_order_days / (products * days), 2)}
+
+    return run
+
+
+def _retool_products(products: int, lead_time: int, archetype: Optional[str]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "product_id": i + 1, "product_uuid": f"bench-{i + 1}", "webshop_uuid": "bench-shop",
+            "product_name": f"Bench {i + 1} ({label})", "lead_time": lead_time, "reorder_period": 30,
+            "starting_stock": 100, "purchase_price": 8.0, "supplier_id": 1, "supplier_uuid": "bench-supplier",
+        }
+        for i, label in enumerate(_labels(products, archetype))
+    ]
+
+
+def _shared_sales(block: Dict[str, Any], product_ids: List[int], days: int):
+    """Block DailyMatrix where product i reads sales history i % SALES_SERIES."""
+    rng = random.Random(0)
+    entries = [
+        (s, BENCH_START + timedelta(days=d), rng.randint(1, 12))
+        for s in range(SALES_SERIES) for d in range(days) if rng.random() < 0.8
+    ]
+    sales = block["DailyMatrix"](entries, BENCH_START, days)
+    series_rows = [sales.row_of[s] for s in range(SALES_SERIES)]
+    sales.row_of = {p: series_rows[i % SALES_SERIES] for i, p in enumerate(product_ids)}
+    return sales
+
+
+def retool_stocks(block_name: str, products: int, days: int, lead_time: int, archetype: Optional[str] = None) -> Workload:
+    """simulate_one_product of retool-blocks/simulate_stocks.py or simulate_stocks_with_deliveries.py."""
+    block = load_block(block_name)
+    rows = _retool_products(products, lead_time, archetype)
+    calendar = block["SimulationCalendar"](BENCH_START, days)
+    sales = _shared_sales(block, [r["product_id"] for r in rows], days)
+    simulate_one_product = block["simulate_one_product"]
+    if block_name == "simulate_stocks_with_deliveries":
+        deliveries = block["DailyMatrix"]([], BENCH_START, days)
+
+        def run():
+            for row in rows:
+                simulate_one_product(row, sales, deliveries, calendar)
+    else:
+        def run():
+            for row in rows:
+                simulate_one_product(row, sales, calendar)
+    return run
+
+
+DB_SCHEMAS = {
+    "postgresql": (
+        "CREATE TABLE IF NOT EXISTS stocks (id bigserial PRIMARY KEY, product_id integer, webshop_id integer, "
+        "on_hand integer, date timestamp, deleted_at timestamp, UNIQUE (product_id, date))"
+    ),
+    "sqlite": (
+        "CREATE TABLE IF NOT EXISTS stocks (id INTEGER PRIMARY KEY, product_id INTEGER, webshop_id INTEGER, "
+        "on_hand INTEGER, date TEXT, deleted_at TEXT, UNIQUE (product_id, date))"
+    ),
+}
+
+
+async def create_schema(url: str) -> None:
+    from sqlalchemy import text
+
+    db = AsyncDatabaseManager(url)
+    try:
+        async with db.engine.begin() as conn:
+            await conn.execute(text(DB_SCHEMAS[db.engine.dialect.name]))
+    finally:
+        await db.dispose()
+
+
+def db_write(url: str, products: int, days: int) -> Workload:
+    """AsyncDatabaseManager.wipe_and_insert_stocks of products × days stock rows (COPY on PostgreSQL/asyncpg), in
+    write_mode "wipe": every run rewrites the same rows, which a delta write would skip.
+    Other dialects (sqlite smoke runs) time bulk_load_stocks: the wipe SQL is PostgreSQL-only.
+    Product ids are offset so they cannot collide with real products under the (product_id, date) constraint."""
+    rows = [
+        {"product_id": 900_000_000 + p, "webshop_id": BENCH_WEBSHOP_ID, "on_hand": (p * 7 + d) % 50,
+         "date": (BENCH_START + timedelta(days=d)).isoformat()}
+        for p in range(products) for d in range(days)
+    ]
+
+    async def write():
+        # Fresh engine per run: asyncio.run() gives every run its own event loop
+        db = AsyncDatabaseManager(url, write_mode="wipe")
+        try:
+            if db.engine.dialect.name == "postgresql":
+                return await db.wipe_and_insert_stocks(BENCH_WEBSHOP_ID, rows)
+            return await db.bulk_load_stocks(rows)
+        finally:
+            await db.dispose()
+
+    def run():
+        stats = asyncio.run(write()) or {}
+        return {"method": stats.get("method"), "rows": stats.get("rows", len(rows)), "rows_per_sec": stats.get("rows_per_sec")}
+
+    return run
+
+
+# suite name -> factory(products, days, lead_time, archetype) (DB suite is built separately: it needs a URL)
+SIM_SUITES: Dict[str, Callable[..., Workload]] = {
+    "python.columnar": lambda p, d, l, a=None: python_simulator(p, d, l, a),
+    "python.rows": lambda p, d, l, a=None: python_simulator(p, d, l, a, rows=True),
+    "retool.simulate_stocks": lambda p, d, l, a=None: retool_stocks("simulate_stocks", p, d, l, a),
+    "retool.simulate_stocks_with_deliveries": lambda p, d, l, a=None: retool_stocks("simulate_stocks_with_deliveries", p, d, l, a),
+}
+
+
+def case_id(suite: str, products: int, days: int, lead_time: int, archetype: Optional[str] = None) -> str:
+    if archetype is not None:
+        return f"{suite}[archetype={archetype},products={products},days={days},lead={lead_time}]"
+    return f"{suite}[products={products},days={days},lead={lead_time}]"
+
+
+def parse_case(case: str) -> Tuple[str, Dict[str, str]]:
+    suite, _, params = case.partition("[")
+    return suite, dict(kv.split("=", 1) for kv in params.rstrip("]").split(",") if kv)
@@ -0,0 +1,412 @@
+"""
+Async database layer for the FastAPI endpoints: pooled asyncpg engine with pre-ping, so wipe/insert
+and maintenance never block the uvicorn event loop (health checks keep answering during /simulate).
+SQL is shared with the sync DatabaseManager in src/database.py.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, inspect, text
+
+from src import metrics
+from src.checkpoint import ProductCheckpoint
+from src.date_shift import ChunkedDateShifter
+from src.generations import StockGenerations
+from src.database import (
+    ADVANCE_OFFSET_SQL,
+    CHECKPOINT_SCHEMA_SQL,
+    CLEAR_OFFSET_SQL,
+    COPY_CHUNK_SIZE,
+    CREATE_STAGE_SQL,
+    DATABASE_URL,
+    DATE_OFFSET_SCHEMA_QUERIES,
+    DATE_OFFSET_TABLE,
+    LATEST_STOCK_DATE_SQL,
+    LOAD_CHECKPOINTS_SQL,
+    MAINTENANCE_SHIFT_QUERIES,
+    MERGE_STAGE_SQL,
+    READ_SHOP_STOCKS_SQL,
+    READ_STOCK_SERIES_SQL,
+    SEED_OFFSET_SQL,
+    SHOP_OFFSET_SQL,
+    SOFT_DELETE_STOCK_ROW_SQL,
+    STOCK_COLUMNS,
+    STOCK_FINGERPRINTS_SQL,
+    STOCK_WRITE_MODE,
+    UPSERT_CHECKPOINT_SQL,
+    UPSERT_STOCK_SQL,
+    WIPE_CHECKPOINTS_SQL,
+    WIPE_STOCKS_SQL,
+    load_stats,
+    unique_stock_rows,
+)
+from src.stock_delta import StockDelta, StockSeries, changed_products, diff_stocks, group_series, series_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing (per Cloud Run instance). Keep pool_size + max_overflow under the DB's connection budget.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Products per range read of live stock series (bounds the IN list / bind parameters).
+DELTA_READ_CHUNK = 1000
+
+
+def to_async_url(url: str) -> str:
+    """postgresql://... -> postgresql+asyncpg://... (other URLs are returned unchanged)."""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+def _copy_records(stocks_data: List[Dict[str, Any]]):
+    """Stock rows as typed tuples for asyncpg's binary COPY (date must be a datetime)."""
+    for row in stocks_data:
+        d = row["date"]
+        if not isinstance(d, datetime):
+            d = datetime.fromisoformat(str(d))
+        yield (int(row["product_id"]), int(row["webshop_id"]), int(row["on_hand"]), d)
+
+
+class AsyncDatabaseManager:
+    def __init__(self, database_url: Optional[str] = None, write_mode: str = STOCK_WRITE_MODE):
+        self._offset_schema_ready = False
+        self.write_mode = write_mode
+        self._engine = None
+        self._generations = None
+        self._background = set()
+        self.database_url = database_url or DATABASE_URL
+        if not self.database_url:
+            print("Warning: DATABASE_URL not set. Database operations will fail.")
+
+    @property
+    def engine(self):
+        """Created on first use, so importing the app (cold start) skips the SQLAlchemy async/ORM stack."""
+        if self._engine is None and self.database_url:
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            url = to_async_url(self.database_url)
+            pool_args = {}
+            if not url.startswith("sqlite"):
+                pool_args = {
+                    "pool_size": DB_POOL_SIZE,
+                    "max_overflow": DB_MAX_OVERFLOW,
+                    "pool_timeout": DB_POOL_TIMEOUT,
+                    "pool_recycle": DB_POOL_RECYCLE,
+                }
+            self._engine = create_async_engine(url, pool_pre_ping=True, **pool_args)
+        return self._engine
+
+    @property
+    def supports_copy(self) -> bool:
+        """True when the engine is PostgreSQL via asyncpg (binary COPY available)."""
+        return (
+            self.engine is not None
+            and self.engine.dialect.name == "postgresql"
+            and self.engine.driver == "asyncpg"
+        )
+
+    @property
+    def generations(self) -> StockGenerations:
+        if self._generations is None:
+            self._generations = StockGenerations(self.engine)
+        return self._generations
+
+    async def dispose(self) -> None:
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self._engine is not None:
+            await self._engine.dispose()
+
+    @asynccontextmanager
+    async def _transaction(self):
+        """engine.begin(), recording how long the pool checkout took (DB_POOL_WAIT_SECONDS)."""
+        started = time.perf_counter()
+        async with self.engine.connect() as conn:
+            metrics.DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+            async with conn.begin():
+                yield conn
+
+    async def check_connection(self) -> bool:
+        """Return True if database is configured and reachable."""
+        if not self.engine:
+            return False
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    async def _copy_stocks(self, conn, stocks_data: List[Dict[str, Any]], chunk_size: int) -> None:
+        """COPY into a temp staging table in chunks, then one set-based upsert. Caller's transaction."""
+        await conn.execute(text(CREATE_STAGE_SQL))
+        raw = await conn.get_raw_connection()
+        driver_conn = raw.driver_connection
+        stocks_data = unique_stock_rows(stocks_data)
+        for i in range(0, len(stocks_data), chunk_size):
+            await driver_conn.copy_records_to_table(
+                "stocks_stage",
+                records=list(_copy_records(stocks_data[i : i + chunk_size])),
+                columns=list(STOCK_COLUMNS),
+            )
+        await conn.execute(text(MERGE_STAGE_SQL))
+
+    async def _load_stocks(self, conn, stocks_data: List[Dict[str, Any]], chunk_size: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        with metrics.timed(metrics.DB_PHASE_SECONDS, operation="insert"):
+            if self.supports_copy:
+                method = "copy"
+                await self._copy_stocks(conn, stocks_data, chunk_size)
+            else:
+                method = "executemany"
+                await conn.execute(text(UPSERT_STOCK_SQL), stocks_data)
+        return load_stats(method, len(stocks_data), time.perf_counter() - started)
+
+    async def _live_series(self, conn, webshop_id: int, product_ids: Optional[List[int]] = None) -> StockSeries:
+        """Live stock rows of the shop (or of `product_ids` only), grouped per product."""
+        if product_ids is None:
+            result = await conn.execute(text(READ_SHOP_STOCKS_SQL), {"shop_id": webshop_id})
+            return group_series(result.mappings())
+        query = text(READ_STOCK_SERIES_SQL).bindparams(bindparam("product_ids", expanding=True))
+        series: StockSeries = {}
+        for i in range(0, len(product_ids), DELTA_READ_CHUNK):
+            result = await conn.execute(query, {"shop_id": webshop_id, "product_ids": product_ids[i : i + DELTA_READ_CHUNK]})
+            series.update(group_series(result.mappings()))
+        return series
+
+    async def _stock_delta(self, conn, webshop_id: int, stocks_data: List[Dict[str, Any]]) -> StockDelta:
+        """Diff the new stock rows against the live ones: fingerprints first (in PostgreSQL), rows for changed products."""
+        new = group_series(stocks_data)
+        if self.engine.dialect.name == "postgresql":
+            fingerprints = dict((await conn.execute(text(STOCK_FINGERPRINTS_SQL), {"shop_id": webshop_id})).all())
+            products = changed_products(new, fingerprints)
+            live = await self._live_series(conn, webshop_id, products) if products else {}
+        else:
+            live = await self._live_series(conn, webshop_id)
+            products = changed_products(new, {p: series_fingerprint(points) for p, points in live.items()})
+        return diff_stocks(webshop_id, new, live, products)
+
+    async def _replace_stocks(
+        self, conn, shops: Sequence[Tuple[int, List[Dict[str, Any]]]], chunk_size: int
+    ) -> Dict[str, Any]:
+        """Make each shop's live stock rows exactly the given ones, in the caller's transaction. "wipe" soft-deletes
+        and reloads everything; "delta" writes only changed rows. Returns load stats (+ the delta counts)."""
+        if self.write_mode == "wipe":
+            with metrics.timed(metrics.DB_PHASE_SECONDS, operation="wipe"):
+                await conn.execute(text(WIPE_STOCKS_SQL), [{"shop_id": webshop_id} for webshop_id, _ in shops])
+            all_stocks = [row for _, stocks_data in shops for row in stocks_data]
+            stats = await self._load_stocks(conn, all_stocks, chunk_size) if all_stocks else load_stats(None, 0, 0.0)
+            return dict(stats, write_mode="wipe")
+        with metrics.timed(metrics.DB_PHASE_SECONDS, operation="diff"):
+            deltas = [await self._stock_delta(conn, webshop_id, stocks_data) for webshop_id, stocks_data in shops]
+        upserts = [row for delta in deltas for row in delta.upserts]
+        deletes = [row for delta in deltas for row in delta.deletes]
+        stats = await self._load_stocks(conn, upserts, chunk_size) if upserts else load_stats(None, 0, 0.0)
+        if deletes:
+            with metrics.timed(metrics.DB_PHASE_SECONDS, operation="delete"):
+                await conn.execute(text(SOFT_DELETE_STOCK_ROW_SQL), deletes)
+        counts = [delta.to_dict() for delta in deltas]
+        return dict(stats, write_mode="delta", delta={key: sum(c[key] for c in counts) for key in counts[0]})
+
+    async def bulk_load_stocks(self, stocks_data: List[Dict[str, Any]], chunk_size: int = COPY_CHUNK_SIZE) -> Dict[str, Any]:
+        if not self.engine or not stocks_data:
+            return load_stats(None, 0, 0.0)
+        async with self._transaction() as conn:
+            return await self._load_stocks(conn, stocks_data, chunk_size)
+
+    async def wipe_and_insert_stocks(
+        self,
+        webshop_id: int,
+        stocks_data: List[Dict[str, Any]],
+        chunk_size: int = COPY_CHUNK_SIZE,
+        checkpoints: Optional[Sequence[ProductCheckpoint]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Replace the shop's stocks (write_mode: delta or wipe + insert) in a single transaction to avoid partial
+        state on failure. Returns load stats. With checkpoints, the shop's roll-forward checkpoints are replaced
+        in the same transaction."""
+        if not stocks_data:
+            return None
+        return await self.wipe_and_insert_shops([(webshop_id, stocks_data, checkpoints)], chunk_size)
+
+    async def wipe_and_insert_shops(
+        self,
+        shops: Sequence[Tuple[int, List[Dict[str, Any]], Optional[Sequence[ProductCheckpoint]]]],
+        chunk_size: int = COPY_CHUNK_SIZE,
+    ) -> Optional[Dict[str, Any]]:
+        """wipe_and_insert_stocks for several shops, given as (webshop_id, stocks_data, checkpoints), in one
+        transaction: one wipe statement batch (or every shop's delta) and a single bulk load of all rows.
+        Returns load stats."""
+        if not self.engine or not shops:
+            return None
+        if self.write_mode == "generation":
+            return await self._swap_in_shops(shops, chunk_size)
+        async with self._transaction() as conn:
+            stats = await self._replace_stocks(conn, [(webshop_id, stocks_data) for webshop_id, stocks_data, _ in shops], chunk_size)
+            await self._finish_creator(conn, shops)
+            return stats
+
+    async def _finish_creator(
+        self, conn, shops: Sequence[Tuple[int, List[Dict[str, Any]], Optional[Sequence[ProductCheckpoint]]]]
+    ) -> None:
+        """Creator bookkeeping in the write's transaction: reset date offsets, replace roll-forward checkpoints."""
+        for webshop_id, _, _ in shops:
+            await self._clear_date_offset(conn, webshop_id)
+        checkpointed = [(webshop_id, checkpoints) for webshop_id, _, checkpoints in shops if checkpoints is not None]
+        if checkpointed:
+            await conn.execute(text(CHECKPOINT_SCHEMA_SQL))
+            await conn.execute(text(WIPE_CHECKPOINTS_SQL), [{"shop_id": webshop_id} for webshop_id, _ in checkpointed])
+            for webshop_id, checkpoints in checkpointed:
+                await self._save_checkpoints(conn, webshop_id, checkpoints)
+
+    async def _swap_in_shops(
+        self,
+        shops: Sequence[Tuple[int, List[Dict[str, Any]], Optional[Sequence[ProductCheckpoint]]]],
+        chunk_size: int,
+    ) -> Dict[str, Any]:
+        """Generation mode: load each shop's rows under a new generation, then flip them all live in one
+        transaction (with the Creator bookkeeping). Old generations are dropped in the background."""
+        generations = await self.generations.begin([webshop_id for webshop_id, _, _ in shops])
+        try:
+            started = time.perf_counter()
+            method = None
+            with metrics.timed(metrics.DB_PHASE_SECONDS, operation="insert"):
+                for webshop_id, stocks_data, _ in shops:
+                    method = await self.generations.load(generations[webshop_id], stocks_data, chunk_size)
+            rows = sum(len(stocks_data) for _, stocks_data, _ in shops)
+            stats = load_stats(method, rows, time.perf_counter() - started)
+            with metrics.timed(metrics.DB_PHASE_SECONDS, operation="swap"):
+                async with self._transaction() as conn:
+                    await self.generations.swap(conn, generations)
+                    await self._finish_creator(conn, shops)
+        except Exception:
+            await self.generations.fail(generations)
+            raise
+        finally:
+            self._run_in_background(self.drop_retired_generations())
+        return dict(stats, write_mode="generation", generations=generations)
+
+    def _run_in_background(self, coro) -> None:
+        """Run after the response; dispose() waits for it."""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def drop_retired_generations(self) -> Optional[Dict[str, Any]]:
+        """Drop replaced / failed stock generations (generation mode). Errors are logged: the next swap retries."""
+        if not self.engine:
+            return None
+        try:
+            return await self.generations.drop_retired()
+        except Exception:
+            logger.exception("Dropping retired stock generations failed")
+            return None
+
+    async def append_stocks(
+        self,
+        webshop_id: int,
+        stocks_data: List[Dict[str, Any]],
+        checkpoints: Sequence[ProductCheckpoint],
+        chunk_size: int = COPY_CHUNK_SIZE,
+    ) -> Optional[Dict[str, Any]]:
+        """Roll-forward write: upsert the new days' stock rows and advance the checkpoints in one transaction."""
+        if not self.engine:
+            return None
+        async with self._transaction() as conn:
+            if self.write_mode == "generation":
+                started = time.perf_counter()
+                if stocks_data:
+                    await self.generations.append(conn, webshop_id, stocks_data)
+                stats = load_stats("executemany" if stocks_data else None, len(stocks_data), time.perf_counter() - started)
+            else:
+                stats = await self._load_stocks(conn, stocks_data, chunk_size) if stocks_data else load_stats(None, 0, 0.0)
+            await conn.execute(text(CHECKPOINT_SCHEMA_SQL))
+            await self._save_checkpoints(conn, webshop_id, checkpoints)
+            return stats
+
+    async def _save_checkpoints(self, conn, webshop_id: int, checkpoints: Sequence[ProductCheckpoint]) -> None:
+        if checkpoints:
+            await conn.execute(text(UPSERT_CHECKPOINT_SQL), [
+                {"webshop_id": webshop_id, "product_id": cp.product_id, "state": cp.to_json()} for cp in checkpoints
+            ])
+
+    async def load_checkpoints(self, webshop_id: int) -> List[ProductCheckpoint]:
+        """The shop's roll-forward checkpoints (empty before the first checkpointed /simulate)."""
+        if not self.engine:
+            return []
+        async with self._transaction() as conn:
+            await conn.execute(text(CHECKPOINT_SCHEMA_SQL))
+            rows = await conn.execute(text(LOAD_CHECKPOINTS_SQL), {"shop_id": webshop_id})
+            return [ProductCheckpoint.from_json(state) for (state,) in rows]
+
+    async def stock_position(self, webshop_id: int) -> Tuple[Optional[datetime], int]:
+        """(latest live stock date, offset-mode date offset in days) of the shop, for /roll-forward to tell
+        whether /maintain moved the history past its checkpoints."""
+        if not self.engine:
+            return None, 0
+        if self.write_mode == "generation":
+            await self.generations.ensure_schema()
+            query = LATEST_STOCK_DATE_SQL.format(table="stocks_live", live="")
+        else:
+            query = LATEST_STOCK_DATE_SQL.format(table="stocks", live=" AND deleted_at IS NULL")
+        async with self._transaction() as conn:
+            latest = (await conn.execute(text(query), {"shop_id": webshop_id})).scalar()
+            offset = 0
+            if await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(DATE_OFFSET_TABLE)):
+                offset = (await conn.execute(text(SHOP_OFFSET_SQL), {"shop_id": webshop_id})).scalar() or 0
+        if latest is not None and not isinstance(latest, datetime):
+            latest = datetime.fromisoformat(str(latest))
+        return latest, int(offset)
+
+    async def _clear_date_offset(self, conn, webshop_id: int) -> None:
+        """Reset offset-mode maintenance for the shop (no-op before offset mode was first used)."""
+        if await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(DATE_OFFSET_TABLE)):
+            await conn.execute(text(CLEAR_OFFSET_SQL), {"shop_id": webshop_id})
+
+    async def run_maintenance_shift(self, webshop_id: int) -> None:
+        """Shifts all dates forward by the lag between latest data and today. The rows are current afterwards,
+        so an offset left by offset-mode maintenance is dropped in the same transaction (as the Creator does)."""
+        if not self.engine:
+            return
+        async with self._transaction() as conn:
+            for q in MAINTENANCE_SHIFT_QUERIES:
+                await conn.execute(text(q), {"shop_id": webshop_id})
+            await self._clear_date_offset(conn, webshop_id)
+
+    async def ensure_date_offset_schema(self) -> None:
+        """Create demo_date_offsets and the *_shifted views once per manager (idempotent)."""
+        if not self.engine or self._offset_schema_ready:
+            return
+        async with self._transaction() as conn:
+            for q in DATE_OFFSET_SCHEMA_QUERIES:
+                await conn.execute(text(q))
+        self._offset_schema_ready = True
+
+    async def run_maintenance_offset(self, webshop_id: int) -> Optional[int]:
+        """Offset-mode Maintainer: advance the shop's date offset to today (single-row update).
+        Returns the offset in days, or None when the shop has no stock data to anchor on."""
+        if not self.engine:
+            return None
+        await self.ensure_date_offset_schema()
+        async with self._transaction() as conn:
+            offset = (await conn.execute(text(ADVANCE_OFFSET_SQL), {"shop_id": webshop_id})).scalar()
+            if offset is None:
+                offset = (await conn.execute(text(SEED_OFFSET_SQL), {"shop_id": webshop_id})).scalar()
+        return offset
+
+    async def run_maintenance_chunked(self, webshop_id: int) -> Optional[Dict[str, Any]]:
+        """Physically shift dates like run_maintenance_shift, but in committed key-range chunks with bounded
+        lock time; resumes an interrupted run. Returns rows / seconds / rows_per_sec per table."""
+        if not self.engine:
+            return None
+        # Dropped before the first chunk commits, so the *_shifted views never add the offset to shifted rows
+        async with self._transaction() as conn:
+            await self._clear_date_offset(conn, webshop_id)
+        return await ChunkedDateShifter(self.engine).run(webshop_id)
@@ -0,0 +1,46 @@
+"""
+Per-product simulation checkpoints: the state at the end of a run (on-hand, pending deliveries,
+stockout counter, RNG state), so /roll-forward can simulate only the days since the last run
+instead of regenerating the whole history. Stored as JSON in demo_product_checkpoints.
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+
+@dataclass
+class ProductCheckpoint:
+    product: Dict[str, Any]  # Product attributes as sent to /simulate (prices, lead time, supplier, ...)
+    scenario: str  # Scenario label
+    history_days: int  # Horizon the scenario shapes were compiled for
+    next_day: int  # Day index of the first day not simulated yet (continues past history_days)
+    next_date: datetime  # Date of next_day
+    on_hand: int
+    pending: List[Tuple[int, int]]  # (arrival_day, qty) of deliveries still in transit
+    missed_sales_days: int  # Cumulative stockout days
+    rng_state: Dict[str, Any]  # numpy bit_generator.state of the product's random stream
+
+    @property
+    def product_id(self) -> int:
+        return int(self.product["id"])
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "product": self.product,
+            "scenario": self.scenario,
+            "history_days": self.history_days,
+            "next_day": self.next_day,
+            "next_date": self.next_date.isoformat(),
+            "on_hand": self.on_hand,
+            "pending": [list(p) for p in self.pending],
+            "missed_sales_days": self.missed_sales_days,
+            "rng_state": self.rng_state,
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ProductCheckpoint":
+        data = json.loads(raw)
+        data["next_date"] = datetime.fromisoformat(data["next_date"])
+        data["pending"] = [tuple(p) for p in data["pending"]]
+        return cls(**data)
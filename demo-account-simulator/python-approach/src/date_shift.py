@@ -0,0 +1,287 @@
+"""
+Chunked, resumable date shift for consumers that need physically shifted rows (/maintain?mode=chunked).
+Each table is shifted in primary-key ranges with one short transaction per chunk, so row locks are held
+for one chunk at most. Tables with one row per (product, date) (stocks) are walked newest-first in date
+windows narrower than the lag instead: a window's target dates were vacated by the windows before it,
+so no chunk ever collides with the unique key. Progress (lag, cursor, rows) lives in demo_shift_progress,
+so a run killed mid-way (e.g. a recycled Cloud Run instance) resumes at the next chunk with the same lag.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+# Initial rows per chunk; adapted towards SHIFT_CHUNK_TARGET_SECONDS between SHIFT_MIN/MAX_CHUNK_ROWS.
+SHIFT_CHUNK_ROWS = int(os.getenv("SHIFT_CHUNK_ROWS", "5000"))
+SHIFT_MIN_CHUNK_ROWS = int(os.getenv("SHIFT_MIN_CHUNK_ROWS", "100"))
+SHIFT_MAX_CHUNK_ROWS = int(os.getenv("SHIFT_MAX_CHUNK_ROWS", "50000"))
+SHIFT_CHUNK_TARGET_SECONDS = float(os.getenv("SHIFT_CHUNK_TARGET_SECONDS", "0.5"))
+# PostgreSQL per-chunk limits: max wait for a row lock, and max runtime (= lock hold time) of the chunk UPDATE.
+SHIFT_LOCK_TIMEOUT_MS = int(os.getenv("SHIFT_LOCK_TIMEOUT_MS", "2000"))
+SHIFT_STATEMENT_TIMEOUT_MS = int(os.getenv("SHIFT_STATEMENT_TIMEOUT_MS", "5000"))
+# Attempts per chunk after a lock / statement timeout (chunk size is halved each time).
+SHIFT_MAX_RETRIES = int(os.getenv("SHIFT_MAX_RETRIES", "5"))
+
+# lock_not_available, query_canceled (statement_timeout)
+RETRYABLE_SQLSTATES = ("55P03", "57014")
+
+
+@dataclass(frozen=True)
+class ShiftTable:
+    name: str
+    key: str  # Monotonic integer primary key used for the chunk ranges
+    lag_column: str  # The lag is measured from MAX(lag_column), as in MAINTENANCE_SHIFT_QUERIES
+    columns: Tuple[str, ...]  # Date columns moved forward
+    # Unique per (product, lag_column): shift newest-first in date windows (cursor = window start, as an ordinal)
+    date_windows: bool = False
+
+
+# Assumes each table has an integer primary key `id`. If your schema differs, change `key` here.
+SHIFT_TABLES = (
+    ShiftTable("sell_orders", "id", "placed", ("placed",)),
+    ShiftTable("buy_orders", "id", "placed", ("placed", "expected_delivery_date")),
+    ShiftTable("stocks", "id", "date", ("date",), date_windows=True),  # UNIQUE (product_id, date)
+)
+
+SHIFT_PROGRESS_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS demo_shift_progress (
+    webshop_id integer NOT NULL,
+    table_name text NOT NULL,
+    lag_days integer NOT NULL,
+    last_key bigint NOT NULL DEFAULT 0,
+    rows_shifted bigint NOT NULL DEFAULT 0,
+    started_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at timestamp,
+    PRIMARY KEY (webshop_id, table_name)
+);
+"""
+
+GET_PROGRESS_SQL = """
+SELECT lag_days, last_key, rows_shifted FROM demo_shift_progress
+WHERE webshop_id = :shop_id AND table_name = :table_name AND finished_at IS NULL
+"""
+
+START_PROGRESS_SQL = """
+INSERT INTO demo_shift_progress (webshop_id, table_name, lag_days)
+VALUES (:shop_id, :table_name, :lag_days)
+ON CONFLICT (webshop_id, table_name) DO UPDATE
+SET lag_days = EXCLUDED.lag_days, last_key = 0, rows_shifted = 0,
+    started_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP, finished_at = NULL
+"""
+
+ADVANCE_PROGRESS_SQL = """
+UPDATE demo_shift_progress
+SET last_key = :last_key, rows_shifted = rows_shifted + :rows, updated_at = CURRENT_TIMESTAMP
+WHERE webshop_id = :shop_id AND table_name = :table_name
+"""
+
+FINISH_PROGRESS_SQL = """
+UPDATE demo_shift_progress SET finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+WHERE webshop_id = :shop_id AND table_name = :table_name
+"""
+
+# Date arithmetic per dialect (SQLite is only used for local runs / tests).
+SHIFT_EXPRESSIONS = {
+    "postgresql": "{col} + :days * INTERVAL '1 day'",
+    "sqlite": "datetime({col}, printf('%+d days', :days))",
+}
+
+
+def _as_date(value: Any) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _sqlstate(exc: DBAPIError) -> Optional[str]:
+    return getattr(exc.orig, "pgcode", None) or getattr(exc.orig, "sqlstate", None)
+
+
+class ChunkedDateShifter:
+    """Shifts one shop's dates forward to today, table by table, one committed key range at a time."""
+
+    def __init__(
+        self,
+        engine,
+        tables: Tuple[ShiftTable, ...] = SHIFT_TABLES,
+        chunk_rows: int = SHIFT_CHUNK_ROWS,
+        target_seconds: float = SHIFT_CHUNK_TARGET_SECONDS,
+        lock_timeout_ms: int = SHIFT_LOCK_TIMEOUT_MS,
+        statement_timeout_ms: int = SHIFT_STATEMENT_TIMEOUT_MS,
+        max_retries: int = SHIFT_MAX_RETRIES,
+    ):
+        self.engine = engine
+        self.tables = tables
+        self.chunk_rows = max(SHIFT_MIN_CHUNK_ROWS, min(chunk_rows, SHIFT_MAX_CHUNK_ROWS))
+        self.target_seconds = target_seconds
+        self.lock_timeout_ms = lock_timeout_ms
+        self.statement_timeout_ms = statement_timeout_ms
+        self.max_retries = max_retries
+        self.is_postgres = engine.dialect.name == "postgresql"
+        self.window_days = 1  # Date-window width; re-estimated from rows per day after each window
+        self._shift_expr = SHIFT_EXPRESSIONS.get(engine.dialect.name, SHIFT_EXPRESSIONS["postgresql"])
+
+    async def run(self, webshop_id: int) -> Dict[str, Any]:
+        """Shift (or resume shifting) every table. Returns per-table rows, seconds and rows/sec."""
+        async with self.engine.begin() as conn:
+            await conn.execute(text(SHIFT_PROGRESS_SCHEMA_SQL))
+        started = time.perf_counter()
+        tables = {t.name: await self._shift_table(webshop_id, t) for t in self.tables}
+        seconds = time.perf_counter() - started
+        rows = sum(t["rows"] for t in tables.values())
+        return {
+            "rows": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else float(rows),
+            "tables": tables,
+        }
+
+    async def _start_or_resume(self, webshop_id: int, table: ShiftTable) -> Tuple[int, int, int, bool]:
+        """(lag_days, last_key, rows_already_shifted, resumed). The lag is fixed when a run starts."""
+        params = {"shop_id": webshop_id, "table_name": table.name}
+        async with self.engine.begin() as conn:
+            row = (await conn.execute(text(GET_PROGRESS_SQL), params)).first()
+            if row is not None:
+                return int(row[0]), int(row[1]), int(row[2]), True
+            today, latest = (await conn.execute(
+                text(f"SELECT CURRENT_DATE, MAX({table.lag_column}) FROM {table.name} WHERE webshop_id = :shop_id"),
+                {"shop_id": webshop_id},
+            )).one()
+            latest = _as_date(latest)
+            lag = (_as_date(today) - latest).days if latest else 0
+            if lag > 0:
+                await conn.execute(text(START_PROGRESS_SQL), dict(params, lag_days=lag))
+            return lag, 0, 0, False
+
+    async def _shift_table(self, webshop_id: int, table: ShiftTable) -> Dict[str, Any]:
+        lag, last_key, done_before, resumed = await self._start_or_resume(webshop_id, table)
+        report = {"lag_days": lag, "rows": 0, "chunks": 0, "resumed": resumed, "rows_before_resume": done_before}
+        if lag <= 0:
+            report.update(seconds=0.0, rows_per_sec=0.0)
+            return report
+
+        started = time.perf_counter()
+        self.window_days = 1
+        while True:
+            rows, last_key = await self._shift_chunk_with_retry(webshop_id, table, lag, last_key)
+            if rows == 0:
+                break
+            report["rows"] += rows
+            report["chunks"] += 1
+
+        async with self.engine.begin() as conn:
+            await conn.execute(text(FINISH_PROGRESS_SQL), {"shop_id": webshop_id, "table_name": table.name})
+        seconds = time.perf_counter() - started
+        report["seconds"] = round(seconds, 3)
+        report["rows_per_sec"] = round(report["rows"] / seconds, 1) if seconds > 0 else float(report["rows"])
+        logger.info(
+            "Shifted %d %s rows by %d days in %.3fs (%.0f rows/s, %d chunks)",
+            report["rows"], table.name, lag, seconds, report["rows_per_sec"], report["chunks"],
+        )
+        return report
+
+    async def _shift_chunk_with_retry(self, webshop_id: int, table: ShiftTable, lag: int, last_key: int) -> Tuple[int, int]:
+        attempt = 0
+        while True:
+            try:
+                chunk_started = time.perf_counter()
+                result = await self._shift_chunk(webshop_id, table, lag, last_key)
+                self._adapt(time.perf_counter() - chunk_started)
+                return result
+            except DBAPIError as e:
+                if _sqlstate(e) not in RETRYABLE_SQLSTATES or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.chunk_rows = max(SHIFT_MIN_CHUNK_ROWS, self.chunk_rows // 2)
+                logger.warning(
+                    f"{table.name} chunk after key {last_key} hit a lock/statement timeout; "
+                    f"retrying with {self.chunk_rows} rows (attempt {attempt})"
+                )
+                await asyncio.sleep(min(5.0, 0.1 * 2 ** attempt))
+
+    def _bound(self, day: date):
+        """Date bound as a query parameter (PostgreSQL timestamps bind from datetime; SQLite compares ISO text)."""
+        return datetime.combine(day, dtime()) if self.is_postgres else day.isoformat()
+
+    async def _set_timeouts(self, conn) -> None:
+        if self.is_postgres:
+            await conn.execute(text(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}"))
+            await conn.execute(text(f"SET LOCAL statement_timeout = {int(self.statement_timeout_ms)}"))
+
+    async def _shift_chunk(self, webshop_id: int, table: ShiftTable, lag: int, last_key: int) -> Tuple[int, int]:
+        """Shift the next key range and record progress in the same transaction. Returns (rows, new last_key)."""
+        if table.date_windows:
+            return await self._shift_window(webshop_id, table, lag, last_key)
+        params = {"shop_id": webshop_id, "last_key": last_key, "limit": self.chunk_rows}
+        async with self.engine.begin() as conn:
+            await self._set_timeouts(conn)
+            upper, _ = (await conn.execute(text(
+                f"SELECT MAX({table.key}), COUNT(*) FROM ("
+                f"SELECT {table.key} FROM {table.name} WHERE webshop_id = :shop_id AND {table.key} > :last_key "
+                f"ORDER BY {table.key} LIMIT :limit) chunk"
+            ), params)).one()
+            if upper is None:
+                return 0, last_key
+            assignments = ", ".join(f"{col} = {self._shift_expr.format(col=col)}" for col in table.columns)
+            result = await conn.execute(text(
+                f"UPDATE {table.name} SET {assignments} "
+                f"WHERE webshop_id = :shop_id AND {table.key} > :last_key AND {table.key} <= :upper"
+            ), {"shop_id": webshop_id, "last_key": last_key, "upper": upper, "days": lag})
+            rows = result.rowcount
+            await conn.execute(text(ADVANCE_PROGRESS_SQL), {
+                "shop_id": webshop_id, "table_name": table.name, "last_key": int(upper), "rows": rows,
+            })
+        return rows, int(upper)
+
+    async def _shift_window(self, webshop_id: int, table: ShiftTable, lag: int, window_start: int) -> Tuple[int, int]:
+        """Shift the newest not-yet-shifted dates, at most `lag` days of them, so their targets (>= the previous
+        window's start) are vacated already. `window_start` is the previous window's first day as an ordinal
+        (0: none yet). Returns (rows, this window's first day as an ordinal); (0, ...) when done."""
+        col = table.lag_column
+        params = {"shop_id": webshop_id}
+        below = ""
+        if window_start:
+            below = f" AND {col} < :start"
+            params["start"] = self._bound(date.fromordinal(window_start))
+        async with self.engine.begin() as conn:
+            await self._set_timeouts(conn)
+            newest = _as_date((await conn.execute(text(
+                f"SELECT MAX({col}) FROM {table.name} WHERE webshop_id = :shop_id{below}"
+            ), params)).scalar())
+            if newest is None:
+                return 0, window_start
+            days = max(1, min(lag, self.window_days))
+            end = newest + timedelta(days=1)
+            start = end - timedelta(days=days)
+            assignments = ", ".join(f"{c} = {self._shift_expr.format(col=c)}" for c in table.columns)
+            result = await conn.execute(text(
+                f"UPDATE {table.name} SET {assignments} "
+                f"WHERE webshop_id = :shop_id AND {col} >= :start AND {col} < :end"
+            ), {"shop_id": webshop_id, "start": self._bound(start), "end": self._bound(end), "days": lag})
+            rows = result.rowcount
+            await conn.execute(text(ADVANCE_PROGRESS_SQL), {
+                "shop_id": webshop_id, "table_name": table.name, "last_key": start.toordinal(), "rows": rows,
+            })
+        # Next window: about chunk_rows rows at this window's rows per day
+        self.window_days = max(1, self.chunk_rows * days // max(1, rows))
+        return rows, start.toordinal()
+
+    def _adapt(self, seconds: float) -> None:
+        """Steer the chunk size towards target_seconds per chunk (bounded lock hold time)."""
+        if seconds > self.target_seconds:
+            self.chunk_rows = max(SHIFT_MIN_CHUNK_ROWS, self.chunk_rows // 2)
+        elif seconds < self.target_seconds / 4:
+            self.chunk_rows = min(SHIFT_MAX_CHUNK_ROWS, self.chunk_rows * 2)
@@ -0,0 +1,199 @@
+"""
+Monte Carlo ensemble: simulate K replicas of a product in one pass that is vectorized over replicas
+(one NumPy step per day for all K stock levels / order pipelines), score every replica against its
+archetype's acceptance criteria and keep the best one.
+
+All replicas draw from one stacked generator per (shop, product, seed): demand is a single (K, days) draw
+and lead-time jitter a single (K, days) draw, so the cost is one pass whatever K is. The winner's rows,
+end state and buy orders come straight from that pass (no replay); its checkpoint continues on the
+product stream of its replica seed (replica_seeds), so roll-forward stays reproducible from seed + K.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.rng import ensemble_rng, new_seed
+from src.scenarios import ScenarioSpec
+
+# Upper bound for replicas per product (request / shop config), bounds CPU per /simulate.
+ENSEMBLE_MAX_REPLICAS = int(os.getenv("ENSEMBLE_MAX_REPLICAS", "200"))
+
+# Acceptance criteria (a replica is accepted when its score is > 0)
+LATE_STOCKOUT_DAYS = 90  # Stockout Prone: a stockout within the last N days
+PEAK_WINDOW_DAYS = 30  # Seasonal: best 30-day mean of sales vs. the median 30-day mean ...
+MIN_PEAK_RATIO = 1.5  # ... must be at least this high
+TREND_DAYS = 120  # Trends: fitted change of sales over the last N days, relative to their mean ...
+MIN_TREND_CHANGE = 0.5  # ... at least this much, in the archetype's direction
+MAX_MISSED_SHARE = 0.1  # Everything else: at most this share of days with lost sales
+
+SEASONAL_ARCHETYPES = ("seasonal_summer", "seasonal_winter", "micro_seasonal")
+TREND_DIRECTIONS = {"trend_up": 1.0, "trend_down": -1.0}
+
+
+@dataclass
+class ReplicaBatch:
+    """K simulated trajectories of one product: per-replica seeds and (K, days) columns."""
+    seeds: List[int]
+    on_hand: np.ndarray
+    sold: np.ndarray
+    missed: np.ndarray  # bool: demand exceeded stock that day
+    orders: np.ndarray  # (K,) buy orders placed
+    # Every buy order of every replica: replica index, day placed, lead time (days)
+    order_replica: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    order_day: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    order_lead: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    order_q: int = 0
+    arrivals: Optional[np.ndarray] = None  # (K, days + max lead + 1) quantity arriving per day
+
+    @property
+    def replicas(self) -> int:
+        return len(self.seeds)
+
+    def replica(self, r: int, score: float) -> "Replica":
+        days = self.on_hand.shape[1]
+        mine = self.order_replica == r
+        late = self.arrivals[r, days:] if self.arrivals is not None else np.zeros(0, dtype=np.int64)
+        return Replica(
+            seed=self.seeds[r],
+            score=score,
+            on_hand=self.on_hand[r],
+            sold=self.sold[r],
+            bo_day=self.order_day[mine],
+            bo_delivery_day=self.order_day[mine] + self.order_lead[mine],
+            order_q=self.order_q,
+            missed_sales_days=int(self.missed[r].sum()),
+            pending=[(days + int(d), int(late[d])) for d in np.flatnonzero(late)],
+        )
+
+
+@dataclass
+class Replica:
+    """One replica's trajectory: what SupplyChainSimulator needs for its result and checkpoint."""
+    seed: int  # Replica seed; the checkpoint continues on this seed's product stream
+    score: float
+    on_hand: np.ndarray
+    sold: np.ndarray
+    bo_day: np.ndarray
+    bo_delivery_day: np.ndarray  # Day placed + lead time (as in SupplyChainSimulator._run)
+    order_q: int
+    missed_sales_days: int
+    pending: List[Tuple[int, int]]  # (arrival_day, qty) still in transit after the last day
+
+
+def replica_seeds(seed: Optional[int], replicas: int) -> List[int]:
+    """Seed of every replica: the run seed first, then seeds derived from it (stable as K grows)."""
+    base = new_seed() if seed is None else int(seed)
+    derived = np.random.SeedSequence([base, 0xE5E]).generate_state(max(0, replicas - 1)) if replicas > 1 else []
+    return [base] + [int(s) for s in derived]
+
+
+def simulate_replicas(simulator: Any, product_data: Dict[str, Any], spec: ScenarioSpec, seeds: List[int]) -> ReplicaBatch:
+    """Full-horizon run of every replica, same model as SupplyChainSimulator._run, with all random draws
+    made up front for the whole (K, days) block from the stacked generator of seeds[0]."""
+    history_days = simulator.history_days
+    lead_time = int(product_data.get("product_delivery_time", 14))
+    base_qty = simulator.demand_engine.get_base_demand(float(product_data.get("selling_price", 0) or 0))
+    avg_daily = spec.avg_daily(base_qty)
+    reorder_points = spec.reorder_points(history_days, lead_time, avg_daily)
+    order_q = spec.order_quantity(avg_daily, lead_time)
+    launch_day = spec.launch_day(history_days)
+    launch_qty = int(avg_daily * spec.launch_stock_days)
+    jitter = spec.lead_time_jitter
+
+    k = len(seeds)
+    rng = ensemble_rng(product_data["shop_id"], product_data["id"], seeds[0])
+    # Replica r is row r: every replica's days in one call (one draw per random term)
+    demand = simulator.demand_engine.get_demand_series(
+        spec, base_qty, history_days, rng, np.tile(np.arange(history_days), k)
+    ).reshape(k, history_days)
+    if jitter is not None:
+        jittered = rng.random((k, history_days)) < jitter[0]
+        jitter_leads = rng.integers(jitter[1], jitter[2], (k, history_days), endpoint=True)
+
+    max_lead = max(lead_time, jitter[2] if jitter is not None else 0, 1)
+    arrivals = np.zeros((k, history_days + max_lead + 1), dtype=np.int64)
+    stock = np.full(k, spec.initial_stock(int(product_data.get("current_stock_on_hand", 0) or 0)), dtype=np.int64)
+    in_transit = np.zeros(k, dtype=np.int64)
+    orders = np.zeros(k, dtype=np.int64)
+    on_hand = np.empty((k, history_days), dtype=np.int64)
+    sold = np.empty((k, history_days), dtype=np.int64)
+    missed = np.empty((k, history_days), dtype=bool)
+    placed: List[Tuple[np.ndarray, int, np.ndarray]] = []
+
+    for day in range(history_days):
+        received = arrivals[:, day]
+        stock += received
+        in_transit -= received
+        if day == launch_day:
+            stock += launch_qty
+        short = demand[:, day] > stock
+        sold_today = np.where(short, np.maximum(stock, 0), demand[:, day])
+        stock -= sold_today
+        reorder = np.flatnonzero(stock + in_transit < reorder_points[day])
+        if reorder.size:
+            leads = np.full(reorder.size, lead_time)
+            if jitter is not None:
+                leads = np.where(jittered[reorder, day], jitter_leads[reorder, day], leads)
+            # InboundQueue receives at the start of a day, so a same-day arrival lands the next day
+            arrivals[reorder, np.maximum(day + leads, day + 1)] += order_q
+            in_transit[reorder] += order_q
+            orders[reorder] += 1
+            placed.append((reorder, day, leads))
+        on_hand[:, day] = stock
+        sold[:, day] = sold_today
+        missed[:, day] = short
+
+    order_replica = np.concatenate([r for r, _, _ in placed]) if placed else np.zeros(0, dtype=np.int64)
+    return ReplicaBatch(
+        seeds=list(seeds), on_hand=on_hand, sold=sold, missed=missed, orders=orders,
+        order_replica=order_replica,
+        order_day=np.concatenate([np.full(r.size, d) for r, d, _ in placed]) if placed else np.zeros(0, dtype=np.int64),
+        order_lead=np.concatenate([leads for _, _, leads in placed]) if placed else np.zeros(0, dtype=np.int64),
+        order_q=order_q,
+        arrivals=arrivals,
+    )
+
+
+def _rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    window = max(1, min(window, x.shape[1]))
+    c = np.cumsum(np.pad(x.astype(np.float64), ((0, 0), (1, 0))), axis=1)
+    return (c[:, window:] - c[:, :-window]) / window
+
+
+def _relative_change(y: np.ndarray) -> np.ndarray:
+    """Least-squares slope of each row × its length, relative to the row mean (0 for empty rows)."""
+    t = np.arange(y.shape[1], dtype=np.float64)
+    t -= t.mean()
+    mean = y.mean(axis=1)
+    slope = (y - mean[:, None]) @ t / max(float(t @ t), 1.0)
+    return np.divide(slope * y.shape[1], mean, out=np.zeros_like(mean), where=mean > 0)
+
+
+def score_replicas(batch: ReplicaBatch, spec: ScenarioSpec) -> np.ndarray:
+    """(K,) scores; higher is more convincing for the archetype, > 0 meets its acceptance criteria."""
+    days = batch.sold.shape[1]
+    missed_share = batch.missed.mean(axis=1)
+    if spec.archetype == "stockout_prone":
+        late = min(LATE_STOCKOUT_DAYS, days)
+        late_stockout = batch.missed[:, days - late:].any(axis=1)
+        early_missed = batch.missed[:, : days - late].mean(axis=1) if days > late else np.zeros(batch.replicas)
+        return late_stockout - early_missed - (~late_stockout) * 0.5
+    if spec.archetype in SEASONAL_ARCHETYPES:
+        rolling = _rolling_mean(batch.sold, PEAK_WINDOW_DAYS)
+        median = np.median(rolling, axis=1)
+        peak_ratio = np.divide(rolling.max(axis=1), median, out=np.zeros(batch.replicas), where=median > 0)
+        return peak_ratio * (1 - missed_share) - MIN_PEAK_RATIO
+    if spec.archetype in TREND_DIRECTIONS:
+        change = _relative_change(batch.sold[:, -min(TREND_DAYS, days):].astype(np.float64))
+        return TREND_DIRECTIONS[spec.archetype] * change - MIN_TREND_CHANGE - missed_share
+    return MAX_MISSED_SHARE - missed_share
+
+
+def best_replica(simulator: Any, product_data: Dict[str, Any], spec: ScenarioSpec, replicas: int) -> Replica:
+    """The best of `replicas` replicas (ties go to the lowest replica index)."""
+    batch = simulate_replicas(simulator, product_data, spec, replica_seeds(simulator.seed, replicas))
+    scores = score_replicas(batch, spec)
+    best = int(np.argmax(scores))
+    return batch.replica(best, float(scores[best]))
@@ -0,0 +1,230 @@
+"""
+Generational stock layout (STOCK_WRITE_MODE=generation): every Creator run writes its stock rows under a
+new generation id, then flips the shop's live generation in one short transaction. Readers use the
+`stocks_live` view, so they see the old generation or the new one, never a half-written state.
+
+On PostgreSQL demo_stocks is LIST-partitioned by generation: a new generation is COPYed into its own
+empty partition (no upsert, no index conflicts) and a retired one is dropped with DROP TABLE, so neither
+the write nor the cleanup touches the rows of other generations and no dead tuples are left behind.
+Other engines (SQLite tests) use one plain table and DELETE.
+
+States: writing -> live -> retired; writing -> failed. Retired and failed generations, and writing ones
+older than the live generation (abandoned by a crashed run), are dropped by drop_retired().
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Sequence
+
+from sqlalchemy import text
+
+from src.database import unique_stock_rows
+
+logger = logging.getLogger(__name__)
+
+GENERATION_COLUMNS = ("generation", "webshop_id", "product_id", "on_hand", "date")
+
+# Schema per dialect (SQLite is only used for local runs / tests).
+GENERATION_SCHEMA_QUERIES = {
+    "postgresql": [
+        """
+        CREATE TABLE IF NOT EXISTS demo_stock_generations (
+            generation bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            webshop_id integer NOT NULL,
+            state text NOT NULL DEFAULT 'writing',
+            created_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            swapped_at timestamp
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS demo_stocks (
+            generation bigint NOT NULL,
+            webshop_id integer NOT NULL,
+            product_id integer NOT NULL,
+            on_hand integer NOT NULL,
+            date timestamp NOT NULL,
+            PRIMARY KEY (generation, product_id, date)
+        ) PARTITION BY LIST (generation);
+        """,
+    ],
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS demo_stock_generations (
+            generation INTEGER PRIMARY KEY AUTOINCREMENT,
+            webshop_id integer NOT NULL,
+            state text NOT NULL DEFAULT 'writing',
+            created_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            swapped_at timestamp
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS demo_stocks (
+            generation integer NOT NULL,
+            webshop_id integer NOT NULL,
+            product_id integer NOT NULL,
+            on_hand integer NOT NULL,
+            date timestamp NOT NULL,
+            PRIMARY KEY (generation, product_id, date)
+        );
+        """,
+    ],
+}
+
+# What readers query instead of stocks (same columns; only live generations).
+LIVE_VIEW_SQL = """
+CREATE VIEW IF NOT EXISTS stocks_live AS
+SELECT s.product_id, s.webshop_id, s.on_hand, s.date
+FROM demo_stocks s JOIN demo_stock_generations g ON g.generation = s.generation
+WHERE g.state = 'live';
+"""
+LIVE_VIEW_SQL_POSTGRES = LIVE_VIEW_SQL.replace("CREATE VIEW IF NOT EXISTS", "CREATE OR REPLACE VIEW")
+
+NEW_GENERATION_SQL = "INSERT INTO demo_stock_generations (webshop_id) VALUES (:shop_id) RETURNING generation"
+
+CREATE_PARTITION_SQL = "CREATE TABLE demo_stocks_g{generation} PARTITION OF demo_stocks FOR VALUES IN ({generation})"
+
+INSERT_ROWS_SQL = """
+INSERT INTO demo_stocks (generation, webshop_id, product_id, on_hand, date)
+VALUES (:generation, :webshop_id, :product_id, :on_hand, :date)
+"""
+
+UPSERT_ROWS_SQL = INSERT_ROWS_SQL + " ON CONFLICT (generation, product_id, date) DO UPDATE SET on_hand = EXCLUDED.on_hand"
+
+LIVE_GENERATION_SQL = "SELECT generation FROM demo_stock_generations WHERE webshop_id = :shop_id AND state = 'live'"
+
+# The flip: retire the shop's live generation and promote the new one (caller's transaction).
+RETIRE_LIVE_SQL = """
+UPDATE demo_stock_generations SET state = 'retired'
+WHERE webshop_id = :shop_id AND state = 'live' AND generation < :generation
+"""
+
+GO_LIVE_SQL = """
+UPDATE demo_stock_generations SET state = 'live', swapped_at = CURRENT_TIMESTAMP
+WHERE generation = :generation AND state = 'writing'
+"""
+
+MARK_FAILED_SQL = "UPDATE demo_stock_generations SET state = 'failed' WHERE generation = :generation AND state = 'writing'"
+
+DROPPABLE_SQL = """
+SELECT g.generation FROM demo_stock_generations g
+WHERE g.state IN ('retired', 'failed')
+   OR (g.state = 'writing' AND g.generation < (
+        SELECT MAX(l.generation) FROM demo_stock_generations l WHERE l.webshop_id = g.webshop_id AND l.state = 'live'))
+ORDER BY g.generation
+"""
+
+DROP_PARTITION_SQL = "DROP TABLE IF EXISTS demo_stocks_g{generation}"
+
+DELETE_ROWS_SQL = "DELETE FROM demo_stocks WHERE generation = :generation"
+
+FORGET_GENERATION_SQL = "DELETE FROM demo_stock_generations WHERE generation = :generation"
+
+
+def _as_datetime(d: Any) -> datetime:
+    """asyncpg binds timestamp columns from datetime only (no 'YYYY-MM-DD' strings)."""
+    return d if isinstance(d, datetime) else datetime.fromisoformat(str(d))
+
+
+def _records(generation: int, stocks_data: Sequence[Mapping[str, Any]]):
+    """Stock rows as typed tuples (GENERATION_COLUMNS order) for asyncpg's binary COPY."""
+    for row in stocks_data:
+        yield (generation, int(row["webshop_id"]), int(row["product_id"]), int(row["on_hand"]), _as_datetime(row["date"]))
+
+
+class StockGenerations:
+    """Writes, flips and drops stock generations of an async engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.is_postgres = engine.dialect.name == "postgresql"
+        self.uses_copy = self.is_postgres and engine.driver == "asyncpg"
+        self._schema_ready = False
+
+    async def ensure_schema(self) -> None:
+        if self._schema_ready:
+            return
+        async with self.engine.begin() as conn:
+            for q in GENERATION_SCHEMA_QUERIES["postgresql" if self.is_postgres else "sqlite"]:
+                await conn.execute(text(q))
+            await conn.execute(text(LIVE_VIEW_SQL_POSTGRES if self.is_postgres else LIVE_VIEW_SQL))
+        self._schema_ready = True
+
+    async def begin(self, webshop_ids: Sequence[int]) -> Dict[int, int]:
+        """New (writing) generation per shop, each with its own partition on PostgreSQL. webshop_id -> generation."""
+        await self.ensure_schema()
+        generations = {}
+        async with self.engine.begin() as conn:
+            for webshop_id in webshop_ids:
+                generation = (await conn.execute(text(NEW_GENERATION_SQL), {"shop_id": webshop_id})).scalar_one()
+                if self.is_postgres:
+                    await conn.execute(text(CREATE_PARTITION_SQL.format(generation=int(generation))))
+                generations[webshop_id] = int(generation)
+        return generations
+
+    async def load(self, generation: int, stocks_data: List[Dict[str, Any]], chunk_size: int) -> str:
+        """Write a generation's rows (COPY straight into its partition on asyncpg). Returns the load method."""
+        stocks_data = unique_stock_rows(stocks_data)  # The partition's primary key rejects repeated days
+        async with self.engine.begin() as conn:
+            if self.uses_copy:
+                driver_conn = (await conn.get_raw_connection()).driver_connection
+                for i in range(0, len(stocks_data), chunk_size):
+                    await driver_conn.copy_records_to_table(
+                        f"demo_stocks_g{generation}",
+                        records=list(_records(generation, stocks_data[i : i + chunk_size])),
+                        columns=list(GENERATION_COLUMNS),
+                    )
+                return "copy"
+            if stocks_data:
+                await conn.execute(text(INSERT_ROWS_SQL), [dict(row, generation=generation) for row in stocks_data])
+            return "executemany"
+
+    async def swap(self, conn, generations: Mapping[int, int]) -> None:
+        """Make every given generation its shop's live one, in the caller's transaction (one atomic flip)."""
+        for webshop_id, generation in generations.items():
+            params = {"shop_id": webshop_id, "generation": generation}
+            await conn.execute(text(RETIRE_LIVE_SQL), params)
+            if (await conn.execute(text(GO_LIVE_SQL), params)).rowcount != 1:
+                raise RuntimeError(f"Stock generation {generation} of shop {webshop_id} was superseded or dropped")
+            if (await conn.execute(text(LIVE_GENERATION_SQL), params)).all() != [(generation,)]:
+                raise RuntimeError(f"Shop {webshop_id} already has a newer live stock generation")
+
+    async def fail(self, generations: Mapping[int, int]) -> None:
+        """Best effort: mark generations of a failed write for dropping."""
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(text(MARK_FAILED_SQL), [{"generation": g} for g in generations.values()])
+        except Exception:
+            logger.exception(f"Could not mark stock generations {sorted(generations.values())} as failed")
+
+    async def live_generation(self, conn, webshop_id: int):
+        return (await conn.execute(text(LIVE_GENERATION_SQL), {"shop_id": webshop_id})).scalar()
+
+    async def append(self, conn, webshop_id: int, stocks_data: List[Dict[str, Any]]) -> None:
+        """Roll-forward: upsert rows into the shop's live generation (caller's transaction)."""
+        await self.ensure_schema()
+        generation = await self.live_generation(conn, webshop_id)
+        if generation is None:
+            raise RuntimeError(f"Shop {webshop_id} has no live stock generation")
+        if self.uses_copy:
+            params = [dict(row, generation=generation, date=_as_datetime(row["date"])) for row in stocks_data]
+        else:
+            params = [dict(row, generation=generation) for row in stocks_data]
+        await conn.execute(text(UPSERT_ROWS_SQL), params)
+
+    async def drop_retired(self) -> Dict[str, Any]:
+        """Drop every droppable generation: DROP TABLE of its partition (PostgreSQL) or DELETE of its rows."""
+        await self.ensure_schema()
+        started = time.perf_counter()
+        async with self.engine.begin() as conn:
+            generations = [int(g) for (g,) in await conn.execute(text(DROPPABLE_SQL))]
+        for generation in generations:
+            async with self.engine.begin() as conn:
+                if self.is_postgres:
+                    await conn.execute(text(DROP_PARTITION_SQL.format(generation=generation)))
+                else:
+                    await conn.execute(text(DELETE_ROWS_SQL), {"generation": generation})
+                await conn.execute(text(FORGET_GENERATION_SQL), {"generation": generation})
+        seconds = time.perf_counter() - started
+        if generations:
+            logger.info(f"Dropped stock generations {generations} in {seconds:.3f}s")
+        return {"dropped": generations, "seconds": round(seconds, 3)}
@@ -0,0 +1,79 @@
+"""
+Calendar of the simulation horizon, built once per run (start date, days) and shared by every product:
+dates, formatted date strings, month / day-of-month and per-archetype season masks as arrays, so the
+per-product code indexes by day instead of doing datetime arithmetic and strftime per day.
+The same calendar is inlined in retool-blocks/simulate_stocks*.py (Retool blocks cannot import this module).
+"""
+from datetime import datetime, timedelta
+from functools import cached_property, lru_cache
+from typing import Iterable, Tuple
+
+import numpy as np
+
+SQL_DATE_FMT = "%Y-%m-%d"
+ISO_DATE_FMT = "%Y-%m-%dT12:00:00Z"
+SQL_TIMESTAMP_FMT = "%Y-%m-%d 00:00:02"
+
+# Seasonal ROP boost windows: ((start month, day), (end month, day)), inclusive (60 days before the peak).
+SEASONAL_ROP_WINDOWS = {
+    "seasonal_summer": ((5, 16), (7, 15)),
+    "seasonal_winter": ((10, 16), (12, 15)),
+}
+MICRO_SEASONAL_MONTHS = (2, 3, 8, 9)
+
+
+class SimulationCalendar:
+    def __init__(self, start_date: datetime, days: int):
+        self.start_date = start_date
+        self.days = days
+        first = np.datetime64(start_date.date(), "D")
+        self.dates = first + np.arange(days)
+        months = self.dates.astype("datetime64[M]")
+        self.month = (months.astype(np.int64) % 12 + 1).astype(np.int8)
+        self.day_of_month = ((self.dates - months.astype("datetime64[D]")).astype(np.int64) + 1).astype(np.int8)
+
+    @cached_property
+    def sql_dates(self) -> Tuple[str, ...]:
+        """YYYY-MM-DD per day (DB stock dates)."""
+        return tuple(np.datetime_as_string(self.dates, unit="D").tolist())
+
+    @cached_property
+    def iso_dates(self) -> Tuple[str, ...]:
+        """YYYY-MM-DDT12:00:00Z per day (API payload dates)."""
+        return tuple(d + "T12:00:00Z" for d in self.sql_dates)
+
+    @cached_property
+    def sql_timestamps(self) -> Tuple[str, ...]:
+        """YYYY-MM-DD 00:00:02 per day (Retool SQL timestamps)."""
+        return tuple(d + " 00:00:02" for d in self.sql_dates)
+
+    def date_at(self, day: int, fmt: str = SQL_DATE_FMT) -> str:
+        """Formatted date for any day index; days outside the horizon (e.g. deliveries) are computed."""
+        if 0 <= day < self.days:
+            if fmt == SQL_DATE_FMT:
+                return self.sql_dates[day]
+            if fmt == ISO_DATE_FMT:
+                return self.iso_dates[day]
+            if fmt == SQL_TIMESTAMP_FMT:
+                return self.sql_timestamps[day]
+        return (self.start_date + timedelta(days=day)).strftime(fmt)
+
+    def month_mask(self, months: Iterable[int]) -> np.ndarray:
+        return np.isin(self.month, tuple(months))
+
+    def season_mask(self, archetype: str) -> np.ndarray:
+        """True on the days inside the archetype's seasonal ROP window (all False for other archetypes)."""
+        if archetype == "micro_seasonal":
+            return self.month_mask(MICRO_SEASONAL_MONTHS)
+        window = SEASONAL_ROP_WINDOWS.get(archetype)
+        if window is None:
+            return np.zeros(self.days, dtype=bool)
+        (start_m, start_d), (end_m, end_d) = window
+        key = self.month.astype(np.int32) * 100 + self.day_of_month
+        return (key >= start_m * 100 + start_d) & (key <= end_m * 100 + end_d)
+
+
+@lru_cache(maxsize=32)
+def calendar_for(start_date: datetime, days: int) -> SimulationCalendar:
+    """Shared calendar per (start_date, days): one per run, reused by every product."""
+    return SimulationCalendar(start_date, days)
@@ -0,0 +1,48 @@
+"""
+Pending inbound deliveries: a min-heap keyed by arrival day plus a running in-transit total.
+Receiving is O(log n) per delivery and the ROP check reads `in_transit` in O(1), instead of
+rebuilding the pending list and summing it every simulated day.
+The same structure is inlined in retool-blocks/simulate_stocks*.py (Retool blocks cannot import this module).
+"""
+import heapq
+from typing import Any, List, Tuple
+
+
+class InboundQueue:
+    __slots__ = ("_heap", "_seq", "in_transit")
+
+    def __init__(self):
+        self._heap: List[Tuple[int, int, int, Any]] = []
+        self._seq = 0  # tie-breaker: same-day arrivals come out in order placed
+        self.in_transit = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, arrival_day: int, qty: int, payload: Any = None) -> None:
+        heapq.heappush(self._heap, (arrival_day, self._seq, qty, payload))
+        self._seq += 1
+        self.in_transit += qty
+
+    def pop_arrived(self, day: int) -> List[Tuple[int, int, Any]]:
+        """Remove and return (arrival_day, qty, payload) for every delivery with arrival_day <= day."""
+        arrived = []
+        heap = self._heap
+        while heap and heap[0][0] <= day:
+            arrival_day, _, qty, payload = heapq.heappop(heap)
+            self.in_transit -= qty
+            arrived.append((arrival_day, qty, payload))
+        return arrived
+
+    def receive(self, day: int) -> int:
+        """Remove every delivery due by `day` and return the total quantity received."""
+        heap = self._heap
+        received = 0
+        while heap and heap[0][0] <= day:
+            received += heapq.heappop(heap)[2]
+        self.in_transit -= received
+        return received
+
+    def snapshot(self) -> List[Tuple[int, int]]:
+        """(arrival_day, qty) of every pending delivery in arrival order (payloads are dropped)."""
+        return [(arrival_day, qty) for arrival_day, _, qty, _ in sorted(self._heap, key=lambda e: (e[0], e[1]))]
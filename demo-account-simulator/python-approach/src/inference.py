@@ -0,0 +1,138 @@
+"""
+Batch delivery / buy-order inference from existing stock histories, for all products at once
+(Python counterpart of retool-blocks/simulate_buy_orders_from_stocks.py and
+simulate_assembly_orders_from_stocks.py, which inline a stdlib copy).
+
+delivery[d] = on_hand[d] - on_hand[previous day with a stock row] + sales[d]; the positive entries are
+deliveries and each buy order is placed lead_time days before its delivery.
+
+A library for the blocks, not called by the service: the endpoints simulate buy orders instead of inferring
+them. It is the tested reference the blocks' inline copies mirror (keep in sync).
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+import numpy as np
+
+from src.horizon import SQL_TIMESTAMP_FMT, calendar_for
+from src.sales_matrix import DailyMatrix, day_ordinal
+
+DEFAULT_LEAD_TIME = 14
+
+
+@dataclass
+class StockMatrix:
+    origin: int  # Ordinal of column 0
+    row_of: Dict[int, int]  # product_id -> row index
+    on_hand: np.ndarray  # int64, shape (products, days); 0 where there is no stock row
+    present: np.ndarray  # bool, True where the product has a stock row for the day
+
+    @classmethod
+    def from_rows(cls, stocks_rows: Iterable[Mapping[str, Any]]) -> "StockMatrix":
+        """fetch_stocks rows (product_id, stock_date, on_hand); one row per product and day."""
+        rows = list(stocks_rows)
+        ids = np.fromiter((int(r["product_id"]) for r in rows), dtype=np.int64, count=len(rows))
+        ordinals = np.fromiter((day_ordinal(r["stock_date"]) for r in rows), dtype=np.int64, count=len(rows))
+        on_hand = np.fromiter((int(r["on_hand"]) for r in rows), dtype=np.int64, count=len(rows))
+        origin = int(ordinals.min()) if len(rows) else 0
+        days = int(ordinals.max()) - origin + 1 if len(rows) else 0
+        unique_ids, idx = np.unique(ids, return_inverse=True)
+        matrix = np.zeros((len(unique_ids), days), dtype=np.int64)
+        present = np.zeros((len(unique_ids), days), dtype=bool)
+        matrix[idx, ordinals - origin] = on_hand
+        present[idx, ordinals - origin] = True
+        return cls(origin, {int(p): i for i, p in enumerate(unique_ids)}, matrix, present)
+
+    @property
+    def product_ids(self) -> List[int]:
+        return list(self.row_of)
+
+    @property
+    def days(self) -> int:
+        return self.on_hand.shape[1]
+
+
+@dataclass
+class InferredDeliveries:
+    origin: int  # Ordinal of day 0
+    product_id: np.ndarray
+    day: np.ndarray  # Delivery day (offset from origin)
+    placed_day: np.ndarray  # day - lead time (may be negative)
+    qty: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.qty)
+
+
+def product_lead_times(products: Iterable[Mapping[str, Any]]) -> Dict[int, int]:
+    return {int(p["product_id"]): int(p.get("lead_time") or DEFAULT_LEAD_TIME) for p in products}
+
+
+def infer_deliveries(
+    stocks: StockMatrix, sales: DailyMatrix, lead_times: Mapping[int, int]
+) -> InferredDeliveries:
+    """All products' deliveries in one pass over the stock and sales matrices."""
+    days = stocks.days
+    cols = np.arange(days)
+    # Column of the latest stock row up to each day, then shifted by one: the previous stock day (-1 = none)
+    last = np.maximum.accumulate(np.where(stocks.present, cols, -1), axis=1)
+    prev = np.full_like(last, -1)
+    prev[:, 1:] = last[:, :-1]
+    sold = sales.aligned(stocks.product_ids, stocks.origin, days)
+    delta = stocks.on_hand - np.take_along_axis(stocks.on_hand, np.maximum(prev, 0), axis=1) + sold
+    rows, day = np.nonzero(stocks.present & (prev >= 0) & (delta > 0))
+    ids = np.array(stocks.product_ids, dtype=np.int64)
+    leads = np.array([lead_times.get(p, DEFAULT_LEAD_TIME) for p in stocks.product_ids], dtype=np.int64)
+    return InferredDeliveries(
+        origin=stocks.origin,
+        product_id=ids[rows],
+        day=day,
+        placed_day=day - leads[rows],
+        qty=delta[rows, day],
+    )
+
+
+def buy_order_rows(
+    inferred: InferredDeliveries, products: Iterable[Mapping[str, Any]], webshop_id: int
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """(buy_orders, item_deliveries) of shop `webshop_id` in product order, same shape as the Retool blocks' output."""
+    if not len(inferred):
+        return [], []
+    days = int(inferred.day.max()) + 1
+    calendar = calendar_for(datetime.fromordinal(inferred.origin), days)
+    by_product: Dict[int, List[int]] = {}
+    for i, p_id in enumerate(inferred.product_id.tolist()):
+        by_product.setdefault(p_id, []).append(i)
+    day, placed, qty = inferred.day.tolist(), inferred.placed_day.tolist(), inferred.qty.tolist()
+
+    buy_orders: List[Dict[str, Any]] = []
+    item_deliveries: List[Dict[str, Any]] = []
+    for product in products:
+        p_id = int(product["product_id"])
+        supplier_id, supplier_uuid = product.get("supplier_id"), product.get("supplier_uuid")
+        if supplier_id is None or not supplier_uuid:
+            continue
+        unit_price = round(float(product.get("purchase_price") or 0), 2)
+        for i in by_product.get(p_id, []):
+            delivered_at = calendar.date_at(day[i], SQL_TIMESTAMP_FMT)
+            item_deliveries.append({
+                "order_index": len(buy_orders),
+                "product_id": p_id,
+                "product_uuid": str(product["product_uuid"]),
+                "quantity": qty[i],
+                "delivered_at": delivered_at,
+            })
+            buy_orders.append({
+                "webshop_id": webshop_id,
+                "webshop_uuid": str(product["webshop_uuid"]),
+                "supplier_id": int(supplier_id),
+                "supplier_uuid": str(supplier_uuid),
+                "placed": calendar.date_at(placed[i], SQL_TIMESTAMP_FMT),
+                "expected_delivery_date": delivered_at,
+                "product_id": p_id,
+                "product_uuid": str(product["product_uuid"]),
+                "quantity": qty[i],
+                "unit_price": unit_price,
+            })
+    return buy_orders, item_deliveries
@@ -0,0 +1,139 @@
+"""
+In-memory job registry for background /simulate runs: phase, progress and timings per job,
+with results kept for later retrieval. Jobs live in the instance that accepted them
+(Cloud Run: poll the same service URL; use session affinity when scaled past one instance).
+Retained results are bounded by payload rows as well as by job count: past MAX_RETAINED_JOB_ROWS the oldest
+finished results are released (status stays pollable), so a few large shops cannot exhaust instance memory.
+"""
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# Finished jobs kept for result retrieval; oldest finished jobs are evicted first.
+MAX_RETAINED_JOBS = int(os.getenv("MAX_RETAINED_JOBS", "20"))
+# api_payloads rows (sales + buy orders) kept over all job results; the newest finished result is always kept.
+MAX_RETAINED_JOB_ROWS = int(os.getenv("MAX_RETAINED_JOB_ROWS", "2000000"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    webshop_id: int
+    products_total: int
+    status: str = QUEUED
+    phase: str = "queued"  # queued -> simulating -> writing [-> pushing] -> done
+    products_done: int = 0
+    rows_written: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    # src.push.PushProgress of the api_payloads push (?push=true or POST /jobs/{id}/push), kept to resume it
+    push_progress: Optional[Any] = None
+    pushing: bool = False
+    result_released: bool = False
+    _phase_started: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def start(self) -> None:
+        self.status = RUNNING
+        self.started_at = time.time()
+
+    def enter_phase(self, phase: str) -> None:
+        """Close the current phase's timing and start a new one."""
+        now = time.perf_counter()
+        if self.phase not in ("queued", "done") and self._phase_started:
+            self.timings[self.phase] = round(now - self._phase_started, 3)
+        self.phase = phase
+        self._phase_started = now
+
+    @property
+    def result_rows(self) -> int:
+        if self.result is None:
+            return 0
+        return sum(len(rows) for rows in self.result.get("api_payloads", {}).values())
+
+    def release_result(self) -> None:
+        self.result = None
+        self.result_released = True
+
+    def product_done(self, _index: int = 0) -> None:
+        self.products_done += 1
+
+    def succeed(self, result: Dict[str, Any]) -> None:
+        self.enter_phase("done")
+        self.result = result
+        self.status = SUCCEEDED
+        self.finished_at = time.time()
+
+    def fail(self, error: str) -> None:
+        self.enter_phase("done")
+        self.error = error
+        self.status = FAILED
+        self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed_end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "webshop_id": self.webshop_id,
+            "status": self.status,
+            "phase": self.phase,
+            "progress": {
+                "products_done": self.products_done,
+                "products_total": self.products_total,
+                "rows_written": self.rows_written,
+            },
+            "timings": dict(self.timings),
+            "elapsed_seconds": round(elapsed_end - self.started_at, 3) if self.started_at else 0.0,
+            "error": self.error,
+            "result_available": self.result is not None,
+            "result_released": self.result_released,
+            "push": dict(self.push_progress.to_dict(), running=self.pushing) if self.push_progress else None,
+        }
+
+
+class JobStore:
+    def __init__(self, max_retained: int = MAX_RETAINED_JOBS, max_retained_rows: int = MAX_RETAINED_JOB_ROWS):
+        self.max_retained = max_retained
+        self.max_retained_rows = max_retained_rows
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def create(self, webshop_id: int, products_total: int) -> Job:
+        job = Job(id=uuid.uuid4().hex, webshop_id=webshop_id, products_total=products_total)
+        with self._lock:
+            self._evict()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def trim(self) -> None:
+        """Release the oldest finished results (not while pushing) until the retained rows fit the cap."""
+        with self._lock:
+            finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at)
+            retained = sum(j.result_rows for j in self._jobs.values())
+            for job in finished[:-1]:
+                if retained <= self.max_retained_rows:
+                    break
+                if job.result is not None and not job.pushing:
+                    retained -= job.result_rows
+                    job.release_result()
+
+    def _evict(self) -> None:
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at)
+        while len(self._jobs) >= self.max_retained and finished:
+            del self._jobs[finished.pop(0).id]
@@ -1,12 +1,30 @@
+from src.startup import STARTUP_WARM_UP, log_startup  # First import: times the app's imports below
+import asyncio
 import os
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Query
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Callable, List, Dict, Any, Literal, Optional, Set, Tuple
 import logging
+from src.checkpoint import ProductCheckpoint
+from src.results import ProductResult
 from src.simulation import SupplyChainSimulator
-from src.database import DatabaseManager
+from src.scenarios import scenario_label
+from src.parallel import SIM_WORKERS, shutdown_pool, simulate_parallel, simulate_shops, warm_up
+from src.async_database import AsyncDatabaseManager
+from src.database import MAINTENANCE_MODE, STOCK_READERS_SWITCHED
+from src.jobs import Job, JobStore
+from src.ensemble import ENSEMBLE_MAX_REPLICAS
+from src.rng import new_seed
+from src import metrics
+from src import profiling
+from src import push as public_api
+from src.payloads import NDJSON_MEDIA_TYPE, PAYLOAD_BATCH_SIZE, PayloadBatcher, StreamFeed, ndjson_line
+from src.shops import DEMO_PRODUCT_WHITELIST, DEMO_SHOP, DEMO_SHOP_ID, ShopConfig, load_shop_configs
 
 # Setup logging for Traycer/Cloud Run observability
 logging.basicConfig(level=logging.INFO)
@@ -14,21 +32,84 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Fail fast at startup when FAIL_FAST_NO_DB=1 and DATABASE_URL is missing (e.g. Cloud Run)."""
+    """Fail fast at startup when FAIL_FAST_NO_DB=1 and DATABASE_URL is missing (e.g. Cloud Run), or in generation
+    write mode before the readers were switched to stocks_live (STOCK_READERS_SWITCHED=1).
+    Starts the simulation process pool up front when SIM_WORKERS > 1 so the first request gets warm workers."""
     if os.getenv("FAIL_FAST_NO_DB") == "1" and not os.getenv("DATABASE_URL"):
         raise RuntimeError("FAIL_FAST_NO_DB=1 but DATABASE_URL is not set. Set DATABASE_URL or unset FAIL_FAST_NO_DB.")
+    if db.write_mode == "generation" and not STOCK_READERS_SWITCHED:
+        raise RuntimeError(
+            "STOCK_WRITE_MODE=generation writes stocks_live, not stocks. Switch every stocks reader to stocks_live, "
+            "then set STOCK_READERS_SWITCHED=1 (or use another STOCK_WRITE_MODE)."
+        )
+    if SIM_WORKERS > 1:
+        await run_in_threadpool(warm_up, SIM_WORKERS)
+    if STARTUP_WARM_UP:
+        await warm_up_service()
+    log_startup()
     yield
+    if stream_writes:
+        await asyncio.gather(*stream_writes, return_exceptions=True)
+    await db.dispose()
+    await run_in_threadpool(shutdown_pool)
+
+async def warm_up_service():
+    """STARTUP_WARM_UP=1: pay the first request's one-off costs during startup instead (DB engine + first pooled
+    connection, SQLAlchemy async stack, NumPy code paths and scenario caches via one throwaway product)."""
+    started = time.perf_counter()
+    db_ok = await db.check_connection()
+    await run_in_threadpool(warm_up_simulation)
+    logger.info(f"Warm-up done in {time.perf_counter() - started:.3f}s (database reachable: {db_ok})")
+
+def warm_up_simulation():
+    product = {
+        "id": 0, "sku": "warm-up", "supplier_id": 0, "shop_id": DEMO_SHOP_ID,
+        "selling_price": 10.0, "purchase_price": 5.0, "current_stock_on_hand": 50, "product_delivery_time": 14,
+    }
+    for name in ("Warm-up (Stable Fast)", "Warm-up (Seasonal Summer)"):
+        result = SupplyChainSimulator(seed=0).simulate_product_columnar(product, scenario_label(name))
+        result.stock_rows()
+        result.sales_rows()
+        result.buy_order_rows()
 
-app = FastAPI(title="Shop 1380 Inventory Simulation Engine", lifespan=lifespan)
-db = DatabaseManager()
+app = FastAPI(title="Demo Shop Inventory Simulation Engine", lifespan=lifespan)
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """Request latency by route template (demo_sim_request_seconds); handlers read the start time for "parse"."""
+    request.state.started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.observe(
+        time.perf_counter() - request.state.started,
+        method=request.method, route=getattr(route, "path", "unmatched"), status=response.status_code,
+    )
+    return response
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """REQUEST_PROFILING=1: run a /simulate or /maintain call flagged with X-Profile / ?profile= under the profiler."""
+    mode = profiling.requested_mode(request.url.path, request.headers, request.query_params)
+    if mode is None:
+        return await call_next(request)
+    try:
+        profiler = profiling.RequestProfiler(f"{request.method} {request.url.path}")
+    except profiling.ProfilerUnavailable as e:
+        logger.error(f"Profile of {request.method} {request.url.path} refused: {e}")
+        return JSONResponse(status_code=503, content={"detail": str(e)})
+    if not profiler.start():
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    logger.info(f"Profiled {profiler.label} ({profiler.backend}, {profiler.seconds:.3f}s)")
+    return await profiling.attach(response, profiler, mode)
 
-# Product ID whitelist for demo shop 1380 (from spec §5). Only these products may be simulated.
-DEMO_PRODUCT_WHITELIST = frozenset([
-    28666283, 28666286, 28666287, 28666288, 28666289, 28666290, 28666291, 28666292,
-    28666293, 28666294, 28666295, 28666296, 28666297, 28666298, 28666299, 28666300,
-    28666301, 28666302, 28666303, 28666304, 28666305, 28666306, 28666307, 28666308,
-    28666309, 28666310, 28666311, 28666312, 28666313, 28666314, 28666315, 28666316,
-])
+db = AsyncDatabaseManager()
+jobs = JobStore()
+# Shops that may be simulated (demo shop 1380 + SHOP_CONFIG_PATH), with whitelist / horizon / seed / overrides
+shops = load_shop_configs()
 
 class ProductInput(BaseModel):
     id: int
@@ -44,10 +125,170 @@ class ProductInput(BaseModel):
 class SimulationRequest(BaseModel):
     webshop_id: int
     products: List[ProductInput]
+    # Run seed: same seed + products -> identical output. Omitted: a fresh seed is drawn and returned.
+    seed: Optional[int] = Field(None, ge=0)
+    # Monte Carlo replicas per product, keeping the one that best fits its archetype. Omitted: the shop's default.
+    replicas: Optional[int] = Field(None, ge=1, le=ENSEMBLE_MAX_REPLICAS)
+
+class BatchSimulationRequest(BaseModel):
+    shops: List[SimulationRequest] = Field(..., min_length=1)
+
+def shop_config(webshop_id: int) -> ShopConfig:
+    """Config of a shop that may be simulated; 403 for any other shop."""
+    config = shops.get(webshop_id)
+    if config is None:
+        raise HTTPException(status_code=403, detail="Unauthorized Shop ID")
+    return config
+
+def require_db() -> None:
+    if not db.engine:
+        raise HTTPException(status_code=503, detail="Database not configured (DATABASE_URL not set).")
+
+def require_push() -> None:
+    if not public_api.OPTIPLY_API_TOKEN:
+        raise HTTPException(status_code=503, detail="Public API push not configured (OPTIPLY_API_TOKEN not set).")
+
+def whitelisted_products(request: SimulationRequest, config: ShopConfig) -> List[ProductInput]:
+    """The request's products in the shop's whitelist (spec §5); 400 when none are, or when a product belongs
+    to another shop (its rows would land under that shop, outside this shop's wipe / delta / checkpoints)."""
+    foreign = [p.id for p in request.products if p.shop_id != request.webshop_id]
+    if foreign:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Products {foreign} have a shop_id other than webshop_id {request.webshop_id}; simulate each shop separately."
+        )
+    products_to_run = [p for p in request.products if p.id in config.product_whitelist]
+    skipped = [p.id for p in request.products if p.id not in config.product_whitelist]
+    if skipped:
+        logger.warning(f"Skipping non-whitelisted product IDs for shop {config.webshop_id}: {skipped}")
+    if not products_to_run:
+        raise HTTPException(
+            status_code=400,
+            detail=f"No whitelisted products in request for shop {config.webshop_id}. Only product IDs in the shop's whitelist may be simulated."
+        )
+    return products_to_run
+
+def validate_simulation_request(request: SimulationRequest) -> Tuple[ShopConfig, List[ProductInput]]:
+    """Shop / DB checks shared by the /simulate variants. Returns the shop config and its whitelisted products."""
+    config = shop_config(request.webshop_id)
+    require_db()
+    return config, whitelisted_products(request, config)
+
+def run_seed(request: SimulationRequest, config: ShopConfig) -> int:
+    """The request's seed, else the shop's configured seed, else a fresh one."""
+    if request.seed is not None:
+        return request.seed
+    return config.seed if config.seed is not None else new_seed()
+
+def run_replicas(request: SimulationRequest, config: ShopConfig) -> int:
+    return request.replicas if request.replicas is not None else config.replicas
+
+def product_tasks(products: List[ProductInput], config: ShopConfig):
+    """(product_data, scenario_label) per product, with the shop's archetype overrides applied."""
+    return [(p.model_dump(), config.scenario_for(p.id, p.name)) for p in products]
+
+def simulate_products(
+    products: List[ProductInput],
+    seed: int,
+    on_product_done: Optional[Callable[[int], None]] = None,
+    config: ShopConfig = DEMO_SHOP,
+    replicas: int = 1,
+):
+    """Simulate each product (on the process pool when SIM_WORKERS > 1), merged in request order.
+    Results stay columnar until here; rows are materialized once for the DB write / response.
+    Returns (stocks, sales, buy_orders, checkpoints)."""
+    results = simulate_parallel(
+        product_tasks(products, config), history_days=config.history_days, workers=profiling.sim_workers(),
+        on_product_done=on_product_done, seed=seed, replicas=replicas,
+    )
+    return collect_rows(results)
+
+def collect_rows(results: List[ProductResult]):
+    """Merge columnar results into (stocks, sales, buy_orders, checkpoints)."""
+    metrics.observe_products(results)
+    all_stocks = []
+    all_sales = []
+    all_buy_orders = []
+    for result in results:
+        all_stocks.extend(result.stock_rows())
+        all_sales.extend(result.sales_rows())
+        all_buy_orders.extend(result.buy_order_rows())
+    return all_stocks, all_sales, all_buy_orders, [r.checkpoint for r in results]
+
+def roll_forward_products(checkpoints: List[ProductCheckpoint], days: Optional[int]) -> List[ProductResult]:
+    """Continue each checkpointed product for `days` days (default: up to and including yesterday)."""
+    simulator = SupplyChainSimulator()
+    today = datetime.now().date()
+    results = []
+    for cp in checkpoints:
+        n = days if days is not None else (today - cp.next_date.date()).days
+        if n > 0:
+            results.append(simulator.roll_forward(cp, n))
+    return results
+
+def simulation_response(all_stocks, all_sales, all_buy_orders, message: str = "Simulation complete", **extra) -> Dict[str, Any]:
+    # api_payloads go to the Optiply Public API: pushed by the service (?push=true, src/push.py) or by the caller.
+    return {
+        "message": message,
+        **extra,
+        "record_counts": {
+            "stocks": len(all_stocks),
+            "sales": len(all_sales),
+            "buy_orders": len(all_buy_orders)
+        },
+        "api_payloads": {
+            "sales": all_sales,
+            "buy_orders": all_buy_orders
+        },
+        "note": "POST api_payloads.sales and api_payloads.buy_orders to Optiply Public API within its rate limit, or let the service push them: /simulate?background=true&push=true or POST /jobs/{job_id}/push.",
+    }
+
+async def push_job_payloads(job: Job, api_payloads: Dict[str, List[Dict[str, Any]]]) -> None:
+    """Push a job's api_payloads to the Public API, resuming its previous push (delivered requests are skipped)."""
+    job.pushing = True
+    try:
+        job.push_progress = await public_api.push_payloads(job.webshop_id, api_payloads, job.push_progress)
+    finally:
+        job.pushing = False
+        jobs.trim()
+
+async def run_simulation_job(
+    job: Job, config: ShopConfig, products: List[ProductInput], seed: int, replicas: int = 1, push: bool = False
+):
+    """Background worker for /simulate?background=true: simulate, wipe + insert, optionally push the api_payloads,
+    keep the response as the job result."""
+    job.start()
+    timer = metrics.PhaseTimer("simulate_job")
+    failure = "Simulation failed"
+    try:
+        job.enter_phase("simulating")
+        with timer.phase("simulate"):
+            all_stocks, all_sales, all_buy_orders, checkpoints = await run_in_threadpool(
+                simulate_products, products, seed, job.product_done, config, replicas
+            )
+        failure = "Database update failed"
+        job.enter_phase("writing")
+        with timer.phase("write"):
+            stats = await db.wipe_and_insert_stocks(config.webshop_id, all_stocks, checkpoints=checkpoints)
+        job.rows_written = stats["rows"] if stats else 0
+        response = simulation_response(all_stocks, all_sales, all_buy_orders, seed=seed, replicas=replicas)
+        if push:
+            failure = "Public API push failed"
+            job.enter_phase("pushing")
+            # Kept even if the push dies, so POST /jobs/{id}/push can resume it
+            job.result, job.push_progress = response, public_api.PushProgress()
+            with timer.phase("push"):
+                await push_job_payloads(job, response["api_payloads"])
+        job.succeed(response)
+        timer.log(job_id=job.id, webshop_id=config.webshop_id, products=len(products), db=stats)
+    except Exception as e:
+        logger.exception(f"Simulation job {job.id} failed")
+        job.fail(f"{failure}: {e!s}")
+    jobs.trim()
 
 @app.get("/")
 async def root():
-    return {"status": "active", "shop": 1380}
+    return {"status": "active", "shop": DEMO_SHOP_ID, "shops": sorted(shops)}
 
 
 @app.get("/health")
@@ -58,96 +299,356 @@ async def health():
             content={"status": "unhealthy", "detail": "DATABASE_URL not set"},
             status_code=503,
         )
-    if not db.check_connection():
+    if not await db.check_connection():
         return JSONResponse(
             content={"status": "unhealthy", "detail": "Database unreachable"},
             status_code=503,
         )
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format: per-phase / per-archetype latency, DB write throughput and pool wait, payload sizes."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/simulate")
-async def run_simulation(request: SimulationRequest, background_tasks: BackgroundTasks):
+async def run_simulation(
+    request: SimulationRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    background: bool = Query(False, description="Return a job id immediately and run in the background; poll /jobs/{job_id}"),
+    push: bool = Query(False, description="With background=true: also POST the api_payloads to the Optiply Public API"),
+):
     """
     Triggers Phase A: The Creator.
     Wipes history and generates new 365-day synthetic data.
     """
-    if request.webshop_id != 1380:
-        raise HTTPException(status_code=403, detail="Unauthorized Shop ID")
-    if not db.engine:
-        raise HTTPException(status_code=503, detail="Database not configured (DATABASE_URL not set).")
+    timer = metrics.PhaseTimer("simulate", http_request.state.started)
+    # 1. Filter to the shop's whitelisted products only (spec §5)
+    config, products_to_run = validate_simulation_request(request)
+    seed = run_seed(request, config)
+    replicas = run_replicas(request, config)
+    if push:
+        if not background:
+            raise HTTPException(status_code=400, detail="push=true requires background=true")
+        require_push()
 
-    # 1. Filter to whitelisted products only (spec §5)
-    products_to_run = [p for p in request.products if p.id in DEMO_PRODUCT_WHITELIST]
-    skipped = [p.id for p in request.products if p.id not in DEMO_PRODUCT_WHITELIST]
-    if skipped:
-        logger.warning(f"Skipping non-whitelisted product IDs: {skipped}")
-    if not products_to_run:
-        raise HTTPException(
-            status_code=400,
-            detail="No whitelisted products in request. Only product IDs in the demo whitelist may be simulated."
+    if background:
+        job = jobs.create(request.webshop_id, len(products_to_run))
+        background_tasks.add_task(run_simulation_job, job, config, products_to_run, seed, replicas, push)
+        return JSONResponse(
+            content={"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}", "seed": seed},
+            status_code=202,
         )
 
-    # 2. Parse Archetypes from names
-    def get_scenario(name: str) -> str:
-        if "(" in name and ")" in name:
-            return name.split("(")[1].split(")")[0]
-        return "Stable Fast"
-
-    # 3. Run simulation in memory first (no partial state if DB fails)
-    simulator = SupplyChainSimulator()
-    all_stocks = []
-    all_sales = []
-    all_buy_orders = []
+    # 2. Run simulation in memory first (no partial state if DB fails), off the event loop
     try:
-        for p in products_to_run:
-            scenario = get_scenario(p.name)
-            results = simulator.simulate_product(p.model_dump(), scenario)
-            all_stocks.extend(results['stocks'])
-            all_sales.extend(results['sales'])
-            all_buy_orders.extend(results['buy_orders'])
+        with timer.phase("simulate"):
+            all_stocks, all_sales, all_buy_orders, checkpoints = await run_in_threadpool(
+                profiling.profiled(simulate_products), products_to_run, seed, None, config, replicas
+            )
     except Exception as e:
         logger.exception("Simulation failed")
         raise HTTPException(status_code=500, detail=f"Simulation failed: {e!s}") from e
 
-    # 4. Single transaction: wipe then insert (avoids wipe-without-insert on failure)
+    # 3. Single transaction: wipe then insert (avoids wipe-without-insert on failure)
     try:
-        logger.info(f"Wiping and inserting {len(all_stocks)} stock records for shop 1380")
-        db.wipe_and_insert_stocks(request.webshop_id, all_stocks)
+        logger.info(f"Replacing stocks with {len(all_stocks)} stock records for shop {request.webshop_id}")
+        with timer.phase("write"):
+            stats = await db.wipe_and_insert_stocks(request.webshop_id, all_stocks, checkpoints=checkpoints)
     except Exception as e:
         logger.exception("Database wipe/insert failed")
         raise HTTPException(status_code=500, detail=f"Database update failed: {e!s}") from e
 
-    # Retool/caller should POST api_payloads to Optiply Public API in batches with delay to respect rate limits (spec §5).
-    return {
-        "message": "Simulation complete",
+    response = timer.json_response(simulation_response(all_stocks, all_sales, all_buy_orders, seed=seed, replicas=replicas))
+    timer.log(webshop_id=request.webshop_id, products=len(products_to_run), db=stats)
+    return response
+
+# Stream producers (simulate + stock write) outlive their response: a client that disconnects or stops
+# reading does not cancel the write. Awaited at shutdown.
+stream_writes: Set[asyncio.Task] = set()
+
+def start_stream(
+    config: ShopConfig, products: List[ProductInput], seed: int, replicas: int = 1,
+    timer: Optional[metrics.PhaseTimer] = None,
+) -> StreamFeed:
+    """Simulate (on the process pool) and write stocks in a task of its own. The returned feed receives
+    ("result", ProductResult) per product in order, then ("simulated", None), then ("done", summary) or ("error", detail)."""
+    feed = StreamFeed()
+    task = asyncio.get_running_loop().create_task(
+        produce_stream(config, products, seed, replicas, timer or metrics.PhaseTimer("simulate_stream"), feed)
+    )
+    stream_writes.add(task)
+    task.add_done_callback(stream_writes.discard)
+    return feed
+
+async def produce_stream(
+    config: ShopConfig, products: List[ProductInput], seed: int, replicas: int, timer: metrics.PhaseTimer,
+    feed: StreamFeed,
+) -> None:
+    loop = asyncio.get_running_loop()
+    webshop_id = config.webshop_id
+    try:
+        with timer.phase("simulate"):
+            results = await run_in_threadpool(
+                simulate_parallel, product_tasks(products, config), history_days=config.history_days, seed=seed,
+                replicas=replicas, on_result=lambda _, result: loop.call_soon_threadsafe(feed.put, "result", result),
+            )
+        metrics.observe_products(results)
+    except Exception as e:
+        logger.exception("Streaming simulation failed")
+        feed.put("error", f"Simulation failed: {e!s}")
+        return
+    feed.put("simulated")
+
+    # Single transaction: wipe then insert, only once every product simulated. Results stay columnar until here.
+    try:
+        all_stocks = await run_in_threadpool(lambda: [row for result in results for row in result.stock_rows()])
+        logger.info(f"Replacing stocks with {len(all_stocks)} stock records for shop {webshop_id}")
+        with timer.phase("write"):
+            stats = await db.wipe_and_insert_stocks(webshop_id, all_stocks, checkpoints=[r.checkpoint for r in results])
+    except Exception as e:
+        logger.exception("Database wipe/insert failed")
+        feed.put("error", f"Database update failed: {e!s}")
+        return
+    timer.log(webshop_id=webshop_id, products=len(products), db=stats)
+    feed.put("done", {"stocks": len(all_stocks)})
+
+async def stream_lines(feed: StreamFeed, batch_size: int, seed: int, replicas: int = 1):
+    """NDJSON body for /simulate/stream: payload batches as products finish, then a summary after the stock write.
+    Closes the feed when the response ends, so results of a client that went away are not buffered."""
+    try:
+        async for line in _stream_lines(feed, batch_size, seed, replicas):
+            yield line
+    finally:
+        feed.close()
+
+async def _stream_lines(feed: StreamFeed, batch_size: int, seed: int, replicas: int):
+    batcher = PayloadBatcher(batch_size)
+    while True:
+        kind, value = await feed.get()
+        if kind == "result":
+            for line in batcher.add("sales", value.sales_rows()):
+                yield line
+            for line in batcher.add("buy_orders", value.buy_order_rows()):
+                yield line
+        elif kind == "simulated":
+            for line in batcher.flush():
+                yield line
+        elif kind == "error":
+            yield ndjson_line({"type": "error", "detail": value})
+            return
+        else:
+            yield ndjson_line({
+                "type": "summary",
+                "message": "Simulation complete",
+                "committed": True,
+                "seed": seed,
+                "replicas": replicas,
+                "record_counts": {
+                    "stocks": value["stocks"],
+                    "sales": batcher.item_counts.get("sales", 0),
+                    "buy_orders": batcher.item_counts.get("buy_orders", 0),
+                },
+                "batches": batcher.batch_counts,
+            })
+            return
+
+@app.post("/simulate/stream")
+async def run_simulation_stream(
+    request: SimulationRequest,
+    http_request: Request,
+    batch_size: int = Query(PAYLOAD_BATCH_SIZE, ge=1, le=10000, description="Payload items per NDJSON line"),
+):
+    """
+    Phase A (Creator) with api_payloads streamed as NDJSON.
+    Lines: {"type": "sales" | "buy_orders", "batch": n, "committed": false, "items": [...]} as products finish,
+    then {"type": "summary", "committed": true, ...} after the stock write (or {"type": "error", ...}).
+    Payload batches precede the write: do not push them to the Public API before the summary line arrives,
+    since after an error line their stocks were never written.
+    """
+    timer = metrics.PhaseTimer("simulate_stream", http_request.state.started)
+    config, products_to_run = validate_simulation_request(request)
+    seed = run_seed(request, config)
+    replicas = run_replicas(request, config)
+    feed = start_stream(config, products_to_run, seed, replicas, timer)
+    return StreamingResponse(stream_lines(feed, batch_size, seed, replicas), media_type=NDJSON_MEDIA_TYPE)
+
+def simulate_shop_batch(runs: List[Tuple[ShopConfig, List[ProductInput], int, int]]):
+    """Simulate every (config, products, seed, replicas) shop in one simulate_shops pass.
+    Returns (stocks, sales, buy_orders, checkpoints) per shop."""
+    batches = [
+        (product_tasks(products, config), config.history_days, seed, replicas) for config, products, seed, replicas in runs
+    ]
+    return [collect_rows(results) for results in simulate_shops(batches)]
+
+@app.post("/simulate/batch")
+async def run_simulation_batch(request: BatchSimulationRequest, http_request: Request):
+    """
+    Phase A (Creator) for several shops in one pass. Every shop is validated up front, all shops'
+    products are simulated together (one process-pool pass) and every shop's stocks are wiped and
+    inserted in a single transaction. Response: per-shop seed / record_counts / api_payloads under "shops".
+    """
+    timer = metrics.PhaseTimer("simulate_batch", http_request.state.started)
+    webshop_ids = [r.webshop_id for r in request.shops]
+    if len(set(webshop_ids)) != len(webshop_ids):
+        raise HTTPException(status_code=400, detail="Each webshop_id may appear only once per batch")
+    runs = []
+    for shop_request in request.shops:
+        config, products_to_run = validate_simulation_request(shop_request)
+        runs.append((config, products_to_run, run_seed(shop_request, config), run_replicas(shop_request, config)))
+
+    try:
+        with timer.phase("simulate"):
+            per_shop = await run_in_threadpool(simulate_shop_batch, runs)
+    except Exception as e:
+        logger.exception("Batch simulation failed")
+        raise HTTPException(status_code=500, detail=f"Simulation failed: {e!s}") from e
+
+    try:
+        logger.info(f"Replacing stocks with {sum(len(rows[0]) for rows in per_shop)} stock records for shops {webshop_ids}")
+        with timer.phase("write"):
+            stats = await db.wipe_and_insert_shops([
+                (config.webshop_id, stocks, checkpoints)
+                for (config, _, _, _), (stocks, _, _, checkpoints) in zip(runs, per_shop)
+            ])
+    except Exception as e:
+        logger.exception("Batch database wipe/insert failed")
+        raise HTTPException(status_code=500, detail=f"Database update failed: {e!s}") from e
+
+    shop_responses = [
+        simulation_response(stocks, sales, buy_orders, webshop_id=config.webshop_id, seed=seed, replicas=replicas)
+        for (config, _, seed, replicas), (stocks, sales, buy_orders, _) in zip(runs, per_shop)
+    ]
+    response = timer.json_response({
+        "message": "Batch simulation complete",
         "record_counts": {
-            "stocks": len(all_stocks),
-            "sales": len(all_sales),
-            "buy_orders": len(all_buy_orders)
-        },
-        "api_payloads": {
-            "sales": all_sales,
-            "buy_orders": all_buy_orders
+            kind: sum(r["record_counts"][kind] for r in shop_responses) for kind in ("stocks", "sales", "buy_orders")
         },
-        "note": "POST api_payloads.sales and api_payloads.buy_orders to Optiply Public API in batches with delay (e.g. 100–200ms between requests) to respect rate limits.",
-    }
+        "shops": shop_responses,
+    })
+    timer.log(webshop_ids=webshop_ids, products=sum(len(products) for _, products, _, _ in runs), db=stats)
+    return response
+
+RESULT_RELEASED = "Job result was released to bound memory (MAX_RETAINED_JOB_ROWS); run the simulation again"
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a background /simulate job: phase, progress (products done / total, rows written) and timings."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Full /simulate response of a finished background job (record_counts, api_payloads)."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status} (phase: {job.phase})")
+    if job.error:
+        raise HTTPException(status_code=409, detail=job.error)
+    if job.result_released:
+        raise HTTPException(status_code=410, detail=RESULT_RELEASED)
+    return job.result
+
+@app.post("/jobs/{job_id}/push")
+async def push_job(job_id: str, background_tasks: BackgroundTasks):
+    """(Re)push a finished job's api_payloads to the Optiply Public API; requests delivered before are skipped."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    require_push()
+    if job.pushing:
+        raise HTTPException(status_code=409, detail="Job is already pushing")
+    if job.result_released:
+        raise HTTPException(status_code=410, detail=RESULT_RELEASED)
+    if job.result is None:
+        raise HTTPException(status_code=409, detail=job.error or f"Job is still {job.status} (phase: {job.phase})")
+    job.pushing = True  # Claimed now: a second request before the task starts gets 409
+    background_tasks.add_task(push_job_payloads, job, job.result["api_payloads"])
+    return JSONResponse(content={"job_id": job.id, "status_url": f"/jobs/{job.id}"}, status_code=202)
+
+@app.post("/roll-forward")
+async def run_roll_forward(
+    webshop_id: int = Query(..., description="Webshop ID (a configured demo shop, e.g. 1380)"),
+    days: Optional[int] = Query(None, ge=1, le=366, description="Days to simulate per product (default: since each product's checkpoint, up to yesterday)"),
+):
+    """
+    Daily upkeep without regeneration: continue every product from its last checkpoint,
+    append the new stock days and return the new sales / buy orders as api_payloads.
+    """
+    shop_config(webshop_id)
+    require_db()
+    timer = metrics.PhaseTimer("roll_forward")
+    checkpoints = await db.load_checkpoints(webshop_id)
+    if not checkpoints:
+        raise HTTPException(status_code=409, detail="No simulation checkpoint for this shop; run /simulate first.")
+    # /maintain (shift, chunked or offset) moves the history past the checkpoints: appending from them would
+    # write days the shifted data already covers.
+    latest_stock_date, offset_days = await db.stock_position(webshop_id)
+    if offset_days > 0 or (latest_stock_date is not None and latest_stock_date >= min(cp.next_date for cp in checkpoints)):
+        raise HTTPException(
+            status_code=409,
+            detail="Checkpoints are stale: /maintain moved this shop's dates since the last /simulate; run /simulate first.",
+        )
+
+    try:
+        with timer.phase("simulate"):
+            results = await run_in_threadpool(roll_forward_products, checkpoints, days)
+            all_stocks, all_sales, all_buy_orders, new_checkpoints = await run_in_threadpool(collect_rows, results)
+    except Exception as e:
+        logger.exception("Roll-forward failed")
+        raise HTTPException(status_code=500, detail=f"Simulation failed: {e!s}") from e
+
+    try:
+        logger.info(f"Appending {len(all_stocks)} stock records for {len(results)} products of shop {webshop_id}")
+        with timer.phase("write"):
+            stats = await db.append_stocks(webshop_id, all_stocks, new_checkpoints)
+    except Exception as e:
+        logger.exception("Roll-forward write failed")
+        raise HTTPException(status_code=500, detail=f"Database update failed: {e!s}") from e
+
+    response = timer.json_response(simulation_response(
+        all_stocks, all_sales, all_buy_orders,
+        message="Roll-forward complete",
+        products_advanced=len(results),
+    ))
+    timer.log(webshop_id=webshop_id, products=len(results), db=stats)
+    return response
 
 @app.post("/maintain")
-async def run_maintenance(webshop_id: int = Query(..., description="Webshop ID (must be 1380 for demo)")):
+async def run_maintenance(
+    webshop_id: int = Query(..., description="Webshop ID (a configured demo shop, e.g. 1380)"),
+    mode: Literal["shift", "offset", "chunked"] = Query(MAINTENANCE_MODE, description="shift: rewrite row dates; offset: advance the per-shop date offset read by the *_shifted views; chunked: rewrite row dates in resumable, lock-bounded chunks"),
+):
     """
     Triggers Phase B: The Maintainer.
-    Shifts all dates forward to today.
+    Shifts all dates forward to today (physically, or virtually via the per-shop date offset).
     """
-    if webshop_id != 1380:
-        raise HTTPException(status_code=403, detail="Unauthorized Shop ID")
-    if not db.engine:
-        raise HTTPException(status_code=503, detail="Database not configured (DATABASE_URL not set).")
+    shop_config(webshop_id)
+    require_db()
+    if db.write_mode == "generation":
+        # Every mode moves the dates of `stocks`, which generation mode no longer writes
+        raise HTTPException(
+            status_code=409,
+            detail="/maintain shifts stocks, which STOCK_WRITE_MODE=generation does not write; use /roll-forward for daily upkeep",
+        )
     try:
-        db.run_maintenance_shift(webshop_id)
+        if mode == "offset":
+            offset_days = await db.run_maintenance_offset(webshop_id)
+            logger.info(f"Date offset for shop {webshop_id} is now {offset_days} days")
+            return {"status": "Maintenance complete", "shop": webshop_id, "mode": mode, "offset_days": offset_days}
+        if mode == "chunked":
+            report = await db.run_maintenance_chunked(webshop_id)
+            return {"status": "Maintenance complete", "shop": webshop_id, "mode": mode, "shift": report}
+        await db.run_maintenance_shift(webshop_id)
     except Exception as e:
-        logger.exception("Maintenance shift failed")
+        logger.exception("Maintenance failed")
         raise HTTPException(status_code=500, detail=f"Maintenance failed: {e!s}") from e
-    return {"status": "Maintenance complete", "shop": webshop_id}
+    return {"status": "Maintenance complete", "shop": webshop_id, "mode": mode}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,217 @@
+"""
+In-process metrics in the Prometheus text format (GET /metrics), stdlib only so importing it costs nothing
+at cold start. Per-phase timings of the endpoints (request parse, simulation per archetype, serialization),
+the DB write (wipe / diff / insert / swap, rows per second, pool wait) and response payload sizes.
+Every request also logs one JSON line with its own numbers (PhaseTimer.log), so a slow /simulate can be
+attributed to the simulator, PostgreSQL or JSON encoding from logs alone.
+
+Values are per process: with several uvicorn workers / Cloud Run instances, scrape each (or aggregate).
+"""
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key: Tuple[str, ...], value: Any) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels) -> Optional[float]:
+        return self._values.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = SECONDS_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        counts, _ = self._values.get(self._key(labels)) or ([0], 0.0)
+        return sum(counts)
+
+    def _samples(self, key: Tuple[str, ...], value: Any) -> List[str]:
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = (("le", _format_value(bound)),)
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+REQUEST_SECONDS = Histogram(
+    "demo_sim_request_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+PHASE_SECONDS = Histogram(
+    "demo_sim_phase_seconds", "Endpoint phase latency (parse, simulate, write, serialize, ...).", ("endpoint", "phase")
+)
+ARCHETYPE_SECONDS = Histogram(
+    "demo_sim_product_seconds", "Simulation time of one product by archetype (incl. ensemble replicas).", ("archetype",)
+)
+DB_PHASE_SECONDS = Histogram(
+    "demo_sim_db_seconds", "Stock write steps: wipe, diff, insert, delete, swap.", ("operation",)
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "demo_sim_db_pool_wait_seconds", "Time to check a connection out of the pool (incl. pre-ping / connect)."
+)
+ROWS_WRITTEN = Counter("demo_sim_rows_written_total", "Stock rows written.", ("method",))
+ROWS_PER_SECOND = Gauge("demo_sim_rows_written_per_second", "Throughput of the last stock load.", ("method",))
+PAYLOAD_BYTES = Histogram("demo_sim_payload_bytes", "JSON response body size.", ("endpoint",), buckets=BYTES_BUCKETS)
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+
+def record_load(method: Optional[str], rows: int, seconds: float) -> None:
+    if not rows or method is None:
+        return
+    ROWS_WRITTEN.inc(rows, method=method)
+    if seconds > 0:
+        ROWS_PER_SECOND.set(rows / seconds, method=method)
+
+
+def observe_products(results: Iterable[Any]) -> None:
+    """Per-archetype simulation time of ProductResults (sim_seconds measured in the worker)."""
+    from src.scenarios import archetype_for
+
+    for result in results:
+        ARCHETYPE_SECONDS.observe(result.sim_seconds, archetype=archetype_for(result.scenario))
+
+
+class PhaseTimer:
+    """Phase timings of one request: fed into PHASE_SECONDS and logged once as a JSON line (log())."""
+
+    def __init__(self, endpoint: str, request_started: Optional[float] = None):
+        self.endpoint = endpoint
+        self.phases: Dict[str, float] = {}
+        self.fields: Dict[str, Any] = {}
+        if request_started is not None:
+            # Body read + validation happen before the handler runs
+            self.record("parse", time.perf_counter() - request_started)
+
+    def record(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        PHASE_SECONDS.observe(seconds, endpoint=self.endpoint, phase=phase)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def json_response(self, content: Any, status_code: int = 200):
+        """Serialize under the "serialize" phase and record the payload size."""
+        from fastapi.responses import JSONResponse
+
+        with self.phase("serialize"):
+            response = JSONResponse(content=content, status_code=status_code)
+        self.fields["payload_bytes"] = len(response.body)
+        PAYLOAD_BYTES.observe(len(response.body), endpoint=self.endpoint)
+        return response
+
+    def log(self, **fields) -> None:
+        self.fields.update(fields)
+        line = {"event": self.endpoint, "phases": {k: round(v, 4) for k, v in self.phases.items()}, **self.fields}
+        logger.info(json.dumps(line, default=str))
@@ -0,0 +1,157 @@
+"""
+Multi-core product simulation: products are fanned out in chunks over a warm process pool that is
+reused between requests, and results are merged back in request (product) order.
+Workers return columnar ProductResults (a few NumPy arrays per product), which keeps the IPC payload small.
+Scenario specs hold closures, so workers receive scenario labels and compile them locally (cached per worker).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.results import ProductResult
+from src.scenarios import compile_scenario
+from src.simulation import SupplyChainSimulator
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for /simulate (0 or 1 = simulate in-process). Typically the instance's vCPU count.
+SIM_WORKERS = int(os.getenv("SIM_WORKERS", "0"))
+# Products per task sent to a worker (amortizes pickling / IPC per product).
+SIM_CHUNK_SIZE = int(os.getenv("SIM_CHUNK_SIZE", "16"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# (product_data, scenario_label)
+ProductTask = Tuple[Dict[str, Any], str]
+# One shop's run: (tasks, history_days, seed, replicas)
+ShopBatch = Tuple[List[ProductTask], int, Optional[int], int]
+
+
+def _simulate_chunk(
+    history_days: int, start_date: datetime, seed: Optional[int], tasks: List[ProductTask], replicas: int = 1
+) -> List[ProductResult]:
+    """Worker entry point: simulate a chunk of products with a shared start date and run seed."""
+    simulator = SupplyChainSimulator(history_days=history_days, start_date=start_date, seed=seed, replicas=replicas)
+    return [simulator.simulate_product_columnar(product_data, compile_scenario(label)) for product_data, label in tasks]
+
+
+def _warm() -> int:
+    """No-op task that forces a worker to start and finish its imports."""
+    return os.getpid()
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared warm pool; recreated only when the worker count changes."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: the parent runs uvicorn + threadpool threads, which fork does not copy safely
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def warm_up(workers: int = SIM_WORKERS) -> None:
+    """Start every worker ahead of the first request (call from app startup)."""
+    if workers <= 1:
+        return
+    pool = get_pool(workers)
+    pids = set(pool.map(_warm, range(workers)))
+    logger.info(f"Simulation pool warm: {len(pids)} worker processes")
+
+
+def shutdown_pool() -> None:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+
+def simulate_parallel(
+    tasks: List[ProductTask],
+    history_days: int = 365,
+    start_date: Optional[datetime] = None,
+    workers: int = SIM_WORKERS,
+    chunk_size: int = SIM_CHUNK_SIZE,
+    on_product_done: Optional[Callable[[int], None]] = None,
+    seed: Optional[int] = None,
+    replicas: int = 1,
+    on_result: Optional[Callable[[int, ProductResult], None]] = None,
+) -> List[ProductResult]:
+    """simulate_product_columnar for every (product_data, scenario_label), in input order.
+    Runs in-process when workers <= 1 or everything fits in one chunk.
+    on_result(index, result) sees each result as soon as it (and every earlier product) is done.
+    With a seed, results are identical for any workers / chunk_size (per-product random streams)."""
+    if start_date is None:
+        start_date = SupplyChainSimulator(history_days=history_days).start_date
+    chunk_size = max(1, chunk_size)
+    chunks = [tasks[i : i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        results = []
+        simulator = SupplyChainSimulator(history_days=history_days, start_date=start_date, seed=seed, replicas=replicas)
+        for i, (product_data, label) in enumerate(tasks):
+            results.append(simulator.simulate_product_columnar(product_data, compile_scenario(label)))
+            if on_result:
+                on_result(i, results[-1])
+            if on_product_done:
+                on_product_done(i)
+        return results
+
+    pool = get_pool(workers)
+    futures = [pool.submit(_simulate_chunk, history_days, start_date, seed, chunk, replicas) for chunk in chunks]
+    results = []
+    # Collect in submission order so the merge is deterministic regardless of completion order
+    for future in futures:
+        for result in future.result():
+            results.append(result)
+            if on_result:
+                on_result(len(results) - 1, result)
+            if on_product_done:
+                on_product_done(len(results) - 1)
+    return results
+
+
+def simulate_shops(
+    batches: List[ShopBatch],
+    workers: int = SIM_WORKERS,
+    chunk_size: int = SIM_CHUNK_SIZE,
+) -> List[List[ProductResult]]:
+    """simulate_parallel for several shops in one pass: the chunks of every shop go to the pool together,
+    so small shops keep all workers busy. Shops with the same horizon share a start date.
+    Returns each shop's results in input order (identical to per-shop simulate_parallel with that start date)."""
+    start_dates: Dict[int, datetime] = {}
+    for _, history_days, _, _ in batches:
+        start_dates.setdefault(history_days, SupplyChainSimulator(history_days=history_days).start_date)
+    chunk_size = max(1, chunk_size)
+    chunks = [
+        (b, tasks[i : i + chunk_size])
+        for b, (tasks, _, _, _) in enumerate(batches)
+        for i in range(0, len(tasks), chunk_size)
+    ]
+
+    if workers <= 1 or len(chunks) <= 1:
+        return [
+            simulate_parallel(tasks, history_days, start_dates[history_days], workers=1, seed=seed, replicas=replicas)
+            for tasks, history_days, seed, replicas in batches
+        ]
+
+    pool = get_pool(workers)
+    futures = []
+    for b, chunk in chunks:
+        _, history_days, seed, replicas = batches[b]
+        futures.append((b, pool.submit(_simulate_chunk, history_days, start_dates[history_days], seed, chunk, replicas)))
+    results: List[List[ProductResult]] = [[] for _ in batches]
+    for b, future in futures:
+        results[b].extend(future.result())
+    return results
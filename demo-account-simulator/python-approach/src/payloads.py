@@ -0,0 +1,84 @@
+"""
+NDJSON framing for streamed api_payloads: sales and buy orders are emitted in API-sized batches
+as products finish simulating, so the service never holds the whole year of payloads in memory.
+Batches go out before the stock write and carry "committed": false; the caller may build its Public
+API requests from them but must not POST any until the summary line (the write succeeded) arrives.
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Items per NDJSON line (one Public API batch).
+PAYLOAD_BATCH_SIZE = int(os.getenv("PAYLOAD_BATCH_SIZE", "100"))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_line(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, separators=(",", ":"), default=str) + "\n"
+
+
+class PayloadBatcher:
+    """Buffers payload items per kind ("sales", "buy_orders") and emits one NDJSON line per full batch."""
+
+    def __init__(self, batch_size: int = PAYLOAD_BATCH_SIZE):
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        self.batch_size = batch_size
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._batch_counts: Dict[str, int] = {}
+        self.item_counts: Dict[str, int] = {}
+
+    def _line(self, kind: str, items: List[Dict[str, Any]]) -> str:
+        batch = self._batch_counts.get(kind, 0)
+        self._batch_counts[kind] = batch + 1
+        return ndjson_line({"type": kind, "batch": batch, "committed": False, "items": items})
+
+    def add(self, kind: str, items: List[Dict[str, Any]]) -> Iterator[str]:
+        """Buffer items and yield a line for every full batch."""
+        if not items:
+            return
+        self.item_counts[kind] = self.item_counts.get(kind, 0) + len(items)
+        buf = self._buffers.setdefault(kind, [])
+        buf.extend(items)
+        while len(buf) >= self.batch_size:
+            chunk = buf[: self.batch_size]
+            del buf[: self.batch_size]
+            yield self._line(kind, chunk)
+
+    def flush(self) -> Iterator[str]:
+        """Yield the remaining partial batch of every kind."""
+        for kind, buf in self._buffers.items():
+            if buf:
+                yield self._line(kind, list(buf))
+                buf.clear()
+
+    @property
+    def batch_counts(self) -> Dict[str, int]:
+        return dict(self._batch_counts)
+
+
+class StreamFeed:
+    """Events from a stream's producer task to its response. Once the response is gone (client disconnected)
+    the feed is closed: buffered events are dropped and later ones are not queued."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.open = True
+
+    def put(self, kind: str, value: Any = None) -> None:
+        if self.open:
+            self._queue.put_nowait((kind, value))
+
+    async def get(self) -> Tuple[str, Any]:
+        return await self._queue.get()
+
+    def close(self) -> None:
+        self.open = False
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
@@ -0,0 +1,211 @@
+"""
+Opt-in profiling of single /simulate or /maintain requests, for finding where a slow call on real inputs
+spends its time without an instrumented build. Off unless REQUEST_PROFILING=1; then a request asks for it
+with the header `X-Profile: inline|file` or the query parameter `?profile=inline|file`:
+
+- inline: the JSON response gets a "profile" key with the report
+- file: the report is written to PROFILE_DIR and its path returned in the X-Profile-Path header
+
+The profiler is pyinstrument (sampling, low overhead; in requirements.txt). Without it a flagged request
+fails with 503 instead of running unprofiled or under a different profiler.
+The event-loop thread (handler, DB awaits) is profiled around the request and thread-pool work by wrapping
+it with profiled(); a profiled request simulates in-process (sim_workers()) so its products are visible.
+One request is profiled at a time; others asking meanwhile run unprofiled. Unflagged requests pay nothing.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.parallel import SIM_WORKERS
+
+logger = logging.getLogger(__name__)
+
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/demo-sim-profiles")
+# Hottest functions (by self time) listed in a report, besides the breakdown.
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+# pyinstrument sampling interval (seconds)
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_PATH_HEADER = "X-Profile-Path"
+PROFILED_PATHS = ("/simulate", "/maintain")
+MODES = ("inline", "file")
+
+# Always broken out in the report: the simulator's entry points and every function of the DB layer.
+BREAKDOWN_FUNCTIONS = {
+    "simulation.py": {
+        "simulate_product", "simulate_product_columnar", "roll_forward", "_run",
+        "get_daily_demand", "get_demand_series", "get_demand_matrix",
+    },
+}
+BREAKDOWN_FILES = ("async_database.py", "database.py", "generations.py", "stock_delta.py")
+
+_current: contextvars.ContextVar[Optional["RequestProfiler"]] = contextvars.ContextVar("request_profiler", default=None)
+_busy = threading.Lock()
+
+
+class ProfilerUnavailable(RuntimeError):
+    """REQUEST_PROFILING is on but pyinstrument is not installed."""
+
+
+def _sampler():
+    """pyinstrument's Profiler class (imported on first profiled request, not at startup)."""
+    try:
+        from pyinstrument import Profiler
+    except ImportError as e:
+        raise ProfilerUnavailable("Request profiling needs pyinstrument: pip install pyinstrument") from e
+    return Profiler
+
+
+def requested_mode(path: str, headers: Any, query: Any) -> Optional[str]:
+    """"inline" / "file" when profiling is enabled and this request asks for it, else None."""
+    if not REQUEST_PROFILING or path not in PROFILED_PATHS:
+        return None
+    mode = (headers.get(PROFILE_HEADER) or query.get("profile") or "").strip().lower()
+    return mode if mode in MODES else None
+
+
+def active() -> Optional["RequestProfiler"]:
+    """The running profiler of the current request (not one that finished before e.g. a background task ran)."""
+    profiler = _current.get()
+    return profiler if profiler is not None and profiler.running else None
+
+
+def sim_workers() -> int:
+    """Process-pool workers for the current request: in-process while profiling (pool workers are not profiled)."""
+    return 1 if active() is not None else SIM_WORKERS
+
+
+def profiled(fn: Callable) -> Callable:
+    """fn, run under the current request's profiler in whichever thread calls it (e.g. run_in_threadpool)."""
+    profiler = active()
+    if profiler is None:
+        return fn
+    return lambda *args, **kwargs: profiler.call(fn, *args, **kwargs)
+
+
+def in_breakdown(function: str, path: str) -> bool:
+    name = os.path.basename(path)
+    if name in BREAKDOWN_FILES:
+        return not function.startswith("<")
+    return function in BREAKDOWN_FUNCTIONS.get(name, ())
+
+
+class RequestProfiler:
+    """Profiles one request across the event-loop thread and the worker threads it hands work to."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self._sampler = _sampler()
+        self.backend = "pyinstrument"
+        self._lock = threading.Lock()
+        self._sessions: List[Any] = []
+        self._main = None
+        self._token = None
+        self._started = 0.0
+        self.seconds = 0.0
+        self.running = False
+
+    def _start(self):
+        profiler = self._sampler(interval=PROFILE_INTERVAL, async_mode="disabled")
+        profiler.start()
+        return profiler
+
+    def _stop(self, profiler) -> None:
+        with self._lock:
+            profiler.stop()
+            self._sessions.append(profiler.last_session)
+
+    def start(self) -> bool:
+        """Begin profiling the calling (event-loop) thread. False if another request is being profiled."""
+        if not _busy.acquire(blocking=False):
+            logger.warning(f"Profile of {self.label} skipped: another request is being profiled")
+            return False
+        self._token = _current.set(self)
+        self._started = time.perf_counter()
+        self._main = self._start()
+        self.running = True
+        return True
+
+    def stop(self) -> None:
+        self.running = False
+        try:
+            self._stop(self._main)
+            self.seconds = time.perf_counter() - self._started
+            _current.reset(self._token)
+        finally:
+            _busy.release()
+
+    def call(self, fn: Callable, *args, **kwargs):
+        profiler = self._start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._stop(profiler)
+
+    def functions(self) -> List[Dict[str, Any]]:
+        """Per function: self and total (inclusive) seconds."""
+        totals: Dict[tuple, Dict[str, Any]] = {}
+
+        def walk(frame, on_stack):
+            key = (frame.file_path or "", frame.line_no or 0, frame.function or "")
+            row = totals.setdefault(key, {
+                "function": key[2], "file": key[0], "line": key[1], "self_seconds": 0.0, "total_seconds": 0.0,
+            })
+            row["self_seconds"] += frame.total_self_time
+            if key not in on_stack:  # Recursion: count the outermost frame only
+                row["total_seconds"] += frame.time
+            for child in frame.children:
+                walk(child, on_stack | {key})
+
+        for session in self._sessions:
+            root = session.root_frame() if session is not None else None
+            if root is not None:
+                walk(root, frozenset())
+        return list(totals.values())
+
+    def report(self) -> Dict[str, Any]:
+        rows = self.functions()
+        for row in rows:
+            row["self_seconds"] = round(row["self_seconds"], 6)
+            row["total_seconds"] = round(row["total_seconds"], 6)
+        breakdown = [r for r in rows if in_breakdown(r["function"], r["file"])]
+        return {
+            "label": self.label,
+            "backend": self.backend,
+            "seconds": round(self.seconds, 6),
+            "breakdown": sorted(breakdown, key=lambda r: -r["total_seconds"]),
+            "top": sorted(rows, key=lambda r: -r["self_seconds"])[:PROFILE_TOP],
+        }
+
+    def write(self, directory: Optional[str] = None) -> str:
+        """Report as JSON under `directory` (default PROFILE_DIR); returns the file path."""
+        directory = directory or PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", self.label).strip("-")
+        path = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{slug}-{os.getpid()}-{id(self):x}.json")
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1)
+        return path
+
+
+async def attach(response, profiler: RequestProfiler, mode: str):
+    """The response with the report: as a "profile" key of its JSON object body (inline), else written to a file."""
+    from fastapi.responses import JSONResponse, Response
+
+    if mode == "inline" and response.headers.get("content-type", "").startswith("application/json"):
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        content = json.loads(body)
+        headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+        if isinstance(content, dict):
+            content["profile"] = profiler.report()
+            return JSONResponse(content=content, status_code=response.status_code, headers=headers)
+        response = Response(body, status_code=response.status_code, headers=headers, media_type="application/json")
+    response.headers[PROFILE_PATH_HEADER] = profiler.write()
+    return response
@@ -0,0 +1,304 @@
+"""
+Push stage for api_payloads: POST sales and buy orders to the Optiply Public API from the service instead
+of one serial, fixed-delay request at a time in Retool. One pooled keep-alive client, a token bucket at the
+API's rate limit, a bounded number of requests in flight, and retry with exponential backoff on 429 / 5xx
+(honouring Retry-After) and on connection failures. Other transport errors (e.g. a read timeout) are not
+retried: the API may have created the order already, so the request is reported as failed instead.
+Progress is keyed by a hash of each request body, so an interrupted push resumes where it stopped and
+skips every delivered order; a resume re-posts failed requests, so check those before resuming.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+OPTIPLY_API_URL = os.getenv("OPTIPLY_API_URL", "https://api.optiply.com/v1")
+# Bearer token for the Public API; the push stage is disabled without it.
+OPTIPLY_API_TOKEN = os.getenv("OPTIPLY_API_TOKEN")
+# Token bucket: sustained requests per second and burst size (set to the API's rate limit).
+PUSH_RATE_PER_SEC = float(os.getenv("PUSH_RATE_PER_SEC", "10"))
+PUSH_BURST = int(os.getenv("PUSH_BURST", "10"))
+# Requests in flight (also the connection pool size).
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", "8"))
+# Retries per request on 429 / 5xx / connection errors, with exponential backoff from PUSH_BACKOFF_SECONDS.
+PUSH_MAX_RETRIES = int(os.getenv("PUSH_MAX_RETRIES", "5"))
+PUSH_BACKOFF_SECONDS = float(os.getenv("PUSH_BACKOFF_SECONDS", "0.5"))
+PUSH_TIMEOUT_SECONDS = float(os.getenv("PUSH_TIMEOUT_SECONDS", "30"))
+
+JSON_API_MEDIA_TYPE = "application/vnd.api+json"
+# api_payloads kind -> Public API resource
+RESOURCES = {"sales": "sellOrders", "buy_orders": "buyOrders"}
+
+
+def _iso_z(value: str) -> str:
+    """'YYYY-MM-DD[ HH:MM:SS]' or ISO -> 'YYYY-MM-DDTHH:MM:SSZ' (same rule as the Retool body builders)."""
+    s = str(value).strip()
+    if "T" not in s:
+        s = s.replace(" ", "T") if " " in s else s + "T00:00:00"
+    return s if s.endswith("Z") else s + "Z"
+
+
+def sell_order_body(sale: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON:API body for POST /sellOrders from one api_payloads.sales item."""
+    quantity = int(sale["quantity"])
+    subtotal = round(quantity * float(sale.get("price") or 0), 2)
+    return {
+        "data": {
+            "type": "sellOrders",
+            "attributes": {
+                "placed": _iso_z(sale.get("iso_date") or sale["date"]),
+                "totalValue": subtotal,
+                "orderLines": [{"productId": int(sale["product_id"]), "quantity": quantity, "subtotalValue": subtotal}],
+            },
+        }
+    }
+
+
+def buy_order_body(order: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON:API body for POST /buyOrders from one api_payloads.buy_orders item (mirrors build_buy_order_api_bodies.js)."""
+    quantity = int(order["quantity"])
+    subtotal = round(quantity * float(order.get("unit_cost") or 0), 2)
+    expected = _iso_z(order["expected_delivery"])
+    return {
+        "data": {
+            "type": "buyOrders",
+            "attributes": {
+                "orderLines": [{
+                    "quantity": quantity, "subtotalValue": subtotal,
+                    "productId": int(order["product_id"]), "expectedDeliveryDate": expected,
+                }],
+                "placed": _iso_z(order["placed"]),
+                "expectedDeliveryDate": expected,
+                "totalValue": subtotal,
+                "supplierId": int(order["supplier_id"]),
+                "assembly": False,
+            },
+        }
+    }
+
+
+BODY_BUILDERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {"sales": sell_order_body, "buy_orders": buy_order_body}
+
+
+def body_key(kind: str, body: Dict[str, Any]) -> str:
+    """Stable id of one request: kind + hash of its canonical JSON body."""
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+    return f"{kind}:{digest}"
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, at most `burst` saved up. acquire() sleeps only
+    as long as the next token needs; pause() holds every caller back (e.g. after a 429 Retry-After)."""
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = self._clock()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class PushProgress:
+    """Resumable push state: keys of delivered requests, and the last error of requests that gave up."""
+    done: Set[str] = field(default_factory=set)
+    failed: Dict[str, str] = field(default_factory=dict)
+    sent: int = 0
+    skipped: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "delivered_total": len(self.done),
+            "skipped": self.skipped,
+            "failed": len(self.failed),
+            "retries": self.retries,
+            "seconds": round(self.seconds, 3),
+            "requests_per_sec": round(self.sent / self.seconds, 2) if self.seconds > 0 else 0.0,
+            "errors": dict(list(self.failed.items())[:20]),
+        }
+
+    def dump(self) -> Dict[str, Any]:
+        """Serializable state for save / resume elsewhere (see load)."""
+        return {"done": sorted(self.done), "failed": self.failed}
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> "PushProgress":
+        return cls(done=set(data.get("done", ())), failed=dict(data.get("failed", {})))
+
+
+class RetryableError(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class PublicApiPusher:
+    """POSTs request bodies through a shared client with rate limit, bounded concurrency and retries.
+    `client` is an httpx.AsyncClient (see make_client) with the API base URL."""
+
+    def __init__(
+        self,
+        client: Any,
+        account_id: int,
+        limiter: Optional[TokenBucket] = None,
+        concurrency: int = PUSH_CONCURRENCY,
+        max_retries: int = PUSH_MAX_RETRIES,
+        backoff_seconds: float = PUSH_BACKOFF_SECONDS,
+        progress: Optional[PushProgress] = None,
+    ):
+        self.client = client
+        self.account_id = account_id
+        self.limiter = limiter or TokenBucket(PUSH_RATE_PER_SEC, PUSH_BURST)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.progress = progress or PushProgress()
+
+    async def _post(self, resource: str, body: Dict[str, Any]) -> None:
+        import httpx
+
+        await self.limiter.acquire()
+        try:
+            response = await self.client.post(f"/{resource}", params={"accountId": self.account_id}, json=body)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:  # Never reached the API: safe to send again
+            raise RetryableError(f"{type(e).__name__}: {e}") from e
+        except httpx.TransportError as e:  # Possibly delivered (e.g. read timeout): a retry could duplicate the order
+            raise ValueError(f"{type(e).__name__}: {e} (not retried, the order may have been created)") from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetryableError(f"HTTP {response.status_code}", _retry_after(response.headers.get("Retry-After")))
+        if response.status_code >= 400:
+            raise ValueError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+    async def _send(self, resource: str, key: str, body: Dict[str, Any]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._post(resource, body)
+            except RetryableError as e:
+                if attempt == self.max_retries:
+                    self.progress.failed[key] = str(e)
+                    return
+                self.progress.retries += 1
+                delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+                if e.retry_after is not None:
+                    delay = max(delay, e.retry_after)
+                    self.limiter.pause(e.retry_after)  # The limit is shared: slow everyone down
+                await asyncio.sleep(delay)
+                continue
+            except ValueError as e:  # Other 4xx or an unknown outcome: retrying will not help or could duplicate
+                self.progress.failed[key] = str(e)
+                return
+            self.progress.done.add(key)
+            self.progress.failed.pop(key, None)
+            self.progress.sent += 1
+            return
+
+    async def push(self, requests: Iterable[Tuple[str, Dict[str, Any]]]) -> PushProgress:
+        """POST every (kind, body) not delivered yet, `concurrency` at a time. Returns the (updated) progress."""
+        started = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue()
+        for kind, body in requests:
+            key = body_key(kind, body)
+            if key in self.progress.done:
+                self.progress.skipped += 1
+            else:
+                queue.put_nowait((RESOURCES[kind], key, body))
+
+        async def worker():
+            while True:
+                try:
+                    resource, key, body = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self._send(resource, key, body)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, queue.qsize()))))
+        finally:
+            self.progress.seconds += time.perf_counter() - started
+        return self.progress
+
+
+def payload_requests(api_payloads: Dict[str, List[Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(kind, JSON:API body) for every item of a /simulate api_payloads (sales first, then buy orders)."""
+    return [(kind, BODY_BUILDERS[kind](item)) for kind in ("sales", "buy_orders") for item in api_payloads.get(kind) or []]
+
+
+def make_client(
+    base_url: str = OPTIPLY_API_URL,
+    token: Optional[str] = OPTIPLY_API_TOKEN,
+    concurrency: int = PUSH_CONCURRENCY,
+    transport: Any = None,
+):
+    """Pooled keep-alive httpx.AsyncClient for the Public API (imported here: not needed at app start)."""
+    import httpx
+
+    headers = {"Content-Type": JSON_API_MEDIA_TYPE, "Accept": JSON_API_MEDIA_TYPE}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        timeout=PUSH_TIMEOUT_SECONDS,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        transport=transport,
+    )
+
+
+async def push_payloads(
+    account_id: int,
+    api_payloads: Dict[str, List[Dict[str, Any]]],
+    progress: Optional[PushProgress] = None,
+    client: Any = None,
+) -> PushProgress:
+    """Push a /simulate api_payloads for one account, resuming `progress` when given."""
+    owned = client is None
+    client = client or make_client()
+    try:
+        pusher = PublicApiPusher(client, account_id, progress=progress)
+        result = await pusher.push(payload_requests(api_payloads))
+    finally:
+        if owned:
+            await client.aclose()
+    logger.info(f"Pushed api_payloads for account {account_id}: {result.to_dict()}")
+    return result
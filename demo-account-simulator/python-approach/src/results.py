@@ -0,0 +1,109 @@
+"""
+Columnar (struct-of-arrays) simulation results: one small header of product attributes plus NumPy
+arrays indexed by day. Per-row dicts / JSON are only materialized at the DB or API boundary.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.checkpoint import ProductCheckpoint
+from src.horizon import ISO_DATE_FMT, SimulationCalendar, calendar_for
+
+
+@dataclass
+class ProductResult:
+    # Header (once per product)
+    product_id: int
+    sku: str
+    webshop_id: int
+    supplier_id: int
+    selling_price: float
+    purchase_price: float
+    scenario: str
+    start_date: datetime
+    # Per-day columns (length = history_days)
+    on_hand: np.ndarray
+    sold: np.ndarray
+    # Buy-order columns (one entry per order)
+    bo_day: np.ndarray
+    bo_delivery_day: np.ndarray
+    bo_qty: np.ndarray
+    missed_sales_days: int = 0
+    # End-of-run state, for SupplyChainSimulator.roll_forward
+    checkpoint: Optional[ProductCheckpoint] = None
+    # Ensemble runs: archetype score of the kept replica (> 0 meets the acceptance criteria)
+    replica_score: Optional[float] = None
+    # Wall time of the simulation (incl. replicas), for the per-archetype metrics
+    sim_seconds: float = 0.0
+
+    @property
+    def history_days(self) -> int:
+        return int(self.on_hand.shape[0])
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        metrics = {
+            "missed_sales_days": self.missed_sales_days,
+            "total_sales": int(self.sold.sum()),
+            "scenario": self.scenario,
+        }
+        if self.replica_score is not None:
+            metrics["replica_score"] = round(self.replica_score, 4)
+        return metrics
+
+    @property
+    def calendar(self) -> SimulationCalendar:
+        return calendar_for(self.start_date, self.history_days)
+
+    # --- DB / API boundary ---
+
+    def stock_rows(self) -> List[Dict[str, Any]]:
+        dates = self.calendar.sql_dates
+        p_id, w_id = self.product_id, self.webshop_id
+        return [
+            {"product_id": p_id, "webshop_id": w_id, "on_hand": on_hand, "date": dates[day]}
+            for day, on_hand in enumerate(np.maximum(self.on_hand, 0).tolist())
+        ]
+
+    def sales_rows(self) -> List[Dict[str, Any]]:
+        dates = self.calendar.sql_dates
+        iso_dates = self.calendar.iso_dates
+        days = np.flatnonzero(self.sold > 0)
+        return [
+            {
+                "product_id": self.product_id,
+                "sku_id": self.sku,
+                "quantity": qty,
+                "price": self.selling_price,
+                "date": dates[day],
+                "iso_date": iso_dates[day],
+            }
+            for day, qty in zip(days.tolist(), self.sold[days].tolist())
+        ]
+
+    def buy_order_rows(self) -> List[Dict[str, Any]]:
+        calendar = self.calendar
+        iso_dates = calendar.iso_dates
+        return [
+            {
+                "supplier_id": self.supplier_id,
+                "product_id": self.product_id,
+                "placed": iso_dates[day],
+                "expected_delivery": calendar.date_at(delivery_day, ISO_DATE_FMT),
+                "quantity": qty,
+                "unit_cost": self.purchase_price,
+                "total_value": round(qty * self.purchase_price, 2),
+            }
+            for day, delivery_day, qty in zip(self.bo_day.tolist(), self.bo_delivery_day.tolist(), self.bo_qty.tolist())
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Row-oriented result (the original simulate_product shape)."""
+        return {
+            "sales": self.sales_rows(),
+            "buy_orders": self.buy_order_rows(),
+            "stocks": self.stock_rows(),
+            "metrics": self.metrics,
+        }
@@ -0,0 +1,27 @@
+"""
+Per-product random streams: every (shop, product, seed) gets its own numpy Generator derived via
+SeedSequence, so a product's demand and lead times do not depend on product order, batching or
+worker count. Same seed -> bit-identical run.
+"""
+import secrets
+from typing import Optional
+
+import numpy as np
+
+
+def new_seed() -> int:
+    """Fresh run seed (returned to the caller so the run can be replayed)."""
+    return secrets.randbits(32)
+
+
+def product_rng(webshop_id: int, product_id: int, seed: Optional[int]) -> np.random.Generator:
+    """Independent Generator for one product. seed=None draws fresh OS entropy (not reproducible)."""
+    if seed is None:
+        return np.random.default_rng()
+    return np.random.default_rng(np.random.SeedSequence([int(seed), int(webshop_id), int(product_id)]))
+
+
+def ensemble_rng(webshop_id: int, product_id: int, seed: int) -> np.random.Generator:
+    """Stacked Generator for all Monte Carlo replicas of one product (src/ensemble.py); independent of
+    product_rng with the same seed."""
+    return np.random.default_rng(np.random.SeedSequence([int(seed), int(webshop_id), int(product_id), 0xE5E]))
@@ -0,0 +1,111 @@
+"""
+Dense products × days unit counts (daily sales, deliveries) loaded from a result set or CSV
+(e.g. context-data/1380-sales.csv). Products map to rows via row_of and days are offsets from origin,
+so simulators read by integer index and per-product totals / active days are vector reductions.
+A stdlib copy (lists instead of arrays) is inlined in the Retool blocks that read fetch_daily_sales.
+"""
+import csv
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Union
+
+import numpy as np
+
+
+def day_ordinal(value: Any) -> int:
+    """Proleptic ordinal of a date, datetime or 'YYYY-MM-DD...' string."""
+    if hasattr(value, "toordinal"):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+@dataclass
+class DailyMatrix:
+    origin: int  # Ordinal of column 0
+    row_of: Dict[int, int]  # product_id -> row index
+    units: np.ndarray  # int64, shape (products, days)
+
+    @classmethod
+    def from_entries(
+        cls,
+        product_ids: Iterable[int],
+        dates: Iterable[Any],
+        quantities: Iterable[int],
+        start_date: Optional[Union[date, datetime]] = None,
+        days: int = 0,
+    ) -> "DailyMatrix":
+        """Sum (product_id, date, qty) entries into a matrix spanning the data and, if given, start_date + days."""
+        ids = np.fromiter((int(p) for p in product_ids), dtype=np.int64)
+        ordinals = np.fromiter((day_ordinal(d) for d in dates), dtype=np.int64, count=len(ids))
+        qty = np.fromiter((int(q) for q in quantities), dtype=np.int64, count=len(ids))
+        bounds = [int(ordinals.min()), int(ordinals.max())] if len(ordinals) else []
+        if start_date is not None:
+            bounds += [start_date.toordinal(), start_date.toordinal() + max(days, 1) - 1]
+        origin = min(bounds) if bounds else 0
+        span = max(bounds) - origin + 1 if bounds else 0
+        unique_ids, rows = np.unique(ids, return_inverse=True)
+        units = np.zeros((len(unique_ids), span), dtype=np.int64)
+        np.add.at(units, (rows, ordinals - origin), qty)
+        return cls(origin=origin, row_of={int(p): i for i, p in enumerate(unique_ids)}, units=units)
+
+    @property
+    def days(self) -> int:
+        return self.units.shape[1]
+
+    def day_index(self, value: Any) -> int:
+        return day_ordinal(value) - self.origin
+
+    def row(self, product_id: int) -> np.ndarray:
+        """Units per day for one product (zeros for products without entries)."""
+        i = self.row_of.get(product_id)
+        return self.units[i] if i is not None else np.zeros(self.days, dtype=np.int64)
+
+    def window(self, product_id: int, start_date: Union[date, datetime], days: int) -> np.ndarray:
+        """Units for days [start_date, start_date + days), zero-padded outside the matrix."""
+        start = self.day_index(start_date)
+        if 0 <= start and start + days <= self.days:
+            return self.row(product_id)[start:start + days]
+        out = np.zeros(days, dtype=np.int64)
+        lo, hi = max(start, 0), min(start + days, self.days)
+        if lo < hi:
+            out[lo - start:hi - start] = self.row(product_id)[lo:hi]
+        return out
+
+    def aligned(self, product_ids: Iterable[int], origin: int, days: int) -> np.ndarray:
+        """Units of the given products (in that order) over ordinals [origin, origin + days), shape (products, days)."""
+        lo = origin - self.origin
+        pad_left, pad_right = max(0, -lo), max(0, lo + days - self.days)
+        # Extra zero row for products without entries
+        padded = np.pad(self.units, ((0, 1), (pad_left, pad_right)))
+        rows = [self.row_of.get(int(p), len(self.row_of)) for p in product_ids]
+        return padded[rows, lo + pad_left:lo + pad_left + days]
+
+    def totals(self) -> np.ndarray:
+        return self.units.sum(axis=1)
+
+    def active_days(self) -> np.ndarray:
+        return np.count_nonzero(self.units, axis=1)
+
+    def total(self, product_id: int) -> int:
+        return int(self.row(product_id).sum())
+
+
+def load_sales_matrix(
+    daily_sales: Iterable[Dict[str, Any]],
+    start_date: Optional[Union[date, datetime]] = None,
+    days: int = 0,
+) -> DailyMatrix:
+    """fetch_daily_sales rows (product_id, sale_date, units_sold) -> DailyMatrix."""
+    rows = list(daily_sales)
+    return DailyMatrix.from_entries(
+        (r["product_id"] for r in rows),
+        (r["sale_date"] for r in rows),
+        (r["units_sold"] for r in rows),
+        start_date,
+        days,
+    )
+
+
+def load_sales_csv(path: str, start_date: Optional[Union[date, datetime]] = None, days: int = 0) -> DailyMatrix:
+    with open(path, newline="") as f:
+        return load_sales_matrix(csv.DictReader(f), start_date, days)
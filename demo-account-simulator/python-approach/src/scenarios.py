@@ -0,0 +1,255 @@
+"""
+Scenario registry: parse a product name once into an immutable, precompiled ScenarioSpec.
+The simulation hot loop only reads numeric fields / arrays from the spec (no substring checks per day).
+ARCHETYPE_RULES is mirrored verbatim in retool-blocks/simulate_stocks*.py (Retool blocks cannot import this module).
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_SCENARIO = "Stable Fast"
+
+# Canonical archetype keys (shared with retool-blocks). First matching rule wins.
+# Each rule: (archetype, keywords that must all appear, keywords of which at least one must appear).
+ARCHETYPE_RULES: Tuple[Tuple[str, Tuple[str, ...], Tuple[str, ...]], ...] = (
+    ("stockout_prone", ("Stockout Prone",), ()),
+    ("seasonal_summer", ("Seasonal", "Summer"), ()),
+    ("seasonal_winter", ("Seasonal",), ("Winter", "Holiday")),
+    ("trend_down", ("Negative Trend",), ()),
+    ("trend_up", ("Trend",), ()),
+    ("step_up", ("Step Change", "Up"), ()),
+    ("step_down", ("Step Change", "Down"), ()),
+    ("new_launch", ("New Launch",), ()),
+    ("obsolete", (), ("Obsolete", "Dead")),
+    ("lumpy", (), ("Lumpy", "Sporadic")),
+    ("outlier", (), ("Outlier", "Influencer")),
+    ("container_filler", ("Container Filler",), ()),
+    ("micro_seasonal", ("Micro-Seasonality",), ()),
+)
+
+# Demand shape: (days, base_qty, history_days, rng) -> pre-noise float demand for each day.
+# `rng` is anything with numpy's random(), uniform() API (the np.random module or a Generator).
+DemandShape = Callable[[np.ndarray, float, int, object], np.ndarray]
+
+
+def scenario_label(name: str) -> str:
+    """Text inside the outermost (...) of a product name, e.g.
+    'Mascara (Stockout Prone (Demand))' -> 'Stockout Prone (Demand)'. Falls back to DEFAULT_SCENARIO."""
+    if not name or "(" not in name or ")" not in name:
+        return DEFAULT_SCENARIO
+    start = name.index("(") + 1
+    end = name.rindex(")")
+    if start >= end:
+        return DEFAULT_SCENARIO
+    return name[start:end].strip() or DEFAULT_SCENARIO
+
+
+def archetype_for(label: str) -> str:
+    """Map a scenario label to its canonical archetype key (see ARCHETYPE_RULES); default 'stable'."""
+    for archetype, all_of, any_of in ARCHETYPE_RULES:
+        if all(k in label for k in all_of) and (not any_of or any(k in label for k in any_of)):
+            return archetype
+    return "stable"
+
+
+# --- DEMAND SHAPES (vectorized over days) ---
+
+def _constant(multiplier: float) -> DemandShape:
+    def shape(days, base_qty, history_days, rng):
+        return np.full(days.shape[0], base_qty * multiplier)
+    return shape
+
+
+def _positive_trend(days, base_qty, history_days, rng):
+    # Ramp up 1x -> 3x in the last 120 days
+    start_day = history_days - 120
+    progress = (days - start_day) / 120
+    return np.where(days < start_day, base_qty, base_qty * (1 + (2.0 * progress)))
+
+
+def _negative_trend(days, base_qty, history_days, rng):
+    # Decay 100% -> 20% of a 2x base in the last 120 days
+    start_day = history_days - 120
+    high_base = base_qty * 2.0
+    progress = (days - start_day) / 120
+    return np.where(days < start_day, high_base, np.maximum(0, high_base * (1 - (0.8 * progress))))
+
+
+def _seasonal(peak: int, width: int, winter: bool, micro: bool) -> DemandShape:
+    def shape(days, base_qty, history_days, rng):
+        factor = 3.0 * np.exp(-((days - peak) ** 2) / (2 * width ** 2))
+        if winter:  # Dec Peak
+            factor = np.maximum(factor, 3.0 * np.exp(-((days - 355) ** 2) / (2 * 20 ** 2)))
+        if micro:  # Monthly payday modulates the seasonal factor
+            factor = factor * ((days % 30) < 5)
+        return base_qty + (base_qty * factor)
+    return shape
+
+
+def _obsolete(days, base_qty, history_days, rng):
+    return np.where(days < (history_days - 60), base_qty, 0.0)
+
+
+def _outlier(days, base_qty, history_days, rng):
+    # 3% huge spikes in the last 90 days
+    spikes = (days > (history_days - 90)) & (rng.random(days.shape[0]) > 0.97)
+    return np.where(spikes, base_qty * 8.0, base_qty)
+
+
+def _new_launch(boost: float) -> DemandShape:
+    def shape(days, base_qty, history_days, rng):
+        return np.where(days < (history_days - 30), 0.0, base_qty * boost)
+    return shape
+
+
+def _sporadic(days, base_qty, history_days, rng):
+    return np.where(rng.random(days.shape[0]) > 0.92, 3.0, 0.0)
+
+
+def _lumpy(days, base_qty, history_days, rng):
+    n = days.shape[0]
+    bulk = rng.random(n) > 0.97
+    return np.where(bulk, rng.uniform(50, 200, n), 0.0)
+
+
+def _step_change(up: bool, down: bool) -> DemandShape:
+    def shape(days, base_qty, history_days, rng):
+        level = np.ones(days.shape[0])
+        if up: level = np.where(days > 200, 2.5, level)
+        if down: level = np.where(days > 200, 0.5, level)
+        return base_qty * level
+    return shape
+
+
+def _demand_shape_for(label: str) -> DemandShape:
+    """Same precedence as DemandEngine.get_daily_demand."""
+    if label == "Stable Fast": return _constant(1.5)
+    if label == "Stable Slow": return _constant(0.5)
+    if label == "Positive Trend": return _positive_trend
+    if label == "Negative Trend": return _negative_trend
+    if "Seasonal" in label:
+        peak, width = 170, 30  # Summer
+        if "Winter" in label: peak = 15
+        if "Holiday" in label: peak, width = 330, 5
+        return _seasonal(peak, width, "Winter" in label, "Micro" in label)
+    if "Stockout" in label: return _constant(2.0)
+    if "Obsolete" in label: return _obsolete
+    if "Outlier" in label: return _outlier
+    if "New Launch" in label: return _new_launch(2.5 if "Success" in label else 0.5)
+    if "Container" in label: return _constant(4.0)
+    if "Multi-Supplier" in label: return _constant(1.5)
+    if "Sporadic" in label: return _sporadic
+    if "Lumpy" in label: return _lumpy
+    if "Step Change" in label: return _step_change("Up" in label, "Down" in label)
+    return _constant(1.0)
+
+
+@dataclass(frozen=True)
+class ScenarioSpec:
+    """Precompiled scenario: everything SupplyChainSimulator needs, as numbers and callables."""
+    label: str
+    archetype: str
+    demand_shape: DemandShape
+    additive_noise: bool = True
+    # ROP = lead_time * (base_qty * rop_demand_factor) * rop_lead_factor
+    rop_demand_factor: float = 1.0
+    rop_lead_factor: float = 1.5
+    # Late phase: for day > history_days - late_phase_days, ROP = lead-time demand * late_rop_factor
+    # (None = stop ordering entirely).
+    late_phase_days: int = 0
+    late_rop_factor: Optional[float] = 1.5
+    # Initial stock: fixed value if set, else current_stock + initial_stock_offset
+    initial_stock_fixed: Optional[int] = None
+    initial_stock_offset: int = 800
+    # New Launch: inject launch_stock_days of avg demand on day history_days - launch_days_before_end
+    launch_days_before_end: Optional[int] = None
+    launch_stock_days: int = 45
+    # Order quantity: avg_daily * (lead_time + order_coverage_days), then floor/fixed/min rules
+    order_coverage_days: int = 45
+    order_floor_qty: int = 0
+    order_fixed_qty: Optional[int] = None
+    order_min_qty: int = 10
+    # Lead-time variance: (probability, min_days, max_days) of replacing the lead time
+    lead_time_jitter: Optional[Tuple[float, int, int]] = None
+    # Seasonal shapes repeat every horizon when rolled forward; others hold their end-of-horizon state
+    periodic: bool = False
+
+    def avg_daily(self, base_qty: float) -> float:
+        return base_qty * self.rop_demand_factor
+
+    def initial_stock(self, current_stock: int) -> int:
+        if self.initial_stock_fixed is not None:
+            return self.initial_stock_fixed
+        return current_stock + self.initial_stock_offset
+
+    def order_quantity(self, avg_daily: float, lead_time: int) -> int:
+        order_q = int(avg_daily * (lead_time + self.order_coverage_days))
+        order_q = max(order_q, self.order_floor_qty)
+        if self.order_fixed_qty is not None:
+            order_q = self.order_fixed_qty
+        return max(self.order_min_qty, order_q)
+
+    def reorder_points(self, history_days: int, lead_time: int, avg_daily: float) -> np.ndarray:
+        """Active ROP for every day of the horizon (-inf where ordering is switched off)."""
+        rop = np.full(history_days, lead_time * avg_daily * self.rop_lead_factor)
+        if self.late_phase_days:
+            late = np.arange(history_days) > (history_days - self.late_phase_days)
+            late_rop = -np.inf if self.late_rop_factor is None else (lead_time * avg_daily) * self.late_rop_factor
+            rop[late] = late_rop
+        return rop
+
+    def horizon_days(self, days: np.ndarray, history_days: int) -> np.ndarray:
+        """Map day indices onto the scenario horizon. Identity inside it; days past the end (roll-forward)
+        wrap around for periodic scenarios and otherwise stay on the last day."""
+        if self.periodic:
+            return days % history_days
+        return np.minimum(days, history_days - 1)
+
+    def launch_day(self, history_days: int) -> int:
+        """Day index of the New Launch stock injection, or -1."""
+        if self.launch_days_before_end is None:
+            return -1
+        return history_days - self.launch_days_before_end
+
+
+@lru_cache(maxsize=None)
+def compile_scenario(label: str) -> ScenarioSpec:
+    """Parse a scenario label once into a ScenarioSpec (cached per label)."""
+    rop_demand_factor = 1.0
+    if "Fast" in label or "Container" in label: rop_demand_factor *= 2.0
+    if "Seasonal" in label: rop_demand_factor *= 1.5
+    if "Trend" in label: rop_demand_factor *= 1.5
+
+    fields = {}
+    if "Stockout" in label:
+        # Supply-side sabotage: cut ROP to 80% of LTD in the last 90 days (guarantees stockout)
+        fields.update(late_phase_days=90, late_rop_factor=0.8)
+    if "New Launch" in label:
+        fields.update(initial_stock_fixed=0, launch_days_before_end=30)
+    if "Obsolete" in label:
+        fields.update(late_phase_days=60, late_rop_factor=None, initial_stock_fixed=600)
+    if "Sporadic" in label or "Lumpy" in label:
+        fields.update(initial_stock_fixed=60, additive_noise=False)
+    if "Container" in label:
+        fields.update(order_floor_qty=2000)
+    if "Sporadic" in label:
+        fields.update(order_fixed_qty=20)
+    if "Multi-Supplier" in label:
+        fields.update(lead_time_jitter=(0.3, 25, 45))
+    if "Seasonal" in label:
+        fields.update(periodic=True)
+
+    return ScenarioSpec(
+        label=label,
+        archetype=archetype_for(label),
+        demand_shape=_demand_shape_for(label),
+        rop_demand_factor=rop_demand_factor,
+        **fields,
+    )
+
+
+def scenario_for_product(name: str) -> ScenarioSpec:
+    """Product name -> compiled ScenarioSpec."""
+    return compile_scenario(scenario_label(name))
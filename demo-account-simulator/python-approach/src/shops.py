@@ -0,0 +1,78 @@
+"""
+Per-shop simulation config: which webshops may be simulated, their product whitelist (spec §5), horizon,
+default seed, per-product archetype overrides and ensemble replicas. Built-in: demo shop 1380. More shops
+come from the JSON file at SHOP_CONFIG_PATH:
+
+    {"shops": [{"webshop_id": 2001, "product_whitelist": [1, 2, 3], "history_days": 730, "seed": 7,
+                "archetype_overrides": {"2": "Seasonal Summer"}, "replicas": 50}]}
+"""
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Mapping, Optional
+
+from src.ensemble import ENSEMBLE_MAX_REPLICAS
+from src.scenarios import scenario_label
+
+# JSON file with additional / overriding shop configs (see module docstring).
+SHOP_CONFIG_PATH = os.getenv("SHOP_CONFIG_PATH")
+
+DEMO_SHOP_ID = 1380
+
+# Product ID whitelist for demo shop 1380 (from spec §5). Only these products may be simulated.
+DEMO_PRODUCT_WHITELIST = frozenset([
+    28666283, 28666286, 28666287, 28666288, 28666289, 28666290, 28666291, 28666292,
+    28666293, 28666294, 28666295, 28666296, 28666297, 28666298, 28666299, 28666300,
+    28666301, 28666302, 28666303, 28666304, 28666305, 28666306, 28666307, 28666308,
+    28666309, 28666310, 28666311, 28666312, 28666313, 28666314, 28666315, 28666316,
+])
+
+
+@dataclass(frozen=True)
+class ShopConfig:
+    webshop_id: int
+    product_whitelist: FrozenSet[int]
+    history_days: int = 365
+    # Run seed when the request has none (None: a fresh seed per run)
+    seed: Optional[int] = None
+    # product_id -> scenario label, replacing the label parsed from the product name
+    archetype_overrides: Mapping[int, str] = field(default_factory=dict)
+    # Monte Carlo replicas per product when the request has none (1: plain run; see src/ensemble.py)
+    replicas: int = 1
+
+    def __post_init__(self):
+        if not self.product_whitelist:
+            raise ValueError(f"Shop {self.webshop_id}: product_whitelist must not be empty")
+        if not 1 <= self.history_days <= 3650:
+            raise ValueError(f"Shop {self.webshop_id}: history_days must be between 1 and 3650")
+        if not 1 <= self.replicas <= ENSEMBLE_MAX_REPLICAS:
+            raise ValueError(f"Shop {self.webshop_id}: replicas must be between 1 and {ENSEMBLE_MAX_REPLICAS}")
+
+    def scenario_for(self, product_id: int, name: str) -> str:
+        """Scenario label of a product: the shop's override, else the text in (...) of its name."""
+        return self.archetype_overrides.get(product_id) or scenario_label(name)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ShopConfig":
+        return cls(
+            webshop_id=int(data["webshop_id"]),
+            product_whitelist=frozenset(int(p) for p in data["product_whitelist"]),
+            history_days=int(data.get("history_days", 365)),
+            seed=data.get("seed"),
+            archetype_overrides={int(p): str(label) for p, label in (data.get("archetype_overrides") or {}).items()},
+            replicas=int(data.get("replicas", 1)),
+        )
+
+
+DEMO_SHOP = ShopConfig(DEMO_SHOP_ID, DEMO_PRODUCT_WHITELIST)
+
+
+def load_shop_configs(path: Optional[str] = SHOP_CONFIG_PATH) -> Dict[int, ShopConfig]:
+    """webshop_id -> ShopConfig: the built-in demo shop plus the shops in `path` (which may redefine 1380)."""
+    shops = {DEMO_SHOP_ID: DEMO_SHOP}
+    if path:
+        with open(path) as f:
+            for data in json.load(f)["shops"]:
+                config = ShopConfig.from_dict(data)
+                shops[config.webshop_id] = config
+    return shops
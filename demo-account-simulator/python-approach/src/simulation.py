@@ -2,12 +2,17 @@
 Supply chain simulation: demand archetypes and daily stock/sales/PO loop.
 Date formats (spec §5): API payloads use ISO8601 (YYYY-MM-DDTHH:MM:SSZ); SQL/DB use YYYY-MM-DD.
 """
-import pandas as pd
 import numpy as np
-import uuid
 from datetime import datetime, timedelta
 import random
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Sequence, Union
+from src.checkpoint import ProductCheckpoint
+from src.ensemble import best_replica
+from src.inbound import InboundQueue
+from src.results import ProductResult
+from src.rng import product_rng
+from src.scenarios import ScenarioSpec, compile_scenario
 
 class DemandEngine:
     @staticmethod
@@ -18,7 +23,11 @@ class DemandEngine:
         return 5 # Slow
 
     @staticmethod
-    def get_daily_demand(day_idx: int, scenario: str, base_qty: float, history_days: int) -> int:
+    def get_daily_demand(day_idx: int, scenario: str, base_qty: float, history_days: int, rng: Optional[np.random.Generator] = None) -> int:
+        # Draws from `rng` when given, else from the global random / np.random state (legacy)
+        rand = rng.random if rng is not None else random.random
+        uniform = rng.uniform if rng is not None else random.uniform
+        normal = rng.normal if rng is not None else np.random.normal
         qty = 0.0
         
         # --- SCENARIO SHAPES ---
@@ -73,7 +82,7 @@ class DemandEngine:
         elif "Outlier" in scenario:
             # 3% huge spikes in last 90 days
             is_recent = day_idx > (history_days - 90)
-            if is_recent and random.random() > 0.97: 
+            if is_recent and rand() > 0.97: 
                 qty = base_qty * 8.0 # Massive spike
             else: 
                 qty = base_qty
@@ -95,10 +104,10 @@ class DemandEngine:
             qty = base_qty * 1.5
         
         elif "Sporadic" in scenario:
-            qty = 3 if random.random() > 0.92 else 0 # Sparse (Poisson-ish)
+            qty = 3 if rand() > 0.92 else 0 # Sparse (Poisson-ish)
             
         elif "Lumpy" in scenario:
-            qty = random.uniform(50, 200) if random.random() > 0.97 else 0 # Bulk B2B
+            qty = uniform(50, 200) if rand() > 0.97 else 0 # Bulk B2B
             
         elif "Step Change" in scenario:
             # Jump at Day 200
@@ -114,151 +123,240 @@ class DemandEngine:
         # --- NOISE (Tuned for Readability) ---
         if qty > 0:
             # Lower volatility (±15%) to make patterns clearer
-            vol = random.uniform(0.85, 1.15)
+            vol = uniform(0.85, 1.15)
             qty = qty * vol
             
             # Additive noise (only if not sporadic or lumpy)
             if "Sporadic" not in scenario and "Lumpy" not in scenario:
-                qty += np.random.normal(0, 1.0)
+                qty += normal(0, 1.0)
                 
         return int(max(0, round(qty)))
 
+    @staticmethod
+    def _apply_noise(qty: np.ndarray, additive: np.ndarray, rng=np.random) -> np.ndarray:
+        """Multiplicative ±15% noise plus optional N(0, 1) on positive days; round and clip at 0.
+        `additive` broadcasts against `qty` (scalar, or one flag per product row)."""
+        positive = qty > 0
+        vol = rng.uniform(0.85, 1.15, qty.shape)
+        normal = rng.normal(0, 1.0, qty.shape)
+        noisy = qty * vol + np.where(additive, normal, 0.0)
+        qty = np.where(positive, noisy, qty)
+        return np.maximum(0, np.rint(qty)).astype(np.int64)
+
+    @staticmethod
+    def get_demand_series(scenario: Union[str, ScenarioSpec], base_qty: float, history_days: int, rng: Optional[np.random.Generator] = None, days: Optional[np.ndarray] = None) -> np.ndarray:
+        """Whole-horizon demand for one product: int array of length `history_days`.
+        Vectorized equivalent of calling get_daily_demand for day 0..history_days-1.
+        Draws from `rng` (e.g. rng.product_rng) when given, else from the global np.random state.
+        `days` selects other day indices, e.g. days past the horizon for a roll-forward."""
+        spec = scenario if isinstance(scenario, ScenarioSpec) else compile_scenario(scenario)
+        rng = np.random if rng is None else rng
+        days = np.arange(history_days) if days is None else spec.horizon_days(days, history_days)
+        qty = spec.demand_shape(days, base_qty, history_days, rng)
+        return DemandEngine._apply_noise(qty, np.asarray(spec.additive_noise), rng)
+
+    @staticmethod
+    def get_demand_matrix(scenarios: List[Union[str, ScenarioSpec]], base_qtys: List[float], history_days: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """Products x days demand batch: int array of shape (len(scenarios), history_days).
+        Row i uses scenarios[i] and base_qtys[i]; noise is drawn for the whole matrix at once."""
+        if len(scenarios) != len(base_qtys):
+            raise ValueError("scenarios and base_qtys must have the same length")
+        specs = [s if isinstance(s, ScenarioSpec) else compile_scenario(s) for s in scenarios]
+        rng = np.random if rng is None else rng
+        days = np.arange(history_days)
+        qty = np.empty((len(specs), history_days))
+        for i, (spec, base_qty) in enumerate(zip(specs, base_qtys)):
+            qty[i] = spec.demand_shape(days, base_qty, history_days, rng)
+        additive = np.array([spec.additive_noise for spec in specs], dtype=bool)
+        return DemandEngine._apply_noise(qty, additive[:, None], rng)
+
 class SupplyChainSimulator:
-    def __init__(self, history_days: int = 365):
+    def __init__(self, history_days: int = 365, start_date: Optional[datetime] = None, seed: Optional[int] = None, replicas: int = 1):
         self.history_days = history_days
-        self.start_date = datetime.now() - timedelta(days=history_days)
+        # Run seed: each product draws from its own Generator keyed by (shop, product, seed)
+        self.seed = seed
+        # Monte Carlo replicas per product; > 1 keeps the replica that best fits its archetype (src/ensemble.py)
+        self.replicas = replicas
+        self.start_date = start_date or (datetime.now() - timedelta(days=history_days))
         self.demand_engine = DemandEngine()
 
-    def simulate_product(self, product_data: Dict[str, Any], scenario: str) -> Dict[str, Any]:
-        p_id = product_data['id']
-        p_sku = product_data['sku']
-        supplier_id = product_data['supplier_id']
-        w_id = product_data['shop_id']
-        
+    def simulate_product(self, product_data: Dict[str, Any], scenario: Union[str, ScenarioSpec]) -> Dict[str, Any]:
+        """Row-oriented result: {"sales", "buy_orders", "stocks", "metrics"} (see simulate_product_columnar)."""
+        return self.simulate_product_columnar(product_data, scenario).to_dict()
+
+    def simulate_product_columnar(self, product_data: Dict[str, Any], scenario: Union[str, ScenarioSpec]) -> ProductResult:
+        """Full-history simulation; the result carries the end-of-run checkpoint for roll_forward.
+        With replicas > 1 this is the best-scoring replica, taken as is from the batched ensemble pass."""
+        started = time.perf_counter()
+        spec = scenario if isinstance(scenario, ScenarioSpec) else compile_scenario(scenario)
+        if self.replicas > 1:
+            result = self._best_replica(product_data, spec)
+        else:
+            rng = product_rng(product_data['shop_id'], product_data['id'], self.seed)
+            current_stock = int(product_data.get('current_stock_on_hand', 0) or 0)
+            result = self._run(
+                product_data, spec, rng, self.history_days,
+                first_day=0, n_days=self.history_days, start_date=self.start_date,
+                sim_stock=spec.initial_stock(current_stock), pending_deliveries=InboundQueue(), missed_before=0,
+            )
+        result.sim_seconds = time.perf_counter() - started
+        return result
+
+    def _best_replica(self, product_data: Dict[str, Any], spec: ScenarioSpec) -> ProductResult:
+        """Result of the winning replica; its roll-forward continues on the product stream of its seed."""
+        best = best_replica(self, product_data, spec, self.replicas)
+        rng = product_rng(product_data['shop_id'], product_data['id'], best.seed)
+        checkpoint = ProductCheckpoint(
+            product=dict(product_data),
+            scenario=spec.label,
+            history_days=self.history_days,
+            next_day=self.history_days,
+            next_date=self.start_date + timedelta(days=self.history_days),
+            on_hand=int(best.on_hand[-1]),
+            pending=best.pending,
+            missed_sales_days=best.missed_sales_days,
+            rng_state=rng.bit_generator.state,
+        )
+        result = self._result(
+            product_data, spec, self.start_date, best.on_hand, best.sold,
+            best.bo_day, best.bo_delivery_day, best.order_q, best.missed_sales_days, checkpoint,
+        )
+        result.replica_score = best.score
+        return result
+
+    def roll_forward(self, checkpoint: ProductCheckpoint, days: int) -> ProductResult:
+        """Simulate `days` more days from a checkpoint (state, RNG stream and horizon continue where it stopped)."""
+        started = time.perf_counter()
+        rng = np.random.default_rng()
+        rng.bit_generator.state = checkpoint.rng_state
+        pending_deliveries = InboundQueue()
+        for arrival_day, qty in checkpoint.pending:
+            pending_deliveries.push(arrival_day, qty)
+        result = self._run(
+            checkpoint.product, compile_scenario(checkpoint.scenario), rng, checkpoint.history_days,
+            first_day=checkpoint.next_day, n_days=days, start_date=checkpoint.next_date,
+            sim_stock=checkpoint.on_hand, pending_deliveries=pending_deliveries, missed_before=checkpoint.missed_sales_days,
+        )
+        result.sim_seconds = time.perf_counter() - started
+        return result
+
+    def _run(
+        self,
+        product_data: Dict[str, Any],
+        spec: ScenarioSpec,
+        rng: np.random.Generator,
+        history_days: int,
+        first_day: int,
+        n_days: int,
+        start_date: datetime,
+        sim_stock: int,
+        pending_deliveries: InboundQueue,
+        missed_before: int,
+    ) -> ProductResult:
+        """Daily loop over day indices first_day .. first_day + n_days - 1. Result columns are relative to first_day."""
         selling_price = float(product_data.get('selling_price', 0) or 0)
         purchase_price = float(product_data.get('purchase_price', 0) or 0)
-        current_stock = int(product_data.get('current_stock_on_hand', 0) or 0)
         lead_time = int(product_data.get('product_delivery_time', 14))
 
         # Logistics Parameters
         base_qty = self.demand_engine.get_base_demand(selling_price)
-        avg_daily = base_qty
-        
-        # Scenario adjustments for ROP
-        if "Fast" in scenario or "Container" in scenario: avg_daily *= 2.0
-        if "Seasonal" in scenario: avg_daily *= 1.5
-        if "Trend" in scenario: avg_daily *= 1.5 
-        
-        reorder_point = lead_time * avg_daily * 1.5 # 1.5x Lead Time Demand
-        
-        # Initial Stock calculation
-        sim_stock = current_stock + 800 
-        if "New Launch" in scenario: sim_stock = 0
-        if "Obsolete" in scenario: sim_stock = 600
-        if "Sporadic" in scenario or "Lumpy" in scenario: sim_stock = 60
-        
-        pending_deliveries = []
-        sales_history = []
-        buy_orders = []
-        stock_history = []
-        
+        avg_daily = spec.avg_daily(base_qty)
+        days = np.arange(first_day, first_day + n_days)
+
+        # Per-day ROP (1.5x Lead Time Demand, with the scenario's late-phase sabotage / stop-ordering)
+        reorder_points = spec.reorder_points(history_days, lead_time, avg_daily)[spec.horizon_days(days, history_days)].tolist()
+        order_q = spec.order_quantity(avg_daily, lead_time)
+        launch_day = spec.launch_day(history_days)
+        launch_qty = int(avg_daily * spec.launch_stock_days)
+        jitter = spec.lead_time_jitter
+
+        on_hand = []
+        sold_per_day = []
+        bo_day = []
+        bo_delivery_day = []
+
         missed_sales_days = 0
-        total_sales = 0
 
-        for day in range(self.history_days):
-            curr_date = self.start_date + timedelta(days=day)
-            date_str = curr_date.strftime("%Y-%m-%d")
-            iso_date = curr_date.strftime("%Y-%m-%dT12:00:00Z")
-            
-            # --- SABOTAGE / ADJUSTMENTS ---
-            active_rop = reorder_point
-            if "Stockout" in scenario and day > (self.history_days - 90):
-                 # Supply-side sabotage: Cut ROP to 80% of LTD (guarantees stockout)
-                 active_rop = (lead_time * avg_daily) * 0.8
-            
-            if "Obsolete" in scenario and day > (self.history_days - 60):
-                 active_rop = -9999 # Stop ordering
+        # All requested days' demand in one vectorized call (instead of get_daily_demand per day)
+        demand_series = self.demand_engine.get_demand_series(spec, base_qty, history_days, rng, days).tolist()
 
+        for i, day in enumerate(range(first_day, first_day + n_days)):
             # A. INBOUND (Deliveries)
-            arrived = 0
-            new_pending = []
-            for d_day, d_qty, bo_data in pending_deliveries:
-                if day >= d_day:
-                    arrived += d_qty
-                    # Mark BO as received if needed in your logic
-                else:
-                    new_pending.append((d_day, d_qty, bo_data))
-            pending_deliveries = new_pending
-            sim_stock += arrived
+            sim_stock += pending_deliveries.receive(day)
 
             # B. SALES (Outbound)
-            demand = self.demand_engine.get_daily_demand(day, scenario, base_qty, self.history_days)
-            
+            demand = demand_series[i]
+
             # Injection for New Launch
-            if "New Launch" in scenario and day == (self.history_days - 30):
-                sim_stock += int(avg_daily * 45) # 1.5 months initial stock
-                
+            if day == launch_day:
+                sim_stock += launch_qty # 1.5 months initial stock
+
             sold = demand
             if demand > sim_stock:
                 missed_sales_days += 1
                 sold = max(0, sim_stock)
-            
-            sim_stock -= sold 
-            total_sales += sold
-            
-            if sold > 0:
-                sales_history.append({
-                    "product_id": p_id,
-                    "sku_id": p_sku,
-                    "quantity": sold,
-                    "price": selling_price,
-                    "date": date_str,
-                    "iso_date": iso_date
-                })
+
+            sim_stock -= sold
+            sold_per_day.append(sold)
 
             # C. REORDER (ROP Check)
-            incoming = sum([x[1] for x in pending_deliveries])
-            if (sim_stock + incoming) < active_rop:
-                order_q = int(avg_daily * (lead_time + 45)) # Order 45 days of coverage
-                if "Container" in scenario: order_q = max(order_q, 2000)
-                if "Sporadic" in scenario: order_q = 20
-                order_q = max(10, order_q)
-                
+            if (sim_stock + pending_deliveries.in_transit) < reorder_points[i]:
                 # Lead Time Variance
                 actual_lead = lead_time
-                if "Multi-Supplier" in scenario and random.random() > 0.7:
-                    actual_lead = random.randint(25, 45)
-                
+                if jitter is not None and rng.random() < jitter[0]:
+                    actual_lead = int(rng.integers(jitter[1], jitter[2], endpoint=True))
+
                 delivery_day = day + actual_lead
-                expected_date = (self.start_date + timedelta(days=delivery_day)).strftime("%Y-%m-%dT12:00:00Z")
-                
-                buy_order = {
-                    "supplier_id": supplier_id,
-                    "product_id": p_id,
-                    "placed": iso_date,
-                    "expected_delivery": expected_date,
-                    "quantity": order_q,
-                    "unit_cost": purchase_price,
-                    "total_value": round(order_q * purchase_price, 2)
-                }
-                buy_orders.append(buy_order)
-                pending_deliveries.append((delivery_day, order_q, buy_order))
+                bo_day.append(i)
+                bo_delivery_day.append(i + actual_lead)
+                pending_deliveries.push(delivery_day, order_q)
 
             # D. SNAPSHOT
-            stock_history.append({
-                "product_id": p_id,
-                "webshop_id": w_id,
-                "on_hand": max(0, sim_stock),
-                "date": date_str
-            })
+            on_hand.append(sim_stock)
 
-        return {
-            "sales": sales_history,
-            "buy_orders": buy_orders,
-            "stocks": stock_history,
-            "metrics": {
-                "missed_sales_days": missed_sales_days,
-                "total_sales": total_sales,
-                "scenario": scenario
-            }
-        }
+        checkpoint = ProductCheckpoint(
+            product=dict(product_data),
+            scenario=spec.label,
+            history_days=history_days,
+            next_day=first_day + n_days,
+            next_date=start_date + timedelta(days=n_days),
+            on_hand=int(sim_stock),
+            pending=pending_deliveries.snapshot(),
+            missed_sales_days=missed_before + missed_sales_days,
+            rng_state=rng.bit_generator.state,
+        )
+        return self._result(
+            product_data, spec, start_date, on_hand, sold_per_day,
+            bo_day, bo_delivery_day, order_q, missed_sales_days, checkpoint,
+        )
+
+    @staticmethod
+    def _result(
+        product_data: Dict[str, Any],
+        spec: ScenarioSpec,
+        start_date: datetime,
+        on_hand: Sequence[int],
+        sold: Sequence[int],
+        bo_day: Sequence[int],
+        bo_delivery_day: Sequence[int],
+        order_q: int,
+        missed_sales_days: int,
+        checkpoint: ProductCheckpoint,
+    ) -> ProductResult:
+        return ProductResult(
+            product_id=product_data['id'],
+            sku=product_data['sku'],
+            webshop_id=product_data['shop_id'],
+            supplier_id=product_data['supplier_id'],
+            selling_price=float(product_data.get('selling_price', 0) or 0),
+            purchase_price=float(product_data.get('purchase_price', 0) or 0),
+            scenario=spec.label,
+            start_date=start_date,
+            on_hand=np.asarray(on_hand, dtype=np.int64),
+            sold=np.asarray(sold, dtype=np.int64),
+            bo_day=np.asarray(bo_day, dtype=np.int32),
+            bo_delivery_day=np.asarray(bo_delivery_day, dtype=np.int32),
+            bo_qty=np.full(len(bo_day), order_q, dtype=np.int64),
+            missed_sales_days=missed_sales_days,
+            checkpoint=checkpoint,
+        )
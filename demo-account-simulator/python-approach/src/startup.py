@@ -0,0 +1,73 @@
+"""
+Cold-start instrumentation for Cloud Run. Imported first by src.main (stdlib only): records when the app
+module started importing and, with STARTUP_PROFILE=1, the import time of each top-level package
+(self time: a package's own module code, excluding the packages it imports). Both are logged once at startup.
+"""
+import builtins
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE") == "1"
+# Run main.warm_up_service() in the app lifespan: engine + first connection, a throwaway simulation.
+STARTUP_WARM_UP = os.getenv("STARTUP_WARM_UP") == "1"
+# Packages listed in the startup log line when profiling.
+STARTUP_PROFILE_TOP = int(os.getenv("STARTUP_PROFILE_TOP", "8"))
+
+IMPORT_STARTED = time.perf_counter()
+import_seconds: Dict[str, float] = {}
+_child_seconds: List[float] = []  # Time spent in nested imports, per active import
+_original_import = builtins.__import__
+
+
+def _process_uptime() -> Optional[float]:
+    """Seconds since the process started (Linux /proc), or None where unavailable."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """builtins.__import__ wrapper: self time of each import, summed per top-level package."""
+    if not level and not fromlist and name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    package = ((globals or {}).get("__package__") or "") if level else name
+    started = time.perf_counter()
+    _child_seconds.append(0.0)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - started
+        top = package.partition(".")[0] or name
+        import_seconds[top] = import_seconds.get(top, 0.0) + elapsed - _child_seconds.pop()
+        if _child_seconds:
+            _child_seconds[-1] += elapsed
+
+
+if STARTUP_PROFILE:
+    builtins.__import__ = _timed_import
+
+
+def log_startup(phase: str = "ready") -> float:
+    """Log seconds since the app started importing (and process uptime / per-package imports). Returns the former."""
+    if builtins.__import__ is _timed_import:
+        builtins.__import__ = _original_import
+    elapsed = time.perf_counter() - IMPORT_STARTED
+    uptime = _process_uptime()
+    message = f"Startup {phase}: {elapsed:.3f}s since app import"
+    if uptime is not None:
+        message += f", {uptime:.3f}s since process start"
+    if import_seconds:
+        top = sorted(import_seconds.items(), key=lambda kv: kv[1], reverse=True)[:STARTUP_PROFILE_TOP]
+        message += "; imports: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in top)
+    logger.info(message)
+    return elapsed
@@ -0,0 +1,91 @@
+"""
+Delta writes for the Creator: instead of soft-deleting a shop's whole stock history and upserting it again,
+compare each product's new series with what is live in `stocks` and write only the difference.
+
+Products are compared by fingerprint first (md5 over "YYYY-MM-DD HH:MM:SS=on_hand" pairs in date order,
+computed in PostgreSQL by STOCK_FINGERPRINTS_SQL). Only products whose fingerprint differs are read back
+and diffed row by row into upserts (new dates or changed on_hand) and soft-deletes (dates no longer
+produced). Re-running with the same seed writes nothing; regenerating a few products touches only theirs.
+"""
+import hashlib
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+DATE_KEY_FMT = "%Y-%m-%d %H:%M:%S"
+
+# product_id -> date key -> (stored / new date value, on_hand)
+StockSeries = Dict[int, Dict[str, Tuple[Any, int]]]
+
+
+def date_key(value: Any) -> str:
+    """Stock date as 'YYYY-MM-DD HH:MM:SS' whether it is a datetime, a date or an ISO string."""
+    if isinstance(value, datetime):
+        return value.strftime(DATE_KEY_FMT)
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d 00:00:00")
+    return datetime.fromisoformat(str(value)).strftime(DATE_KEY_FMT)
+
+
+def group_series(rows: Iterable[Mapping[str, Any]]) -> StockSeries:
+    """Stock rows (product_id, date, on_hand) grouped per product, keyed by date_key."""
+    series: StockSeries = {}
+    for row in rows:
+        series.setdefault(int(row["product_id"]), {})[date_key(row["date"])] = (row["date"], int(row["on_hand"]))
+    return series
+
+
+def series_fingerprint(points: Mapping[str, Tuple[Any, int]]) -> str:
+    """md5 of one product's series; same text as STOCK_FINGERPRINTS_SQL builds with string_agg."""
+    text = ",".join(f"{key}={points[key][1]}" for key in sorted(points))
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+@dataclass
+class StockDelta:
+    """Writes that turn the live stock rows into the new ones."""
+    upserts: List[Dict[str, Any]] = field(default_factory=list)
+    deletes: List[Dict[str, Any]] = field(default_factory=list)  # {"product_id", "date"} as stored
+    inserted: int = 0
+    updated: int = 0
+    unchanged_products: int = 0
+    changed_products: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "deleted": len(self.deletes),
+            "unchanged_products": self.unchanged_products,
+            "changed_products": self.changed_products,
+        }
+
+
+def changed_products(new: StockSeries, live_fingerprints: Mapping[int, str]) -> List[int]:
+    """Products whose new series differs from the live one, plus live products that are no longer produced."""
+    changed = [p for p, points in new.items() if live_fingerprints.get(p) != series_fingerprint(points)]
+    return sorted(changed + [p for p in live_fingerprints if p not in new])
+
+
+def diff_stocks(webshop_id: int, new: StockSeries, live: StockSeries, products: Iterable[int]) -> StockDelta:
+    """Row-level delta for `products` (see changed_products); every other new product counts as unchanged."""
+    delta = StockDelta()
+    products = list(products)
+    changed = set(products)
+    delta.changed_products = len(products)
+    delta.unchanged_products = len([p for p in new if p not in changed])
+    for product_id in products:
+        new_points = new.get(product_id, {})
+        live_points = live.get(product_id, {})
+        for key, (value, on_hand) in new_points.items():
+            current = live_points.get(key)
+            if current is None or current[1] != on_hand:
+                delta.upserts.append({"product_id": product_id, "webshop_id": webshop_id, "on_hand": on_hand, "date": value})
+                if current is None:
+                    delta.inserted += 1
+                else:
+                    delta.updated += 1
+        delta.deletes.extend(
+            {"product_id": product_id, "date": value} for key, (value, _) in live_points.items() if key not in new_points
+        )
+    return delta
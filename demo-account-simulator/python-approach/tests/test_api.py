@@ -0,0 +1,434 @@
+"""API tests for src.main with the database replaced by an in-memory fake."""
+import asyncio
+import datetime
+import json
+import pytest
+from fastapi.testclient import TestClient
+from src import main
+from src.shops import DEMO_SHOP, ShopConfig
+
+
+class FakeDB:
+    """Stands in for AsyncDatabaseManager; records writes instead of touching PostgreSQL."""
+    engine = object()
+    write_mode = "delta"
+
+    def __init__(self):
+        self.writes = []
+        self.checkpoints = {}
+        self.position = (None, 0)  # (latest stock date, date offset days)
+
+    async def check_connection(self):
+        return True
+
+    async def wipe_and_insert_stocks(self, webshop_id, stocks_data, chunk_size=None, checkpoints=None):
+        self.writes.append((webshop_id, len(stocks_data)))
+        if checkpoints is not None:
+            self.checkpoints = {cp.product_id: cp for cp in checkpoints}
+        return {"method": "fake", "rows": len(stocks_data), "seconds": 0.0, "rows_per_sec": 0.0}
+
+    async def wipe_and_insert_shops(self, shops, chunk_size=None):
+        self.writes.append(("batch", [(webshop_id, len(stocks_data)) for webshop_id, stocks_data, _ in shops]))
+        for _, _, checkpoints in shops:
+            self.checkpoints.update({cp.product_id: cp for cp in checkpoints})
+        rows = sum(len(stocks_data) for _, stocks_data, _ in shops)
+        return {"method": "fake", "rows": rows, "seconds": 0.0, "rows_per_sec": 0.0}
+
+    async def append_stocks(self, webshop_id, stocks_data, checkpoints, chunk_size=None):
+        self.writes.append((webshop_id, "append", len(stocks_data)))
+        self.checkpoints.update({cp.product_id: cp for cp in checkpoints})
+        return {"method": "fake", "rows": len(stocks_data), "seconds": 0.0, "rows_per_sec": 0.0}
+
+    async def load_checkpoints(self, webshop_id):
+        return list(self.checkpoints.values())
+
+    async def stock_position(self, webshop_id):
+        return self.position
+
+    async def run_maintenance_shift(self, webshop_id):
+        self.writes.append((webshop_id, "shift"))
+
+    async def run_maintenance_offset(self, webshop_id):
+        self.writes.append((webshop_id, "offset"))
+        return 3
+
+    async def run_maintenance_chunked(self, webshop_id):
+        self.writes.append((webshop_id, "chunked"))
+        return {"rows": 10, "seconds": 0.1, "rows_per_sec": 100.0, "tables": {}}
+
+    async def dispose(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(main, "db", db)
+    monkeypatch.setattr(main, "jobs", main.JobStore())
+    return db
+
+
+@pytest.fixture
+def client(fake_db):
+    return TestClient(main.app)
+
+
+# A second configured shop: two-year horizon, fixed seed, product 2 forced to Seasonal Summer
+SALES_SHOP = ShopConfig(2001, frozenset([1, 2, 3]), history_days=730, seed=7, archetype_overrides={2: "Seasonal Summer"})
+
+
+@pytest.fixture
+def two_shops(monkeypatch):
+    monkeypatch.setattr(main, "shops", {1380: DEMO_SHOP, 2001: SALES_SHOP})
+
+
+def _payload(*names, webshop_id=1380, product_ids=None):
+    product_ids = product_ids or sorted(main.DEMO_PRODUCT_WHITELIST)
+    return {
+        "webshop_id": webshop_id,
+        "products": [
+            {
+                "id": product_ids[i],
+                "sku": f"SKU-{i}",
+                "name": name,
+                "shop_id": webshop_id,
+                "supplier_id": 1001,
+                "selling_price": 20.0,
+                "purchase_price": 10.0,
+                "current_stock_on_hand": 50,
+                "product_delivery_time": 14,
+            }
+            for i, name in enumerate(names)
+        ],
+    }
+
+
+class TestSimulate:
+    def test_sync_simulate(self, client, fake_db):
+        resp = client.post("/simulate", json=_payload("A (Stable Fast)"))
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["record_counts"]["stocks"] == 365
+        assert fake_db.writes == [(1380, 365)]
+
+    def test_seed_is_echoed_and_reproducible(self, client, fake_db):
+        payload = dict(_payload("A (Multi-Supplier)"), seed=123)
+        first = client.post("/simulate", json=payload).json()
+        second = client.post("/simulate", json=payload).json()
+        assert first["seed"] == 123
+        assert first["api_payloads"] == second["api_payloads"]
+        assert isinstance(client.post("/simulate", json=_payload("A (Stable Fast)")).json()["seed"], int)
+
+    def test_replicas_pick_ensemble_winner(self, client, fake_db):
+        body = client.post("/simulate", json=dict(_payload("A (Seasonal Summer)"), seed=3, replicas=10)).json()
+        assert body["replicas"] == 10
+        assert client.post("/simulate", json=dict(_payload("A (Seasonal Summer)"), replicas=0)).status_code == 422
+
+    def test_rejects_other_shop(self, client):
+        payload = _payload("A (Stable Fast)")
+        payload["webshop_id"] = 1
+        assert client.post("/simulate", json=payload).status_code == 403
+
+
+class TestShopConfig:
+    def test_configured_shop_uses_its_whitelist_horizon_and_seed(self, client, fake_db, two_shops):
+        body = client.post("/simulate", json=_payload("A (Stable Fast)", "B (Stable Fast)", webshop_id=2001, product_ids=[1, 2])).json()
+        assert body["seed"] == 7
+        assert body["record_counts"]["stocks"] == 1460
+        assert fake_db.writes == [(2001, 1460)]
+        assert fake_db.checkpoints[2].scenario == "Seasonal Summer"
+        assert fake_db.checkpoints[1].scenario == "Stable Fast"
+
+    def test_other_shops_whitelist_is_rejected(self, client, two_shops):
+        resp = client.post("/simulate", json=_payload("A (Stable Fast)", webshop_id=2001))
+        assert resp.status_code == 400
+
+    def test_products_of_another_shop_are_rejected(self, client, fake_db, two_shops):
+        payload = _payload("A (Stable Fast)", "B (Stable Fast)", webshop_id=2001, product_ids=[1, 2])
+        payload["products"][1]["shop_id"] = 1380
+        resp = client.post("/simulate", json=payload)
+        assert resp.status_code == 400
+        assert "[2]" in resp.json()["detail"]
+        assert fake_db.writes == []
+
+    def test_root_lists_shops(self, client, two_shops):
+        assert client.get("/").json()["shops"] == [1380, 2001]
+
+
+class TestBatch:
+    def test_simulates_and_writes_all_shops_once(self, client, fake_db, two_shops):
+        resp = client.post("/simulate/batch", json={"shops": [
+            dict(_payload("A (Stable Fast)"), seed=5),
+            _payload("A (Stable Fast)", "B (Lumpy)", webshop_id=2001, product_ids=[1, 3]),
+        ]})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert fake_db.writes == [("batch", [(1380, 365), (2001, 1460)])]
+        assert [(s["webshop_id"], s["seed"]) for s in body["shops"]] == [(1380, 5), (2001, 7)]
+        assert body["record_counts"]["stocks"] == 1825
+
+    def test_matches_single_shop_simulate(self, client, fake_db, two_shops):
+        payload = _payload("A (Step Change Up)", "B (Obsolete)", webshop_id=2001, product_ids=[1, 2])
+        single = client.post("/simulate", json=payload).json()
+        batch = client.post("/simulate/batch", json={"shops": [payload]}).json()
+        assert batch["shops"][0]["api_payloads"] == single["api_payloads"]
+
+    def test_validates_every_shop_before_simulating(self, client, fake_db, two_shops):
+        resp = client.post("/simulate/batch", json={"shops": [_payload("A (Stable Fast)"), _payload("A", webshop_id=9)]})
+        assert resp.status_code == 403
+        duplicate = client.post("/simulate/batch", json={"shops": [_payload("A (Stable Fast)")] * 2})
+        assert duplicate.status_code == 400
+        assert client.post("/simulate/batch", json={"shops": []}).status_code == 422
+        assert fake_db.writes == []
+
+
+class TestMetricsEndpoint:
+    def test_simulate_shows_up_in_metrics(self, client, fake_db):
+        assert client.post("/simulate", json=_payload("A (Stable Fast)", "B (Seasonal Summer)")).status_code == 200
+        resp = client.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain")
+        text = resp.text
+        for phase in ("parse", "simulate", "write", "serialize"):
+            assert f'demo_sim_phase_seconds_count{{endpoint="simulate",phase="{phase}"}}' in text
+        assert 'demo_sim_product_seconds_count{archetype="seasonal_summer"}' in text
+        assert 'demo_sim_payload_bytes_count{endpoint="simulate"}' in text
+        assert 'demo_sim_request_seconds_count{method="POST",route="/simulate",status="200"}' in text
+
+
+class TestProfiling:
+    def test_off_by_default(self, client, fake_db):
+        resp = client.post("/simulate?profile=inline", json=_payload("A (Stable Fast)"))
+        assert resp.status_code == 200
+        assert "profile" not in resp.json()
+        assert main.profiling.PROFILE_PATH_HEADER not in resp.headers
+
+    def test_inline_profile(self, client, fake_db, monkeypatch):
+        pytest.importorskip("pyinstrument")
+        monkeypatch.setattr(main.profiling, "REQUEST_PROFILING", True)
+        resp = client.post("/simulate", json=_payload("A (Stable Fast)"), headers={"X-Profile": "inline"})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["record_counts"]["stocks"] == 365
+        assert body["profile"]["label"] == "POST /simulate"
+        assert "simulate_product_columnar" in {row["function"] for row in body["profile"]["breakdown"]}
+
+    def test_file_profile(self, client, fake_db, monkeypatch, tmp_path):
+        pytest.importorskip("pyinstrument")
+        monkeypatch.setattr(main.profiling, "REQUEST_PROFILING", True)
+        monkeypatch.setattr(main.profiling, "PROFILE_DIR", str(tmp_path))
+        resp = client.post("/maintain?webshop_id=1380&mode=offset&profile=file")
+        assert resp.status_code == 200
+        assert "profile" not in resp.json()
+        path = resp.headers[main.profiling.PROFILE_PATH_HEADER]
+        assert path.startswith(str(tmp_path))
+        with open(path) as f:
+            assert json.load(f)["label"] == "POST /maintain"
+
+    def test_missing_profiler_is_refused(self, client, fake_db, monkeypatch):
+        def unavailable():
+            raise main.profiling.ProfilerUnavailable("Request profiling needs pyinstrument: pip install pyinstrument")
+        monkeypatch.setattr(main.profiling, "REQUEST_PROFILING", True)
+        monkeypatch.setattr(main.profiling, "_sampler", unavailable)
+        resp = client.post("/simulate?profile=inline", json=_payload("A (Stable Fast)"))
+        assert resp.status_code == 503
+        assert "pyinstrument" in resp.json()["detail"]
+
+
+class TestBackgroundJobs:
+    def test_background_job_lifecycle(self, client, fake_db):
+        resp = client.post("/simulate?background=true", json=_payload("A (Stable Fast)", "B (Obsolete / Dead)"))
+        assert resp.status_code == 202
+        job_id = resp.json()["job_id"]
+        # TestClient runs background tasks before returning, so the job is finished here
+        status = client.get(f"/jobs/{job_id}").json()
+        assert status["status"] == "succeeded"
+        assert status["phase"] == "done"
+        assert status["progress"] == {"products_done": 2, "products_total": 2, "rows_written": 730}
+        assert set(status["timings"]) == {"simulating", "writing"}
+        result = client.get(f"/jobs/{job_id}/result").json()
+        assert result["record_counts"]["stocks"] == 730
+
+    def test_failed_job_reports_phase(self, client, fake_db, monkeypatch):
+        async def boom(webshop_id, stocks_data, chunk_size=None, checkpoints=None):
+            raise RuntimeError("db down")
+        monkeypatch.setattr(fake_db, "wipe_and_insert_stocks", boom)
+        job_id = client.post("/simulate?background=true", json=_payload("A (Stable Fast)")).json()["job_id"]
+        status = client.get(f"/jobs/{job_id}").json()
+        assert status["status"] == "failed"
+        assert status["error"] == "Database update failed: db down"
+        assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+    def test_results_are_released_past_the_row_cap(self, client, fake_db, monkeypatch):
+        monkeypatch.setattr(main, "jobs", main.JobStore(max_retained_rows=1))
+        first = client.post("/simulate?background=true", json=_payload("A (Stable Fast)")).json()["job_id"]
+        second = client.post("/simulate?background=true", json=_payload("A (Stable Fast)")).json()["job_id"]
+        status = client.get(f"/jobs/{first}").json()
+        assert status["status"] == "succeeded" and status["result_released"]
+        assert client.get(f"/jobs/{first}/result").status_code == 410
+        assert client.get(f"/jobs/{second}/result").status_code == 200  # The newest result is always kept
+
+    def test_unknown_job(self, client):
+        assert client.get("/jobs/nope").status_code == 404
+        assert client.get("/jobs/nope/result").status_code == 404
+
+
+@pytest.fixture
+def pushes(monkeypatch):
+    """Public API push configured, with push_payloads recording (account, payload counts, resumed?) instead of POSTing."""
+    calls = []
+
+    async def fake_push(account_id, api_payloads, progress=None, client=None):
+        calls.append((account_id, len(api_payloads["sales"]), len(api_payloads["buy_orders"]), progress is not None))
+        progress = progress or main.public_api.PushProgress()
+        progress.sent += 1
+        return progress
+    monkeypatch.setattr(main.public_api, "OPTIPLY_API_TOKEN", "token")
+    monkeypatch.setattr(main.public_api, "push_payloads", fake_push)
+    return calls
+
+
+class TestPush:
+    def test_background_push(self, client, fake_db, pushes):
+        job_id = client.post("/simulate?background=true&push=true", json=_payload("A (Stable Fast)")).json()["job_id"]
+        status = client.get(f"/jobs/{job_id}").json()
+        assert status["status"] == "succeeded"
+        assert set(status["timings"]) == {"simulating", "writing", "pushing"}
+        assert status["push"]["sent"] == 1 and status["push"]["running"] is False
+        result = client.get(f"/jobs/{job_id}/result").json()
+        assert pushes == [(1380, result["record_counts"]["sales"], result["record_counts"]["buy_orders"], True)]
+
+    def test_push_resumes_job_progress(self, client, fake_db, pushes):
+        job_id = client.post("/simulate?background=true&push=true", json=_payload("A (Stable Fast)")).json()["job_id"]
+        assert client.post(f"/jobs/{job_id}/push").status_code == 202
+        assert client.get(f"/jobs/{job_id}").json()["push"]["sent"] == 2  # Same progress object, resumed
+        assert len(pushes) == 2
+
+    def test_push_after_plain_background_job(self, client, fake_db, pushes):
+        job_id = client.post("/simulate?background=true", json=_payload("A (Stable Fast)")).json()["job_id"]
+        assert client.get(f"/jobs/{job_id}").json()["push"] is None
+        assert client.post(f"/jobs/{job_id}/push").status_code == 202
+        assert pushes[0][3] is False
+
+    def test_push_requires_background_and_token(self, client, fake_db, monkeypatch):
+        assert client.post("/simulate?push=true", json=_payload("A (Stable Fast)")).status_code == 400
+        monkeypatch.setattr(main.public_api, "OPTIPLY_API_TOKEN", None)
+        assert client.post("/simulate?background=true&push=true", json=_payload("A (Stable Fast)")).status_code == 503
+        assert fake_db.writes == []
+
+    def test_push_unknown_or_failed_job(self, client, fake_db, pushes, monkeypatch):
+        assert client.post("/jobs/nope/push").status_code == 404
+        async def boom(webshop_id, stocks_data, chunk_size=None, checkpoints=None):
+            raise RuntimeError("db down")
+        monkeypatch.setattr(fake_db, "wipe_and_insert_stocks", boom)
+        job_id = client.post("/simulate?background=true", json=_payload("A (Stable Fast)")).json()["job_id"]
+        assert client.post(f"/jobs/{job_id}/push").status_code == 409
+        assert pushes == []
+
+
+class TestStream:
+    def test_ndjson_batches_then_summary(self, client, fake_db):
+        resp = client.post("/simulate/stream?batch_size=50", json=_payload("A (Stable Fast)", "B (Stable Slow)"))
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        summary = lines[-1]
+        assert summary["type"] == "summary"
+        sales_lines = [l for l in lines if l["type"] == "sales"]
+        assert all(len(l["items"]) <= 50 for l in sales_lines)
+        assert sum(len(l["items"]) for l in sales_lines) == summary["record_counts"]["sales"]
+        assert [l["batch"] for l in sales_lines] == list(range(len(sales_lines)))
+        # Payloads precede the stock write: only the summary says they may be pushed
+        assert all(l["committed"] is False for l in lines[:-1]) and summary["committed"] is True
+        assert fake_db.writes == [(1380, 730)]
+
+    def test_db_failure_ends_with_error_line(self, client, fake_db, monkeypatch):
+        async def boom(webshop_id, stocks_data, chunk_size=None, checkpoints=None):
+            raise RuntimeError("db down")
+        monkeypatch.setattr(fake_db, "wipe_and_insert_stocks", boom)
+        resp = client.post("/simulate/stream", json=_payload("A (Stable Fast)"))
+        last = json.loads(resp.text.splitlines()[-1])
+        assert last == {"type": "error", "detail": "Database update failed: db down"}
+
+
+    def test_write_survives_client_disconnect(self, fake_db):
+        products = [main.ProductInput(**p) for p in _payload("A (Stable Fast)", "B (Stable Slow)")["products"]]
+
+        async def run():
+            feed = main.start_stream(DEMO_SHOP, products, seed=5)
+            lines = main.stream_lines(feed, batch_size=10, seed=5)
+            assert json.loads(await lines.__anext__())["type"] == "sales"
+            await lines.aclose()  # Client went away after the first line
+            assert not feed.open
+            await asyncio.gather(*main.stream_writes)
+            assert feed.pending == 0  # Later results and the summary were dropped, not buffered
+
+        asyncio.run(run())
+        assert fake_db.writes == [(1380, 730)]
+
+
+class TestRollForward:
+    def test_requires_checkpoint(self, client, fake_db):
+        assert client.post("/roll-forward", params={"webshop_id": 1380}).status_code == 409
+
+    def test_appends_new_days_after_simulate(self, client, fake_db):
+        client.post("/simulate", json=dict(_payload("A (Stable Fast)", "B (Seasonal Summer)"), seed=3))
+        (cp,) = [c for c in fake_db.checkpoints.values() if c.scenario == "Stable Fast"]
+        assert cp.next_day == 365
+        body = client.post("/roll-forward", params={"webshop_id": 1380, "days": 2}).json()
+        assert body["products_advanced"] == 2
+        assert body["record_counts"]["stocks"] == 4
+        assert fake_db.writes[-1] == (1380, "append", 4)
+        assert fake_db.checkpoints[cp.product_id].next_day == 367
+
+    def test_refuses_checkpoints_behind_maintained_history(self, client, fake_db):
+        client.post("/simulate", json=_payload("A (Stable Fast)"))
+        (cp,) = fake_db.checkpoints.values()
+        fake_db.position = (cp.next_date - datetime.timedelta(days=1), 0)  # As written by /simulate
+        assert client.post("/roll-forward", params={"webshop_id": 1380, "days": 1}).status_code == 200
+        fake_db.position = (cp.next_date + datetime.timedelta(days=30), 0)  # After a /maintain shift
+        assert client.post("/roll-forward", params={"webshop_id": 1380, "days": 1}).status_code == 409
+        fake_db.position = (None, 30)  # After /maintain?mode=offset
+        assert client.post("/roll-forward", params={"webshop_id": 1380, "days": 1}).status_code == 409
+
+    def test_default_days_is_up_to_yesterday(self, client, fake_db):
+        client.post("/simulate", json=_payload("A (Stable Fast)"))
+        body = client.post("/roll-forward", params={"webshop_id": 1380}).json()
+        assert body["products_advanced"] == 0
+
+
+class TestMaintain:
+    def test_default_mode_shifts_rows(self, client, fake_db):
+        body = client.post("/maintain", params={"webshop_id": 1380}).json()
+        assert body["mode"] == "shift"
+        assert fake_db.writes == [(1380, "shift")]
+
+    def test_offset_mode_advances_offset(self, client, fake_db):
+        body = client.post("/maintain", params={"webshop_id": 1380, "mode": "offset"}).json()
+        assert body["offset_days"] == 3
+        assert fake_db.writes == [(1380, "offset")]
+
+    def test_chunked_mode_reports_throughput(self, client, fake_db):
+        body = client.post("/maintain", params={"webshop_id": 1380, "mode": "chunked"}).json()
+        assert body["shift"]["rows_per_sec"] == 100.0
+        assert fake_db.writes == [(1380, "chunked")]
+
+    def test_unknown_mode_rejected(self, client, fake_db):
+        assert client.post("/maintain", params={"webshop_id": 1380, "mode": "bogus"}).status_code == 422
+
+    def test_refused_in_generation_mode(self, client, fake_db):
+        fake_db.write_mode = "generation"
+        for mode in ("shift", "offset", "chunked"):
+            resp = client.post("/maintain", params={"webshop_id": 1380, "mode": mode})
+            assert resp.status_code == 409
+            assert "/roll-forward" in resp.json()["detail"]
+        assert fake_db.writes == []
+
+    def test_generation_mode_needs_switched_readers_to_start(self, fake_db, monkeypatch):
+        fake_db.write_mode = "generation"
+        with pytest.raises(RuntimeError, match="STOCK_READERS_SWITCHED"):
+            with TestClient(main.app):
+                pass
+        monkeypatch.setattr(main, "STOCK_READERS_SWITCHED", True)
+        with TestClient(main.app) as client:
+            assert client.get("/health").status_code == 200
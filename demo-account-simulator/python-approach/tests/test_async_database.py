@@ -0,0 +1,366 @@
+"""Unit tests for AsyncDatabaseManager (aiosqlite stands in for the non-COPY path)."""
+import asyncio
+import datetime
+import pytest
+from sqlalchemy import text
+from src import async_database, metrics
+from src.async_database import AsyncDatabaseManager, to_async_url
+from src.simulation import SupplyChainSimulator
+from src.date_shift import SHIFT_PROGRESS_SCHEMA_SQL, SHIFT_TABLES, ChunkedDateShifter
+from src.generations import StockGenerations
+
+
+def _stock(product_id, day, on_hand):
+    return {"product_id": product_id, "webshop_id": 1380, "on_hand": on_hand, "date": f"2025-01-{day:02d}"}
+
+
+async def _create_stocks_table(db):
+    async with db.engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE stocks (product_id INTEGER, webshop_id INTEGER, on_hand INTEGER, date TEXT, "
+            "deleted_at TEXT, UNIQUE (product_id, date))"
+        ))
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    db = AsyncDatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'stocks.db'}")
+    asyncio.run(_create_stocks_table(db))
+    return db
+
+
+class TestToAsyncUrl:
+    def test_postgres_urls_use_asyncpg(self):
+        assert to_async_url("postgresql://u:p@h:5432/db") == "postgresql+asyncpg://u:p@h:5432/db"
+        assert to_async_url("postgresql+psycopg2://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+
+    def test_other_urls_unchanged(self):
+        assert to_async_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+
+class TestAsyncDatabaseManager:
+    def test_unconfigured(self, monkeypatch):
+        monkeypatch.setattr("src.async_database.DATABASE_URL", None)
+        db = AsyncDatabaseManager()
+        assert db.engine is None
+        assert asyncio.run(db.check_connection()) is False
+
+    def test_check_connection(self, sqlite_db):
+        assert asyncio.run(sqlite_db.check_connection()) is True
+
+    def test_bulk_load_stocks_fallback(self, sqlite_db):
+        async def run():
+            stats = await sqlite_db.bulk_load_stocks([_stock(1, d, d) for d in range(1, 8)])
+            async with sqlite_db.engine.connect() as conn:
+                count = (await conn.execute(text("SELECT COUNT(*) FROM stocks"))).scalar()
+            await sqlite_db.dispose()
+            return stats, count
+
+        waits = metrics.DB_POOL_WAIT_SECONDS.count()
+        stats, count = asyncio.run(run())
+        assert metrics.DB_POOL_WAIT_SECONDS.count() == waits + 1  # The load's checkout
+        assert not sqlite_db.supports_copy
+        assert stats["method"] == "executemany"
+        assert stats["rows"] == 7
+        assert count == 7
+
+
+async def _live_stocks(db):
+    async with db.engine.connect() as conn:
+        rows = await conn.execute(text(
+            "SELECT product_id, date, on_hand FROM stocks WHERE deleted_at IS NULL ORDER BY product_id, date"
+        ))
+        return [tuple(r) for r in rows]
+
+
+class TestDeltaWrites:
+    def _write(self, db, rows, webshop_id=1380):
+        return asyncio.run(db.wipe_and_insert_stocks(webshop_id, rows))
+
+    def test_same_data_writes_nothing(self, sqlite_db):
+        rows = [_stock(p, d, p * d) for p in (1, 2) for d in range(1, 6)]
+        first = self._write(sqlite_db, rows)
+        assert first["rows"] == 10 and first["delta"]["inserted"] == 10
+        again = self._write(sqlite_db, rows)
+        assert again["rows"] == 0
+        assert again["delta"] == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged_products": 2, "changed_products": 0}
+
+    def test_only_changed_rows_are_written(self, sqlite_db):
+        self._write(sqlite_db, [_stock(p, d, d) for p in (1, 2, 3) for d in range(1, 6)])
+        # Product 1 unchanged, product 2: one day changed and one day dropped, product 3 gone, product 4 new
+        rows = [_stock(1, d, d) for d in range(1, 6)] + [_stock(2, d, 9 if d == 2 else d) for d in range(1, 5)]
+        stats = self._write(sqlite_db, rows + [_stock(4, 1, 7)])
+        assert stats["rows"] == 2
+        assert stats["delta"] == {"inserted": 1, "updated": 1, "deleted": 6, "unchanged_products": 1, "changed_products": 3}
+        expected = sorted((r["product_id"], r["date"], r["on_hand"]) for r in rows + [_stock(4, 1, 7)])
+        assert asyncio.run(_live_stocks(sqlite_db)) == expected
+
+    def test_deleted_rows_come_back(self, sqlite_db):
+        rows = [_stock(1, d, d) for d in range(1, 4)]
+        self._write(sqlite_db, rows)
+        self._write(sqlite_db, rows[:1])
+        stats = self._write(sqlite_db, rows)
+        assert stats["delta"]["inserted"] == 2  # Soft-deleted keys are revived by the upsert
+        assert asyncio.run(_live_stocks(sqlite_db)) == [(1, r["date"], r["on_hand"]) for r in rows]
+
+    def test_other_shops_untouched(self, sqlite_db):
+        self._write(sqlite_db, [dict(_stock(5, 1, 1), webshop_id=7)], webshop_id=7)
+        self._write(sqlite_db, [_stock(1, 1, 1)])
+        self._write(sqlite_db, [_stock(2, 1, 1)])
+        assert asyncio.run(_live_stocks(sqlite_db)) == [(2, "2025-01-01", 1), (5, "2025-01-01", 1)]
+
+    def test_shops_batch(self, sqlite_db):
+        stats = asyncio.run(sqlite_db.wipe_and_insert_shops([
+            (1380, [_stock(1, d, d) for d in range(1, 4)], None),
+            (7, [dict(_stock(5, 1, 1), webshop_id=7)], None),
+        ]))
+        assert stats["rows"] == 4 and stats["delta"]["changed_products"] == 2
+
+
+class TestCheckpoints:
+    def test_stock_position(self, sqlite_db):
+        async def run():
+            empty = await sqlite_db.stock_position(1380)
+            await sqlite_db.bulk_load_stocks([_stock(1, d, d) for d in range(1, 8)])
+            position = await sqlite_db.stock_position(1380)
+            await sqlite_db.dispose()
+            return empty, position
+
+        empty, position = asyncio.run(run())
+        assert empty == (None, 0)
+        assert position == (datetime.datetime(2025, 1, 7), 0)
+
+    def test_append_stocks_saves_and_loads_checkpoints(self, sqlite_db):
+        sim = SupplyChainSimulator(history_days=5, start_date=datetime.datetime(2025, 1, 1), seed=1)
+        product = {"id": 9, "sku": "S", "shop_id": 1380, "supplier_id": 1, "selling_price": 20.0}
+        result = sim.simulate_product_columnar(product, "Stable Fast")
+        stats = asyncio.run(sqlite_db.append_stocks(1380, result.stock_rows(), [result.checkpoint]))
+        assert stats["rows"] == 5
+        (loaded,) = asyncio.run(sqlite_db.load_checkpoints(1380))
+        assert loaded == result.checkpoint
+        assert asyncio.run(sqlite_db.load_checkpoints(7)) == []
+
+
+async def _create_shift_tables(db, products, days, latest):
+    """Three shift tables for shop 1380 whose latest dates are `latest`: one order of each kind and a daily
+    stock series of `days` days per product (plus one stock row of another shop)."""
+    async with db.engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE sell_orders (id INTEGER PRIMARY KEY, webshop_id INTEGER, placed TEXT)"))
+        await conn.execute(text(
+            "CREATE TABLE buy_orders (id INTEGER PRIMARY KEY, webshop_id INTEGER, placed TEXT, expected_delivery_date TEXT)"
+        ))
+        await conn.execute(text(
+            "CREATE TABLE stocks (id INTEGER PRIMARY KEY, product_id INTEGER, webshop_id INTEGER, on_hand INTEGER, "
+            "date TEXT, UNIQUE (product_id, date))"
+        ))
+        await conn.execute(text("INSERT INTO sell_orders (webshop_id, placed) VALUES (1380, :d)"), {"d": latest.isoformat()})
+        await conn.execute(
+            text("INSERT INTO buy_orders (webshop_id, placed, expected_delivery_date) VALUES (1380, :d, :d)"),
+            {"d": latest.isoformat()},
+        )
+        # Oldest first, so ascending ids follow the dates (the order that used to collide). Same text format
+        # as SQLite's datetime(), so a shifted row really collides with an unshifted one of the same day.
+        await conn.execute(
+            text("INSERT INTO stocks (product_id, webshop_id, on_hand, date) VALUES (:p, :shop, 1, :d)"),
+            [
+                {"p": p, "shop": 1380, "d": f"{latest - datetime.timedelta(days=d)} 00:00:00"}
+                for d in reversed(range(days)) for p in range(products)
+            ] + [{"p": 99, "shop": 7, "d": "2000-01-01"}],
+        )
+
+
+async def _stock_series(db, shop):
+    """(product_id, date) of the shop's stock rows."""
+    async with db.engine.connect() as conn:
+        rows = await conn.execute(text("SELECT product_id, substr(date, 1, 10) FROM stocks WHERE webshop_id = :s"), {"s": shop})
+        return sorted((p, d) for p, d in rows)
+
+
+def _series(products, days, latest):
+    return sorted((p, (latest - datetime.timedelta(days=d)).isoformat()) for d in range(days) for p in range(products))
+
+
+class TestChunkedDateShifter:
+    @pytest.fixture
+    def shift_db(self, tmp_path):
+        return AsyncDatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'shift.db'}")
+
+    def test_shifts_every_table_to_today_in_chunks(self, shift_db):
+        today = datetime.date.today()
+        asyncio.run(_create_shift_tables(shift_db, 5, 50, today - datetime.timedelta(days=3)))
+        # target_seconds=0 pins the chunk size at the minimum (100 rows)
+        report = asyncio.run(ChunkedDateShifter(shift_db.engine, chunk_rows=100, target_seconds=0).run(1380))
+        assert report["rows"] == 252
+        stocks = report["tables"]["stocks"]
+        assert stocks["lag_days"] == 3
+        assert stocks["chunks"] == 18  # A 1-day window, then windows of at most lag (3) days
+        assert asyncio.run(_stock_series(shift_db, 1380)) == _series(5, 50, today)
+        assert asyncio.run(_stock_series(shift_db, 7)) == [(99, "2000-01-01")]
+        # Up to date: the next run is a no-op
+        assert asyncio.run(ChunkedDateShifter(shift_db.engine).run(1380))["rows"] == 0
+
+    def test_long_series_with_a_short_lag_keeps_dates_unique(self, shift_db):
+        today = datetime.date.today()
+        asyncio.run(_create_shift_tables(shift_db, 1, 300, today - datetime.timedelta(days=4)))
+        shifter = ChunkedDateShifter(shift_db.engine, tables=SHIFT_TABLES[2:], chunk_rows=100, target_seconds=0)
+        assert asyncio.run(shifter.run(1380))["rows"] == 300
+        assert asyncio.run(_stock_series(shift_db, 1380)) == _series(1, 300, today)
+
+    def test_resumes_half_shifted_table_with_recorded_lag(self, shift_db):
+        today = datetime.date.today()
+        asyncio.run(_create_shift_tables(shift_db, 3, 50, today - datetime.timedelta(days=5)))
+        shifter = ChunkedDateShifter(shift_db.engine, tables=SHIFT_TABLES[2:], chunk_rows=100, target_seconds=0)
+
+        async def interrupted():
+            async with shift_db.engine.begin() as conn:
+                await conn.execute(text(SHIFT_PROGRESS_SCHEMA_SQL))
+            lag, cursor, _, _ = await shifter._start_or_resume(1380, SHIFT_TABLES[2])
+            shifted = 0
+            for _ in range(3):
+                rows, cursor = await shifter._shift_chunk(1380, SHIFT_TABLES[2], lag, cursor)
+                shifted += rows
+            return shifted
+
+        shifted = asyncio.run(interrupted())
+        assert 0 < shifted < 150  # Killed half-way: the newest dates are shifted, the rest are not
+        report = asyncio.run(ChunkedDateShifter(shift_db.engine, tables=SHIFT_TABLES[2:], chunk_rows=100).run(1380))["tables"]["stocks"]
+        assert report["resumed"] and report["rows_before_resume"] == shifted
+        assert report["rows"] == 150 - shifted and report["lag_days"] == 5
+        assert asyncio.run(_stock_series(shift_db, 1380)) == _series(3, 50, today)
+
+    def test_physical_shifts_drop_the_offset_of_offset_mode(self, shift_db, monkeypatch):
+        today = datetime.date.today()
+        asyncio.run(_create_shift_tables(shift_db, 2, 10, today - datetime.timedelta(days=4)))
+
+        async def offset_mode_ran(offset_days):  # As left by /maintain?mode=offset (PostgreSQL-only SQL)
+            async with shift_db.engine.begin() as conn:
+                await conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS demo_date_offsets (webshop_id INTEGER PRIMARY KEY, anchor_date TEXT, offset_days INTEGER)"
+                ))
+                await conn.execute(text("DELETE FROM demo_date_offsets"))
+                await conn.execute(text("INSERT INTO demo_date_offsets VALUES (1380, :anchor, :days), (7, '2000-01-01', 9)"), {
+                    "anchor": (today - datetime.timedelta(days=offset_days)).isoformat(), "days": offset_days,
+                })
+
+        async def offsets():
+            async with shift_db.engine.connect() as conn:
+                return dict((await conn.execute(text("SELECT webshop_id, offset_days FROM demo_date_offsets"))).all())
+
+        asyncio.run(offset_mode_ran(4))
+        asyncio.run(shift_db.run_maintenance_chunked(1380))
+        assert asyncio.run(offsets()) == {7: 9}  # Rows are current now: no offset on top
+        assert asyncio.run(_stock_series(shift_db, 1380)) == _series(2, 10, today)
+
+        asyncio.run(offset_mode_ran(2))
+        monkeypatch.setattr(async_database, "MAINTENANCE_SHIFT_QUERIES", [])  # Its UPDATEs are PostgreSQL-only
+        asyncio.run(shift_db.run_maintenance_shift(1380))
+        assert asyncio.run(offsets()) == {7: 9}
+
+
+@pytest.fixture
+def generation_db(tmp_path):
+    return AsyncDatabaseManager(f"sqlite+aiosqlite:///{tmp_path / 'generations.db'}", write_mode="generation")
+
+
+async def _live_view(db):
+    async with db.engine.connect() as conn:
+        rows = await conn.execute(text("SELECT product_id, webshop_id, on_hand, date FROM stocks_live ORDER BY webshop_id, product_id, date"))
+        return [tuple(r) for r in rows]
+
+
+async def _generation_states(db):
+    async with db.engine.connect() as conn:
+        rows = await conn.execute(text("SELECT webshop_id, state FROM demo_stock_generations ORDER BY generation"))
+        return [tuple(r) for r in rows]
+
+
+class TestGenerations:
+    def test_swap_replaces_live_rows(self, generation_db):
+        async def run():
+            await generation_db.wipe_and_insert_stocks(1380, [_stock(1, d, d) for d in range(1, 4)])
+            stats = await generation_db.wipe_and_insert_stocks(1380, [_stock(2, 1, 5)])
+            await generation_db.dispose()  # Waits for the background drop of the replaced generation
+            return stats, await _live_view(generation_db), await _generation_states(generation_db)
+
+        stats, live, states = asyncio.run(run())
+        assert stats["write_mode"] == "generation" and stats["rows"] == 1
+        assert live == [(2, 1380, 5, "2025-01-01")]
+        assert states == [(1380, "live")]
+
+    def test_failed_load_keeps_previous_generation(self, generation_db, monkeypatch):
+        async def run():
+            await generation_db.wipe_and_insert_stocks(1380, [_stock(1, 1, 1)])
+
+            async def boom(generation, stocks_data, chunk_size):
+                raise RuntimeError("copy failed")
+            monkeypatch.setattr(generation_db.generations, "load", boom)
+            with pytest.raises(RuntimeError):
+                await generation_db.wipe_and_insert_stocks(1380, [_stock(2, 1, 1)])
+            await generation_db.dispose()
+            return await _live_view(generation_db), await _generation_states(generation_db)
+
+        live, states = asyncio.run(run())
+        assert live == [(1, 1380, 1, "2025-01-01")]
+        assert states == [(1380, "live")]  # The failed generation was dropped
+
+    def test_shops_flip_together_and_keep_other_shops(self, generation_db):
+        async def run():
+            await generation_db.wipe_and_insert_stocks(7, [dict(_stock(5, 1, 1), webshop_id=7)])
+            await generation_db.wipe_and_insert_shops([
+                (1380, [_stock(1, 1, 2)], None), (2001, [dict(_stock(3, 1, 3), webshop_id=2001)], None),
+            ])
+            await generation_db.dispose()
+            return await _live_view(generation_db)
+
+        assert [(p, shop) for p, shop, _, _ in asyncio.run(run())] == [(5, 7), (1, 1380), (3, 2001)]
+
+    def test_superseded_generation_cannot_go_live(self, generation_db):
+        async def run():
+            gens = generation_db.generations
+            old = await gens.begin([1380])
+            new = await gens.begin([1380])
+            async with generation_db.engine.begin() as conn:
+                await gens.swap(conn, new)
+            with pytest.raises(RuntimeError):
+                async with generation_db.engine.begin() as conn:
+                    await gens.swap(conn, old)
+            dropped = await gens.drop_retired()
+            return old[1380], dropped["dropped"], await _generation_states(generation_db)
+
+        old, dropped, states = asyncio.run(run())
+        assert dropped == [old]  # Abandoned: older than the live generation
+        assert states == [(1380, "live")]
+
+    def test_append_goes_to_live_generation(self, generation_db):
+        sim = SupplyChainSimulator(history_days=5, start_date=datetime.datetime(2025, 1, 1), seed=1)
+        product = {"id": 9, "sku": "S", "shop_id": 1380, "supplier_id": 1, "selling_price": 20.0}
+        result = sim.simulate_product_columnar(product, "Stable Fast")
+
+        async def run():
+            await generation_db.wipe_and_insert_stocks(1380, [_stock(9, 1, 1)], checkpoints=[result.checkpoint])
+            await generation_db.append_stocks(1380, [_stock(9, 2, 4), _stock(9, 1, 3)], [result.checkpoint])
+            await generation_db.dispose()
+            return await _live_view(generation_db)
+
+        assert asyncio.run(run()) == [(9, 1380, 3, "2025-01-01"), (9, 1380, 4, "2025-01-02")]
+
+    def test_append_binds_datetimes_on_asyncpg(self):
+        class Engine:
+            dialect = type("Dialect", (), {"name": "postgresql"})()
+            driver = "asyncpg"
+
+        class RecordingConn:
+            def __init__(self):
+                self.params = []
+
+            async def execute(self, statement, params=None):
+                self.params.append(params)
+                return type("Result", (), {"scalar": lambda self: 4})()
+
+        gens = StockGenerations(Engine())
+        gens._schema_ready = True
+        conn = RecordingConn()
+        asyncio.run(gens.append(conn, 1380, [_stock(9, 2, 4)]))
+        assert conn.params[-1] == [{
+            "product_id": 9, "webshop_id": 1380, "on_hand": 4, "date": datetime.datetime(2025, 1, 2), "generation": 4,
+        }]
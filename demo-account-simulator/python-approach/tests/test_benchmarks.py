@@ -0,0 +1,88 @@
+"""Smoke tests for the benchmark suite: block loading, archetype coverage, tiny runs and the regression check."""
+import asyncio
+
+import pytest
+
+from benchmarks.retool import load_block
+from benchmarks.run import Measurement, Preset, compare, knees, load_baselines, plan, run_cases, save_baselines
+from benchmarks.workloads import ARCHETYPE_LABELS, SIM_SUITES, case_id, create_schema, db_write, parse_case
+from src.scenarios import ARCHETYPE_RULES, archetype_for
+
+TINY = Preset(products=(2, 4), days=(30, 60), lead_times=(7,), db_products=(2,), archetypes=False,
+              base=(("products", 2), ("days", 30), ("lead_time", 7)))
+
+
+def _measurement(case, us, peak=1.0, axis="products", products=32, days=365):
+    return Measurement(case=case, suite="s", axis=axis, products=products, days=days, lead_time=14,
+                       seconds=0.0, us_per_product_day=us, peak_mb=peak)
+
+
+class TestWorkloads:
+    def test_load_block_skips_entry_point(self):
+        block = load_block("simulate_stocks")
+        assert callable(block["simulate_one_product"])
+        assert "SimulationCalendar" in block and "DailyMatrix" in block
+
+    def test_archetype_labels_cover_every_archetype(self):
+        assert set(ARCHETYPE_LABELS) == {a for a, _, _ in ARCHETYPE_RULES} | {"stable"}
+        parse_archetype = load_block("simulate_stocks")["parse_archetype"]
+        for archetype, label in ARCHETYPE_LABELS.items():
+            assert archetype_for(label) == archetype
+            assert parse_archetype(f"Bench ({label})") == archetype
+
+    @pytest.mark.parametrize("suite", sorted(SIM_SUITES))
+    def test_suites_run(self, suite):
+        for archetype in (None, "seasonal_summer"):
+            SIM_SUITES[suite](3, 40, 7, archetype)()
+
+    def test_db_write_sqlite(self, tmp_path):
+        url = f"sqlite+aiosqlite:///{tmp_path / 'bench.db'}"
+        asyncio.run(create_schema(url))
+        run = db_write(url, 3, 10)
+        assert run()["rows"] == 30
+        assert run()["method"] == "executemany"  # Idempotent: rows upsert onto the same keys
+
+    def test_case_id_roundtrip(self):
+        suite, params = parse_case(case_id("python.rows", 32, 365, 14, "lumpy"))
+        assert suite == "python.rows"
+        assert params == {"archetype": "lumpy", "products": "32", "days": "365", "lead": "14"}
+
+
+class TestRunner:
+    def test_plan_shares_base_point(self):
+        cases = plan(TINY, ["python.columnar", "db"])
+        assert {c[1] for c in cases if c[0] == "python.columnar"} == {"products", "days", "lead_time"}
+        assert [c[1] for c in cases if c[0] == "db"] == ["products"]
+
+    def test_run_cases(self, capsys):
+        results = run_cases(TINY, ["python.columnar"], memory=True)
+        assert len(results) == 5  # 2 products + 2 days + 1 lead_time points
+        assert len({r.case for r in results}) == 3  # The base point is measured once
+        assert all(r.us_per_product_day > 0 and r.peak_mb is not None for r in results)
+        assert "python.columnar[" in capsys.readouterr().out
+
+    def test_compare_flags_regressions(self):
+        baselines = {"a": {"us_per_product_day": 1.0, "peak_mb": 1.0}, "b": {"us_per_product_day": 1.0, "peak_mb": 1.0}}
+        results = [_measurement("a", 1.4), _measurement("b", 2.0), _measurement("new", 9.0)]
+        regressed = compare(results, baselines, tolerance=0.5)
+        assert [r.case for r in regressed] == ["b"]
+        assert results[0].baseline_ratio == 1.4 and results[2].baseline_ratio is None
+
+    def test_compare_flags_memory_growth(self):
+        regressed = compare([_measurement("a", 1.0, peak=3.0)], {"a": {"us_per_product_day": 1.0, "peak_mb": 1.0}})
+        assert len(regressed) == 1
+
+    def test_knees(self):
+        curve = [_measurement("x", us, products=p) for p, us in ((32, 1.0), (1000, 1.2), (10000, 2.0))]
+        assert knees(curve) == {("s", "products"): 10000}
+
+    def test_baselines_roundtrip(self, tmp_path):
+        path = tmp_path / "baselines.json"
+        save_baselines([_measurement("a", 1.5)], path)
+        save_baselines([_measurement("b", 2.5)], path)
+        assert load_baselines(path) == {"a": {"us_per_product_day": 1.5, "peak_mb": 1.0},
+                                        "b": {"us_per_product_day": 2.5, "peak_mb": 1.0}}
+
+    def test_stored_baselines_are_known_cases(self):
+        for case in load_baselines():
+            assert parse_case(case)[0] in SIM_SUITES
@@ -0,0 +1,104 @@
+"""Unit tests for DatabaseManager stock loading (SQLite stands in for the per-row fallback path)."""
+import pytest
+from sqlalchemy import text
+from src.database import DatabaseManager, _csv_chunks, unique_stock_rows
+
+
+def _stock(product_id, day, on_hand):
+    return {"product_id": product_id, "webshop_id": 1380, "on_hand": on_hand, "date": f"2025-01-{day:02d}"}
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'stocks.db'}")
+    with db.engine.connect() as conn:
+        conn.execute(text(
+            "CREATE TABLE stocks (product_id INTEGER, webshop_id INTEGER, on_hand INTEGER, date TEXT, "
+            "deleted_at TEXT, UNIQUE (product_id, date))"
+        ))
+        conn.commit()
+    return db
+
+
+class TestCsvChunks:
+    def test_chunking_and_format(self):
+        rows = [_stock(1, d, d * 10) for d in range(1, 6)]
+        chunks = list(_csv_chunks(rows, 2))
+        assert [n for n, _ in chunks] == [2, 2, 1]
+        first = chunks[0][1].read().splitlines()
+        assert first == ["1,1380,10,2025-01-01", "1,1380,20,2025-01-02"]
+
+
+class RecordingCopyConn:
+    """Stands in for a psycopg2 connection: records statements and the CSV sent to COPY."""
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+        self.connection = self
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+
+    def cursor(self):
+        return self
+
+    def copy_expert(self, sql, buf):
+        self.copied.extend(buf.read().splitlines())
+
+    def close(self):
+        pass
+
+
+class TestUniqueStockRows:
+    def test_last_row_per_day_wins(self):
+        rows = [_stock(1, 1, 5), _stock(1, 2, 6), _stock(1, 1, 7), _stock(2, 1, 8)]
+        assert sorted((r["product_id"], r["date"], r["on_hand"]) for r in unique_stock_rows(rows)) == [
+            (1, "2025-01-01", 7), (1, "2025-01-02", 6), (2, "2025-01-01", 8),
+        ]
+
+    def test_unique_input_is_returned_as_is(self):
+        rows = [_stock(1, d, d) for d in range(1, 4)]
+        assert unique_stock_rows(rows) is rows
+
+    def test_copy_stages_each_key_once(self, sqlite_db):
+        conn = RecordingCopyConn()
+        sqlite_db._copy_stocks(conn, [_stock(1, 1, 5), _stock(1, 1, 7), _stock(1, 2, 1)], chunk_size=1)
+        assert sorted(conn.copied) == ["1,1380,1,2025-01-02", "1,1380,7,2025-01-01"]
+        assert "ON CONFLICT" in conn.statements[-1]
+
+
+class TestBulkLoadStocks:
+    def test_non_postgres_uses_row_fallback(self, sqlite_db):
+        assert not sqlite_db.supports_copy
+        rows = [_stock(1, d, d) for d in range(1, 11)]
+        stats = sqlite_db.bulk_load_stocks(rows, chunk_size=3)
+        assert stats["method"] == "row"
+        assert stats["rows"] == 10
+        assert stats["rows_per_sec"] > 0
+        with sqlite_db.engine.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM stocks")).scalar() == 10
+
+    def test_upsert_overwrites_existing_day(self, sqlite_db):
+        sqlite_db.bulk_load_stocks([_stock(1, 1, 5)])
+        sqlite_db.bulk_load_stocks([_stock(1, 1, 7)])
+        with sqlite_db.engine.connect() as conn:
+            assert conn.execute(text("SELECT on_hand FROM stocks")).scalar() == 7
+
+    def test_empty_input_is_noop(self, sqlite_db):
+        assert sqlite_db.bulk_load_stocks([])["rows"] == 0
+
+
+class TestDateOffset:
+    def test_clear_is_noop_without_offset_table(self, sqlite_db):
+        with sqlite_db.engine.connect() as conn:
+            sqlite_db._clear_date_offset(conn, 1380)
+
+    def test_clear_drops_only_that_shop(self, sqlite_db):
+        with sqlite_db.engine.connect() as conn:
+            conn.execute(text("CREATE TABLE demo_date_offsets (webshop_id INTEGER PRIMARY KEY, anchor_date TEXT, offset_days INTEGER)"))
+            conn.execute(text("INSERT INTO demo_date_offsets VALUES (1380, '2025-01-01', 3), (7, '2025-01-01', 3)"))
+            sqlite_db._clear_date_offset(conn, 1380)
+            conn.commit()
+            shops = conn.execute(text("SELECT webshop_id FROM demo_date_offsets")).scalars().all()
+        assert shops == [7]
@@ -0,0 +1,123 @@
+"""Tests for the Monte Carlo ensemble (src/ensemble.py)."""
+import numpy as np
+import pytest
+
+from src.ensemble import ReplicaBatch, replica_seeds, score_replicas, simulate_replicas
+from src.scenarios import compile_scenario
+from src.simulation import SupplyChainSimulator
+
+PRODUCT = {
+    "id": 5, "sku": "SKU-5", "shop_id": 1380, "supplier_id": 1, "selling_price": 20.0,
+    "purchase_price": 8.0, "current_stock_on_hand": 50, "product_delivery_time": 14,
+}
+
+
+def _batch(sold, missed=None):
+    sold = np.asarray(sold, dtype=np.int64)
+    missed = np.zeros(sold.shape, dtype=bool) if missed is None else np.asarray(missed)
+    return ReplicaBatch(seeds=list(range(sold.shape[0])), on_hand=sold, sold=sold, missed=missed, orders=np.zeros(sold.shape[0]))
+
+
+class TestReplicaSeeds:
+    def test_first_replica_is_run_seed_and_prefix_stable(self):
+        assert replica_seeds(9, 1) == [9]
+        assert replica_seeds(9, 50)[:10] == replica_seeds(9, 10)
+        assert len(set(replica_seeds(9, 50))) == 50
+
+
+class TestSimulateReplicas:
+    @pytest.mark.parametrize("label", ["Stable Fast", "Stockout Prone", "Seasonal Winter", "Multi-Supplier", "New Launch (Success)", "Lumpy"])
+    def test_batch_is_reproducible_and_consistent(self, label):
+        spec = compile_scenario(label)
+        simulator = SupplyChainSimulator(history_days=200, seed=3)
+        seeds = replica_seeds(3, 6)
+        batch = simulate_replicas(simulator, PRODUCT, spec, seeds)
+        again = simulate_replicas(simulator, PRODUCT, spec, seeds)
+        assert batch.on_hand.shape == batch.sold.shape == (6, 200)
+        assert (batch.on_hand == again.on_hand).all()
+        assert (np.bincount(batch.order_replica, minlength=6) == batch.orders).all()
+        # Stock balance per replica: opening stock + launch stock + deliveries received - sales
+        avg_daily = spec.avg_daily(simulator.demand_engine.get_base_demand(PRODUCT["selling_price"]))
+        launch = int(avg_daily * spec.launch_stock_days) if spec.launch_day(200) >= 0 else 0
+        opening = spec.initial_stock(PRODUCT["current_stock_on_hand"]) + launch
+        received = batch.arrivals[:, :200].sum(axis=1)
+        assert (batch.on_hand[:, -1] == opening + received - batch.sold.sum(axis=1)).all()
+
+    def test_one_demand_draw_for_all_replicas(self, monkeypatch):
+        simulator = SupplyChainSimulator(history_days=100, seed=3)
+        calls = []
+        series = simulator.demand_engine.get_demand_series
+        monkeypatch.setattr(simulator.demand_engine, "get_demand_series", lambda *a: calls.append(a[-1].shape) or series(*a))
+        batch = simulate_replicas(simulator, PRODUCT, compile_scenario("Lumpy"), replica_seeds(3, 7))
+        assert calls == [(700,)]
+        assert len({tuple(row) for row in batch.sold}) > 1  # Replicas draw different demand
+
+class TestScoreReplicas:
+    def test_stockout_prone_needs_late_stockout(self):
+        missed = np.zeros((2, 365), dtype=bool)
+        missed[0, 300] = True
+        missed[1, 100] = True
+        scores = score_replicas(_batch(np.ones((2, 365)), missed), compile_scenario("Stockout Prone"))
+        assert scores[0] > 0 > scores[1]
+
+    def test_seasonal_needs_visible_peak(self):
+        flat = np.full(365, 10)
+        peaked = flat.copy()
+        peaked[150:190] = 40
+        scores = score_replicas(_batch([flat, peaked]), compile_scenario("Seasonal Summer"))
+        assert scores[1] > 0 > scores[0]
+
+    def test_trend_direction(self):
+        rising = np.concatenate([np.full(245, 10), np.linspace(10, 30, 120)]).round()
+        up = score_replicas(_batch([rising, rising[::-1]]), compile_scenario("Positive Trend"))
+        down = score_replicas(_batch([rising, rising[::-1]]), compile_scenario("Negative Trend"))
+        assert up[0] > 0 > up[1]
+        assert down[0] < 0
+
+    def test_default_prefers_fewer_lost_sales(self):
+        missed = np.zeros((2, 100), dtype=bool)
+        missed[1, :50] = True
+        scores = score_replicas(_batch(np.ones((2, 100)), missed), compile_scenario("Stable Fast"))
+        assert scores[0] > 0 > scores[1]
+
+
+class TestEnsembleRun:
+    def test_keeps_best_replica_and_is_reproducible(self):
+        spec = compile_scenario("Micro-Seasonality")
+        plain = SupplyChainSimulator(seed=1).simulate_product_columnar(PRODUCT, spec)
+        best = SupplyChainSimulator(seed=1, replicas=30).simulate_product_columnar(PRODUCT, spec)
+        again = SupplyChainSimulator(seed=1, replicas=30, start_date=best.start_date).simulate_product_columnar(PRODUCT, spec)
+        batch = simulate_replicas(SupplyChainSimulator(seed=1), PRODUCT, spec, replica_seeds(1, 30))
+        scores = score_replicas(batch, spec)
+        assert best.replica_score == pytest.approx(scores.max())
+        assert best.replica_score >= scores[0]
+        assert best.metrics["replica_score"] == round(best.replica_score, 4)
+        assert plain.replica_score is None
+        assert (again.sold == best.sold).all()
+
+    def test_winner_rows_come_from_the_batch(self, monkeypatch):
+        import src.simulation as simulation
+
+        spec = compile_scenario("Multi-Supplier")
+        batch = simulate_replicas(SupplyChainSimulator(seed=4), PRODUCT, spec, replica_seeds(4, 8))
+        best = int(np.argmax(score_replicas(batch, spec)))
+        monkeypatch.setattr(simulation.SupplyChainSimulator, "_run", lambda *a, **k: pytest.fail("winner replayed"))
+        result = SupplyChainSimulator(seed=4, replicas=8).simulate_product_columnar(PRODUCT, spec)
+        assert (result.on_hand == batch.on_hand[best]).all()
+        assert (result.sold == batch.sold[best]).all()
+        assert len(result.bo_day) == batch.orders[best]
+        assert result.missed_sales_days == batch.missed[best].sum()
+        assert result.checkpoint.on_hand == batch.on_hand[best, -1]
+        assert sum(q for _, q in result.checkpoint.pending) == batch.arrivals[best, 365:].sum()
+
+    def test_winner_rolls_forward_from_its_own_stream(self):
+        spec = compile_scenario("Multi-Supplier")
+        simulator = SupplyChainSimulator(seed=4, replicas=8)
+        result = simulator.simulate_product_columnar(PRODUCT, spec)
+        ahead = simulator.roll_forward(result.checkpoint, 10)
+        again = simulator.roll_forward(result.checkpoint, 10)
+        assert ahead.on_hand.shape == (10,)
+        assert (ahead.sold == again.sold).all()
+        # Deliveries in transit at the end of the horizon arrive during the roll-forward
+        due = sum(q for day, q in result.checkpoint.pending if day < 375)
+        assert ahead.on_hand[-1] == result.checkpoint.on_hand + due - ahead.sold.sum()
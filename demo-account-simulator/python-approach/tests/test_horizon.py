@@ -0,0 +1,38 @@
+"""Unit tests for the shared simulation calendar."""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.horizon import ISO_DATE_FMT, SQL_TIMESTAMP_FMT, calendar_for
+
+
+class TestSimulationCalendar:
+    def test_strings_match_strftime(self):
+        start = datetime(2024, 2, 27, 15, 30)
+        cal = calendar_for(start, 400)
+        for day in (0, 2, 3, 365, 399):
+            d = start + timedelta(days=day)
+            assert cal.sql_dates[day] == d.strftime("%Y-%m-%d")
+            assert cal.iso_dates[day] == d.strftime(ISO_DATE_FMT)
+            assert cal.sql_timestamps[day] == d.strftime(SQL_TIMESTAMP_FMT)
+            assert (cal.month[day], cal.day_of_month[day]) == (d.month, d.day)
+
+    def test_date_at_beyond_horizon(self):
+        cal = calendar_for(datetime(2025, 1, 30), 4)
+        assert cal.date_at(3) == "2025-02-02"
+        assert cal.date_at(6, ISO_DATE_FMT) == "2025-02-05T12:00:00Z"
+
+    def test_shared_per_run(self):
+        start = datetime(2025, 1, 1)
+        assert calendar_for(start, 30) is calendar_for(start, 30)
+
+    def test_season_masks(self):
+        start = datetime(2025, 1, 1)
+        cal = calendar_for(start, 365)
+        dates = [start + timedelta(days=d) for d in range(365)]
+        summer = [(5, 16) <= (d.month, d.day) <= (7, 15) for d in dates]
+        winter = [(10, 16) <= (d.month, d.day) <= (12, 15) for d in dates]
+        assert cal.season_mask("seasonal_summer").tolist() == summer
+        assert cal.season_mask("seasonal_winter").tolist() == winter
+        assert cal.season_mask("micro_seasonal").tolist() == [d.month in (2, 3, 8, 9) for d in dates]
+        assert not np.any(cal.season_mask("stable"))
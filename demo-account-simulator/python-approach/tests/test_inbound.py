@@ -0,0 +1,39 @@
+"""Unit tests for InboundQueue (pending deliveries heap)."""
+from src.inbound import InboundQueue
+
+
+class TestInboundQueue:
+    def test_in_transit_tracks_push_and_receive(self):
+        q = InboundQueue()
+        q.push(10, 100)
+        q.push(5, 40)
+        assert q.in_transit == 140
+        assert q.receive(4) == 0
+        assert q.receive(5) == 40
+        assert q.in_transit == 100
+        assert len(q) == 1
+
+    def test_receive_collects_everything_due(self):
+        q = InboundQueue()
+        for day, qty in [(3, 1), (1, 2), (2, 4), (9, 8)]:
+            q.push(day, qty)
+        assert q.receive(3) == 7
+        assert q.in_transit == 8
+
+    def test_pop_arrived_orders_by_day_then_placement(self):
+        q = InboundQueue()
+        q.push(7, 10, {"order": "a"})
+        q.push(6, 20, {"order": "b"})
+        q.push(7, 30, {"order": "c"})
+        arrived = q.pop_arrived(7)
+        assert [p["order"] for _, _, p in arrived] == ["b", "a", "c"]
+        assert q.in_transit == 0
+        assert len(q) == 0
+
+    def test_snapshot_lists_pending_in_arrival_order(self):
+        q = InboundQueue()
+        q.push(9, 1, "x")
+        q.push(4, 2)
+        q.push(9, 3)
+        assert q.snapshot() == [(4, 2), (9, 1), (9, 3)]
+        assert q.in_transit == 6
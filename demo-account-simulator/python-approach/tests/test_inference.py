@@ -0,0 +1,85 @@
+"""Unit tests for batch delivery / buy-order inference from stock histories."""
+from datetime import date, timedelta
+
+import numpy as np
+
+from src.inference import StockMatrix, buy_order_rows, infer_deliveries, product_lead_times
+from src.sales_matrix import load_sales_matrix
+
+PRODUCTS = [
+    {"product_id": 2, "product_uuid": "p2", "webshop_uuid": "w", "supplier_id": 9, "supplier_uuid": "s9",
+     "purchase_price": 1.5, "lead_time": 3},
+    {"product_id": 1, "product_uuid": "p1", "webshop_uuid": "w", "supplier_id": 9, "supplier_uuid": "s9",
+     "purchase_price": 2, "lead_time": None},
+    {"product_id": 3, "product_uuid": "p3", "webshop_uuid": "w", "supplier_id": None, "supplier_uuid": None},
+]
+
+
+def _stock(p_id, day, on_hand):
+    return {"product_id": p_id, "stock_date": (date(2025, 1, 1) + timedelta(days=day)).isoformat(), "on_hand": on_hand}
+
+
+def _pairwise(stocks_rows, sales_rows, lead_times):
+    """Reference: the per-product pair walk the Retool blocks used before the batch stage."""
+    sales = {}
+    for r in sales_rows:
+        sales[(r["product_id"], r["sale_date"])] = sales.get((r["product_id"], r["sale_date"]), 0) + r["units_sold"]
+    out = []
+    for p_id in sorted({r["product_id"] for r in stocks_rows}):
+        series = sorted((r["stock_date"], r["on_hand"]) for r in stocks_rows if r["product_id"] == p_id)
+        for (_, prev), (d, curr) in zip(series, series[1:]):
+            qty = curr - prev + sales.get((p_id, d), 0)
+            if qty > 0:
+                placed = date.fromisoformat(d) - timedelta(days=lead_times.get(p_id, 14))
+                out.append((p_id, d, placed.isoformat(), qty))
+    return out
+
+
+class TestInferDeliveries:
+    def test_deliveries_and_placed_dates(self):
+        stocks = [_stock(2, 0, 10), _stock(2, 1, 8), _stock(2, 2, 20), _stock(2, 4, 19),
+                  _stock(1, 1, 5), _stock(1, 2, 5)]
+        sales = [{"product_id": 2, "sale_date": "2025-01-02", "units_sold": 2},
+                 {"product_id": 2, "sale_date": "2025-01-05", "units_sold": 4},
+                 {"product_id": 1, "sale_date": "2025-01-03", "units_sold": 1}]
+        inferred = infer_deliveries(StockMatrix.from_rows(stocks), load_sales_matrix(sales), product_lead_times(PRODUCTS))
+        # Day 1 of product 2 (8 + 2 sold - 10) is not a delivery; day 4 follows the gap after day 2
+        assert list(zip(inferred.product_id.tolist(), inferred.day.tolist(), inferred.qty.tolist())) == [
+            (1, 2, 1), (2, 2, 12), (2, 4, 3),
+        ]
+        assert inferred.placed_day.tolist() == [2 - 14, 2 - 3, 4 - 3]
+
+        buy_orders, item_deliveries = buy_order_rows(inferred, PRODUCTS, 2001)
+        assert {b["webshop_id"] for b in buy_orders} == {2001}
+        assert [(b["product_id"], b["placed"], b["expected_delivery_date"], b["quantity"]) for b in buy_orders] == [
+            (2, "2024-12-31 00:00:02", "2025-01-03 00:00:02", 12),
+            (2, "2025-01-02 00:00:02", "2025-01-05 00:00:02", 3),
+            (1, "2024-12-20 00:00:02", "2025-01-03 00:00:02", 1),
+        ]
+        assert [d["order_index"] for d in item_deliveries] == [0, 1, 2]
+        assert buy_orders[2]["unit_price"] == 2.0
+
+    def test_matches_pairwise_walk(self):
+        rng = np.random.default_rng(0)
+        stocks, sales = [], []
+        for p_id in (1, 2, 3):
+            for day in range(120):
+                if rng.random() < 0.15:  # gaps in the stock history
+                    continue
+                stocks.append(_stock(p_id, day, int(rng.integers(0, 50))))
+                sales.append({"product_id": p_id, "sale_date": stocks[-1]["stock_date"],
+                              "units_sold": int(rng.integers(0, 5))})
+        lead_times = product_lead_times(PRODUCTS)
+        inferred = infer_deliveries(StockMatrix.from_rows(stocks), load_sales_matrix(sales), lead_times)
+        origin = date.fromordinal(inferred.origin)
+        batch = [
+            (p, (origin + timedelta(days=d)).isoformat(), (origin + timedelta(days=pl)).isoformat(), q)
+            for p, d, pl, q in zip(inferred.product_id.tolist(), inferred.day.tolist(),
+                                   inferred.placed_day.tolist(), inferred.qty.tolist())
+        ]
+        assert batch == _pairwise(stocks, sales, lead_times)
+
+    def test_empty(self):
+        inferred = infer_deliveries(StockMatrix.from_rows([]), load_sales_matrix([]), {})
+        assert len(inferred) == 0
+        assert buy_order_rows(inferred, PRODUCTS, 1380) == ([], [])
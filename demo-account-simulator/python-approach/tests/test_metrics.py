@@ -0,0 +1,70 @@
+"""Tests for the in-process metrics registry and its Prometheus text rendering."""
+import json
+import logging
+
+import pytest
+
+from src import metrics
+from src.metrics import Counter, Gauge, Histogram, PhaseTimer
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Metrics created in a test go to a throwaway registry."""
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    return metrics.REGISTRY
+
+
+class TestMetrics:
+    def test_histogram_render(self, registry):
+        h = Histogram("t_seconds", "Test.", ("phase",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            h.observe(value, phase="a")
+        lines = metrics.render().splitlines()
+        assert lines[:2] == ["# HELP t_seconds Test.", "# TYPE t_seconds histogram"]
+        assert 't_seconds_bucket{phase="a",le="0.1"} 1' in lines
+        assert 't_seconds_bucket{phase="a",le="1"} 2' in lines
+        assert 't_seconds_bucket{phase="a",le="+Inf"} 3' in lines
+        assert 't_seconds_sum{phase="a"} 5.55' in lines
+        assert 't_seconds_count{phase="a"} 3' in lines
+        assert h.count(phase="a") == 3
+
+    def test_counter_and_gauge(self, registry):
+        c = Counter("t_rows_total", "Rows.", ("method",))
+        g = Gauge("t_rate", "Rate.")
+        c.inc(3, method="copy")
+        c.inc(2, method="copy")
+        g.set(1.5)
+        text = metrics.render()
+        assert 't_rows_total{method="copy"} 5' in text
+        assert "t_rate 1.5" in text
+
+    def test_labels_are_checked_and_escaped(self, registry):
+        c = Counter("t_total", "Test.", ("route",))
+        with pytest.raises(ValueError):
+            c.inc(other="x")
+        c.inc(route='a"b')
+        assert 't_total{route="a\\"b"} 1' in metrics.render()
+
+    def test_record_load(self):
+        before = metrics.ROWS_WRITTEN.value(method="test")
+        metrics.record_load("test", 100, 0.5)
+        metrics.record_load(None, 100, 0.5)
+        assert metrics.ROWS_WRITTEN.value(method="test") == before + 100
+        assert metrics.ROWS_PER_SECOND.value(method="test") == 200.0
+
+
+class TestPhaseTimer:
+    def test_phases_feed_histogram_and_log(self, caplog):
+        before = metrics.PHASE_SECONDS.count(endpoint="test", phase="work")
+        timer = PhaseTimer("test", request_started=0.0)
+        with timer.phase("work"):
+            pass
+        response = timer.json_response({"items": [1, 2, 3]})
+        with caplog.at_level(logging.INFO, logger="src.metrics"):
+            timer.log(rows=3)
+        assert metrics.PHASE_SECONDS.count(endpoint="test", phase="work") == before + 1
+        line = json.loads(caplog.records[-1].getMessage())
+        assert line["event"] == "test"
+        assert set(line["phases"]) == {"parse", "work", "serialize"}
+        assert line["payload_bytes"] == len(response.body) and line["rows"] == 3
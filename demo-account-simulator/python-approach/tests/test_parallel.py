@@ -0,0 +1,77 @@
+"""Tests for simulate_parallel / simulate_shops (process pool fan-out, ordered merge)."""
+import pytest
+from src.parallel import shutdown_pool, simulate_parallel, simulate_shops
+
+
+def _tasks(n, shop_id=1380):
+    labels = ["Stable Fast", "Obsolete / Dead", "New Launch (Success)", "Container Filler"]
+    return [
+        (
+            {
+                "id": 1000 + i,
+                "sku": f"SKU-{i}",
+                "shop_id": shop_id,
+                "supplier_id": 1,
+                "selling_price": 20.0,
+                "purchase_price": 10.0,
+                "current_stock_on_hand": 50,
+                "product_delivery_time": 14,
+            },
+            labels[i % len(labels)],
+        )
+        for i in range(n)
+    ]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _pool_cleanup():
+    yield
+    shutdown_pool()
+
+
+class TestSimulateParallel:
+    def test_in_process_when_single_worker(self):
+        done = []
+        results = simulate_parallel(_tasks(3), history_days=30, workers=1, on_product_done=done.append)
+        assert [r.product_id for r in results] == [1000, 1001, 1002]
+        assert done == [0, 1, 2]
+
+    def test_pool_preserves_product_order(self):
+        tasks = _tasks(9)
+        done, seen = [], []
+        results = simulate_parallel(
+            tasks, history_days=30, workers=2, chunk_size=2, on_product_done=done.append,
+            on_result=lambda i, r: seen.append((i, r)),
+        )
+        assert [r.product_id for r in results] == [t[0]["id"] for t in tasks]
+        assert [r.scenario for r in results] == [t[1] for t in tasks]
+        assert done == list(range(9))
+        assert [(i, r.product_id) for i, r in seen] == list(enumerate(r.product_id for r in results))
+        # Shared start date: every product's history covers the same days
+        assert len({r.stock_rows()[0]["date"] for r in results}) == 1
+
+    def test_seeded_results_independent_of_workers_and_chunking(self):
+        tasks = _tasks(6)
+        serial = simulate_parallel(tasks, history_days=60, workers=1, seed=11)
+        pooled = simulate_parallel(tasks, history_days=60, workers=2, chunk_size=4, seed=11, start_date=serial[0].start_date)
+        for a, b in zip(serial, pooled):
+            assert (a.on_hand == b.on_hand).all() and (a.sold == b.sold).all()
+            assert (a.bo_delivery_day == b.bo_delivery_day).all()
+
+
+class TestSimulateShops:
+    def test_shops_keep_their_horizon_seed_and_order(self):
+        batches = [(_tasks(5), 30, 1, 1), (_tasks(3, shop_id=2001), 60, 2, 4), ([], 30, 3, 1)]
+        pooled = simulate_shops(batches, workers=2, chunk_size=2)
+        serial = simulate_shops(batches, workers=1)
+        assert [len(r) for r in pooled] == [5, 3, 0]
+        assert [r.history_days for r in pooled[1]] == [60, 60, 60]
+        assert {r.webshop_id for r in pooled[1]} == {2001}
+        for shop_pooled, shop_serial in zip(pooled, serial):
+            assert [r.product_id for r in shop_pooled] == [r.product_id for r in shop_serial]
+            for a, b in zip(shop_pooled, shop_serial):
+                assert (a.on_hand == b.on_hand).all() and (a.sold == b.sold).all()
+
+    def test_same_product_differs_by_shop_seed(self):
+        a, b = simulate_shops([(_tasks(1), 60, 1, 1), (_tasks(1), 60, 2, 1)], workers=1)
+        assert not (a[0].sold == b[0].sold).all()
@@ -0,0 +1,42 @@
+"""Unit tests for PayloadBatcher (NDJSON payload batching)."""
+import asyncio
+import json
+import pytest
+from src.payloads import PayloadBatcher, StreamFeed
+
+
+class TestPayloadBatcher:
+    def test_full_batches_emitted_as_items_arrive(self):
+        b = PayloadBatcher(batch_size=3)
+        assert list(b.add("sales", [{"q": 1}, {"q": 2}])) == []
+        lines = list(b.add("sales", [{"q": 3}, {"q": 4}]))
+        assert len(lines) == 1
+        assert json.loads(lines[0]) == {
+            "type": "sales", "batch": 0, "committed": False, "items": [{"q": 1}, {"q": 2}, {"q": 3}],
+        }
+
+    def test_flush_emits_remainders_per_kind(self):
+        b = PayloadBatcher(batch_size=10)
+        list(b.add("sales", [{"q": 1}]))
+        list(b.add("buy_orders", [{"q": 2}]))
+        kinds = [json.loads(line)["type"] for line in b.flush()]
+        assert kinds == ["sales", "buy_orders"]
+        assert list(b.flush()) == []
+        assert b.item_counts == {"sales": 1, "buy_orders": 1}
+
+    def test_invalid_batch_size(self):
+        with pytest.raises(ValueError):
+            PayloadBatcher(0)
+
+
+class TestStreamFeed:
+    def test_closed_feed_drops_events(self):
+        async def run():
+            feed = StreamFeed()
+            feed.put("result", 1)
+            assert await feed.get() == ("result", 1)
+            feed.put("result", 2)
+            feed.close()
+            feed.put("done", {})
+            return feed.pending
+        assert asyncio.run(run()) == 0
@@ -0,0 +1,94 @@
+"""Request profiler tests (pyinstrument backend)."""
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("pyinstrument")
+
+from src import profiling
+from src.profiling import RequestProfiler, in_breakdown, profiled, requested_mode, sim_workers
+from src.simulation import SupplyChainSimulator
+
+PRODUCT = {
+    "id": 1, "sku": "p", "supplier_id": 1, "shop_id": 1380,
+    "selling_price": 10.0, "purchase_price": 5.0, "current_stock_on_hand": 50, "product_delivery_time": 14,
+}
+
+
+def _simulate():
+    return SupplyChainSimulator(seed=1).simulate_product_columnar(PRODUCT, "Stable Fast")
+
+
+class TestRequestedMode:
+    def test_needs_the_env_switch(self, monkeypatch):
+        monkeypatch.setattr(profiling, "REQUEST_PROFILING", False)
+        assert requested_mode("/simulate", {"X-Profile": "inline"}, {}) is None
+
+    def test_header_query_and_paths(self, monkeypatch):
+        monkeypatch.setattr(profiling, "REQUEST_PROFILING", True)
+        assert requested_mode("/simulate", {"X-Profile": "Inline"}, {}) == "inline"
+        assert requested_mode("/maintain", {}, {"profile": "file"}) == "file"
+        assert requested_mode("/simulate", {}, {"profile": "flamegraph"}) is None
+        assert requested_mode("/simulate/batch", {"X-Profile": "inline"}, {}) is None
+        assert requested_mode("/simulate", {}, {}) is None
+
+
+class TestRequestProfiler:
+    def test_profiles_worker_threads(self):
+        profiler = RequestProfiler("test")
+        assert profiler.start()
+        try:
+            assert sim_workers() == 1
+            thread = threading.Thread(target=profiled(_simulate))
+            thread.start()
+            thread.join()
+        finally:
+            profiler.stop()
+        report = profiler.report()
+        assert report["seconds"] > 0
+        names = {row["function"] for row in report["breakdown"]}
+        assert "simulate_product_columnar" in names
+        assert len(report["top"]) <= profiling.PROFILE_TOP
+
+    def test_inactive_outside_a_request(self):
+        profiler = RequestProfiler("test")
+        assert profiler.start()
+        profiler.stop()
+        assert profiling.active() is None
+        assert sim_workers() == profiling.SIM_WORKERS
+        assert profiled(_simulate) is _simulate
+
+    def test_one_request_at_a_time(self):
+        first, second = RequestProfiler("first"), RequestProfiler("second")
+        assert first.start()
+        try:
+            assert not second.start()
+        finally:
+            first.stop()
+        assert second.start()
+        second.stop()
+
+    def test_missing_pyinstrument_is_an_error(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, "pyinstrument", None)  # Makes the import fail
+        with pytest.raises(profiling.ProfilerUnavailable, match="pyinstrument"):
+            RequestProfiler("test")
+
+    def test_write(self, tmp_path):
+        profiler = RequestProfiler("POST /simulate")
+        profiler.start()
+        _simulate()
+        profiler.stop()
+        path = profiler.write(str(tmp_path))
+        assert path.startswith(str(tmp_path)) and "POST-simulate" in path
+
+
+@pytest.mark.parametrize("function,path,expected", [
+    ("get_daily_demand", "/app/src/simulation.py", True),
+    ("_apply_noise", "/app/src/simulation.py", False),
+    ("wipe_and_insert_stocks", "/app/src/async_database.py", True),
+    ("<module>", "/app/src/database.py", False),
+    ("simulate_product", "/app/src/other.py", False),
+])
+def test_breakdown_selection(function, path, expected):
+    assert in_breakdown(function, path) is expected
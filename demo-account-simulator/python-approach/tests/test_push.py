@@ -0,0 +1,204 @@
+"""Push client tests against a local stand-in for the Optiply Public API (ASGI app on httpx's in-process transport)."""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from src.push import (
+    PublicApiPusher,
+    PushProgress,
+    TokenBucket,
+    body_key,
+    buy_order_body,
+    make_client,
+    payload_requests,
+    sell_order_body,
+)
+
+SALE = {"product_id": 7, "sku_id": "SKU-7", "quantity": 3, "price": 2.5, "date": "2025-01-02", "iso_date": "2025-01-02T00:00:00Z"}
+BUY_ORDER = {"supplier_id": 9, "product_id": 7, "placed": "2025-01-02", "expected_delivery": "2025-01-16",
+             "quantity": 40, "unit_cost": 1.25, "total_value": 50.0}
+
+
+class StandInApi:
+    """Records accepted orders and the peak number of requests in flight; `fail(n, status)` makes each
+    body fail n times with `status` before it is accepted."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.accepted = []
+        self.attempts = {}
+        self.failures = (0, 503, None)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.app = FastAPI()
+        self.app.post("/v1/{resource}")(self.handle)
+
+    def fail(self, times: int, status: int, retry_after: str = None):
+        self.failures = (times, status, retry_after)
+
+    async def handle(self, resource: str, request: Request):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            body = await request.json()
+            key = (resource, str(body))
+            self.attempts[key] = self.attempts.get(key, 0) + 1
+            times, status, retry_after = self.failures
+            if self.attempts[key] <= times:
+                return JSONResponse({}, status_code=status, headers={"Retry-After": retry_after} if retry_after else None)
+            assert request.query_params["accountId"] == "1380"
+            assert request.headers["content-type"] == "application/vnd.api+json"
+            self.accepted.append((resource, body))
+            return JSONResponse({"data": {"id": len(self.accepted)}}, status_code=201)
+        finally:
+            self.in_flight -= 1
+
+
+def _requests(n):
+    return [("sales", sell_order_body(dict(SALE, quantity=i + 1))) for i in range(n)]
+
+
+def _push(api, requests, progress=None, rate=1000.0, burst=1000, concurrency=4, max_retries=3):
+    async def run():
+        async with make_client("http://api.test/v1", "token", concurrency, httpx.ASGITransport(app=api.app)) as client:
+            pusher = PublicApiPusher(client, 1380, TokenBucket(rate, burst), concurrency, max_retries, 0.001, progress)
+            return await pusher.push(requests)
+    return asyncio.run(run())
+
+
+class TestBodies:
+    def test_buy_order_body(self):
+        attributes = buy_order_body(BUY_ORDER)["data"]["attributes"]
+        assert attributes["placed"] == "2025-01-02T00:00:00Z"
+        assert attributes["expectedDeliveryDate"] == "2025-01-16T00:00:00Z"
+        assert attributes["supplierId"] == 9 and attributes["assembly"] is False
+        assert attributes["orderLines"] == [
+            {"quantity": 40, "subtotalValue": 50.0, "productId": 7, "expectedDeliveryDate": "2025-01-16T00:00:00Z"}
+        ]
+
+    def test_sell_order_body(self):
+        body = sell_order_body(SALE)["data"]
+        assert body["type"] == "sellOrders"
+        assert body["attributes"]["orderLines"] == [{"productId": 7, "quantity": 3, "subtotalValue": 7.5}]
+
+    def test_payload_requests_and_keys(self):
+        requests = payload_requests({"sales": [SALE], "buy_orders": [BUY_ORDER]})
+        assert [kind for kind, _ in requests] == ["sales", "buy_orders"]
+        assert body_key(*requests[0]) == body_key("sales", sell_order_body(dict(SALE)))
+        assert body_key(*requests[0]) != body_key(*requests[1])
+
+
+class TestTokenBucket:
+    def test_rate_after_burst(self):
+        async def run():
+            bucket = TokenBucket(rate=100, burst=5)
+            started = time.perf_counter()
+            for _ in range(15):
+                await bucket.acquire()
+            return time.perf_counter() - started
+        assert 0.09 <= asyncio.run(run()) < 0.5  # 5 from the burst, then 10 at 100/s
+
+    def test_pause_holds_callers(self):
+        async def run():
+            bucket = TokenBucket(rate=1000, burst=10)
+            bucket.pause(0.05)
+            started = time.perf_counter()
+            await bucket.acquire()
+            return time.perf_counter() - started
+        assert asyncio.run(run()) >= 0.04
+
+    def test_rejects_zero_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+
+class TestPusher:
+    def test_sends_everything_once(self):
+        api = StandInApi()
+        progress = _push(api, _requests(20) + [("buy_orders", buy_order_body(BUY_ORDER))])
+        assert progress.sent == 21 and not progress.failed
+        assert sorted({resource for resource, _ in api.accepted}) == ["buyOrders", "sellOrders"]
+
+    def test_concurrency_is_bounded(self):
+        api = StandInApi(latency=0.01)
+        _push(api, _requests(24), concurrency=3)
+        assert api.peak_in_flight == 3
+
+    def test_saturates_rate_instead_of_idling(self):
+        # 30 requests at 100/s with 20ms latency: ~0.3s when requests overlap, 0.9s+ if sent one by one
+        api = StandInApi(latency=0.02)
+        progress = _push(api, _requests(30), rate=100, burst=1, concurrency=4)
+        assert progress.sent == 30
+        assert progress.seconds < 0.6
+
+    @pytest.mark.parametrize("status", [429, 503])
+    def test_retries_transient_errors(self, status):
+        api = StandInApi()
+        api.fail(2, status, retry_after="0")
+        progress = _push(api, _requests(5))
+        assert progress.sent == 5 and not progress.failed
+        assert progress.retries == 10
+        assert len(api.accepted) == 5
+
+    def test_gives_up_after_max_retries(self):
+        api = StandInApi()
+        api.fail(10, 502)
+        progress = _push(api, _requests(2), max_retries=2)
+        assert progress.sent == 0 and len(progress.failed) == 2
+        assert set(api.attempts.values()) == {3}
+
+    def test_client_error_is_not_retried(self):
+        api = StandInApi()
+        api.fail(1, 400)
+        progress = _push(api, _requests(3))
+        assert progress.retries == 0
+        assert all(error.startswith("HTTP 400") for error in progress.failed.values())
+
+    def test_transport_errors_are_retried(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise httpx.ConnectError("reset")
+            return httpx.Response(201)
+
+        async def run():
+            async with make_client("http://api.test/v1", "token", transport=httpx.MockTransport(handler)) as client:
+                return await PublicApiPusher(client, 1380, TokenBucket(1000, 10), backoff_seconds=0.001).push(_requests(1))
+        progress = asyncio.run(run())
+        assert progress.sent == 1 and progress.retries == 1
+        assert calls[-1].headers["Authorization"] == "Bearer token"
+
+    def test_read_timeout_is_not_retried(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise httpx.ReadTimeout("no response")  # The API may have created the order
+
+        async def run():
+            async with make_client("http://api.test/v1", "token", transport=httpx.MockTransport(handler)) as client:
+                return await PublicApiPusher(client, 1380, TokenBucket(1000, 10), backoff_seconds=0.001).push(_requests(1))
+        progress = asyncio.run(run())
+        assert len(calls) == 1
+        assert progress.sent == 0 and progress.retries == 0
+        assert all(error.startswith("ReadTimeout") for error in progress.failed.values())
+
+    def test_resume_skips_delivered(self):
+        requests = _requests(6)
+        api = StandInApi()
+        api.fail(1, 503)
+        first = _push(api, requests[:4], max_retries=0)  # Every first attempt fails: nothing delivered
+        assert first.sent == 0 and len(first.failed) == 4
+        first = _push(api, requests[:4], first)
+        assert first.sent == 4 and not first.failed
+
+        resumed = _push(api, requests, PushProgress.load(first.dump()))
+        assert resumed.skipped == 4 and resumed.sent == 2
+        assert len(api.accepted) == 6  # Each order accepted exactly once
@@ -0,0 +1,61 @@
+"""Unit tests for columnar ProductResult and its row materialization."""
+from datetime import datetime
+
+import numpy as np
+
+from src.results import ProductResult
+from src.simulation import SupplyChainSimulator
+
+
+def _result(**overrides):
+    fields = dict(
+        product_id=7,
+        sku="SKU-7",
+        webshop_id=1380,
+        supplier_id=3,
+        selling_price=10.0,
+        purchase_price=4.25,
+        scenario="Stable Fast",
+        start_date=datetime(2025, 1, 30),
+        on_hand=np.array([5, -2, 0, 9]),
+        sold=np.array([3, 0, 2, 0]),
+        bo_day=np.array([1]),
+        bo_delivery_day=np.array([6]),
+        bo_qty=np.array([12]),
+        missed_sales_days=1,
+    )
+    fields.update(overrides)
+    return ProductResult(**fields)
+
+
+class TestProductResult:
+    def test_stock_rows_clip_negative_and_use_sql_dates(self):
+        rows = _result().stock_rows()
+        assert [r["on_hand"] for r in rows] == [5, 0, 0, 9]
+        assert [r["date"] for r in rows] == ["2025-01-30", "2025-01-31", "2025-02-01", "2025-02-02"]
+        assert all(type(r["on_hand"]) is int for r in rows)
+
+    def test_sales_rows_only_days_with_sales(self):
+        rows = _result().sales_rows()
+        assert [(r["quantity"], r["date"]) for r in rows] == [(3, "2025-01-30"), (2, "2025-02-01")]
+        assert rows[1]["iso_date"] == "2025-02-01T12:00:00Z"
+
+    def test_buy_order_delivery_beyond_horizon(self):
+        (row,) = _result().buy_order_rows()
+        assert row["placed"] == "2025-01-31T12:00:00Z"
+        assert row["expected_delivery"] == "2025-02-05T12:00:00Z"
+        assert row["total_value"] == 51.0
+
+    def test_metrics(self):
+        assert _result().metrics == {"missed_sales_days": 1, "total_sales": 5, "scenario": "Stable Fast"}
+
+    def test_simulate_product_matches_columnar(self):
+        product = {
+            "id": 1, "sku": "A", "supplier_id": 2, "shop_id": 1380,
+            "selling_price": 12.0, "purchase_price": 4.0, "current_stock_on_hand": 50,
+        }
+        sim = SupplyChainSimulator(history_days=60, start_date=datetime(2025, 1, 1), seed=0)
+        rows = sim.simulate_product(product, "Stable Fast")
+        columnar = sim.simulate_product_columnar(product, "Stable Fast")
+        assert rows == columnar.to_dict()
+        assert columnar.on_hand.shape == columnar.sold.shape == (60,)
@@ -0,0 +1,49 @@
+"""Unit tests for the dense products × days sales matrix."""
+import csv
+import os
+from datetime import date, datetime
+
+import numpy as np
+
+from src.sales_matrix import load_sales_csv, load_sales_matrix
+
+SALES_CSV = os.path.join(os.path.dirname(__file__), "..", "..", "context-data", "1380-sales.csv")
+
+ROWS = [
+    {"product_id": 2, "sale_date": "2025-01-02", "units_sold": 3},
+    {"product_id": 1, "sale_date": datetime(2025, 1, 1, 9), "units_sold": 4},
+    {"product_id": 2, "sale_date": date(2025, 1, 2), "units_sold": 1},
+    {"product_id": 2, "sale_date": "2025-01-04T00:00:00Z", "units_sold": 5},
+]
+
+
+class TestDailyMatrix:
+    def test_dense_rows_and_reductions(self):
+        m = load_sales_matrix(ROWS)
+        assert m.origin == date(2025, 1, 1).toordinal()
+        assert m.row(1).tolist() == [4, 0, 0, 0]
+        assert m.row(2).tolist() == [0, 4, 0, 5]
+        assert m.totals().tolist() == [4, 9]
+        assert m.active_days().tolist() == [1, 2]
+        assert m.row(99).tolist() == [0, 0, 0, 0]
+
+    def test_window_spans_requested_horizon(self):
+        m = load_sales_matrix(ROWS, start_date=date(2024, 12, 30), days=4)
+        assert m.window(2, date(2024, 12, 30), 4).tolist() == [0, 0, 0, 4]
+        assert m.window(2, date(2025, 1, 3), 5).tolist() == [0, 5, 0, 0, 0]
+
+    def test_matches_nested_dicts_on_context_csv(self):
+        with open(SALES_CSV, newline="") as f:
+            rows = list(csv.DictReader(f))
+        nested = {}
+        for r in rows:
+            p = nested.setdefault(int(r["product_id"]), {})
+            p[r["sale_date"][:10]] = p.get(r["sale_date"][:10], 0) + int(r["units_sold"])
+
+        m = load_sales_csv(SALES_CSV)
+        assert set(m.row_of) == set(nested)
+        for p_id, by_date in nested.items():
+            assert m.total(p_id) == sum(by_date.values())
+            row = m.row(p_id)
+            assert {d: int(row[m.day_index(d)]) for d in by_date} == by_date
+        assert int(np.sum(m.units)) == sum(int(r["units_sold"]) for r in rows)
@@ -0,0 +1,74 @@
+"""Unit tests for the scenario registry (scenario_label, archetype_for, compile_scenario)."""
+import numpy as np
+import pytest
+from src.scenarios import (
+    DEFAULT_SCENARIO,
+    archetype_for,
+    compile_scenario,
+    scenario_for_product,
+    scenario_label,
+)
+
+
+class TestScenarioLabel:
+    def test_nested_parens(self):
+        assert scenario_label("Mascara (Stockout Prone (Demand))") == "Stockout Prone (Demand)"
+
+    def test_simple(self):
+        assert scenario_label("Bronzer 8g (Stable Fast)") == "Stable Fast"
+
+    def test_no_parens_falls_back(self):
+        assert scenario_label("Glow Essentials Set") == DEFAULT_SCENARIO
+        assert scenario_label("") == DEFAULT_SCENARIO
+
+
+class TestArchetypeFor:
+    @pytest.mark.parametrize("label,archetype", [
+        ("Stockout Prone (Supply)", "stockout_prone"),
+        ("Seasonal (Summer)", "seasonal_summer"),
+        ("Seasonal (Holiday)", "seasonal_winter"),
+        ("Negative Trend", "trend_down"),
+        ("Positive Trend", "trend_up"),
+        ("Step Change (Down)", "step_down"),
+        ("Obsolete / Dead", "obsolete"),
+        ("Sporadic (Poisson)", "lumpy"),
+        ("Micro-Seasonality", "micro_seasonal"),
+        ("Stable Slow", "stable"),
+    ])
+    def test_mapping(self, label, archetype):
+        assert archetype_for(label) == archetype
+
+
+class TestCompileScenario:
+    def test_cached_and_immutable(self):
+        spec = compile_scenario("Container Filler")
+        assert compile_scenario("Container Filler") is spec
+        with pytest.raises(Exception):
+            spec.order_floor_qty = 1
+
+    def test_rop_demand_factor(self):
+        assert compile_scenario("Stable Fast").rop_demand_factor == 2.0
+        assert compile_scenario("Seasonal (Summer)").rop_demand_factor == 1.5
+        assert compile_scenario("Stable Slow").rop_demand_factor == 1.0
+
+    def test_stockout_late_phase_cuts_rop(self):
+        spec = compile_scenario("Stockout Prone (Demand)")
+        rop = spec.reorder_points(365, 10, 5.0)
+        assert rop[0] == pytest.approx(10 * 5.0 * 1.5)
+        assert rop[364] == pytest.approx(10 * 5.0 * 0.8)
+
+    def test_obsolete_stops_ordering(self):
+        spec = compile_scenario("Obsolete / Dead")
+        rop = spec.reorder_points(365, 10, 5.0)
+        assert np.isneginf(rop[306:]).all()
+        assert spec.initial_stock(100) == 600
+
+    def test_order_quantity_rules(self):
+        assert compile_scenario("Container Filler").order_quantity(1.0, 14) == 2000
+        assert compile_scenario("Sporadic (Poisson)").order_quantity(50.0, 14) == 20
+        assert compile_scenario("Stable Slow").order_quantity(0.1, 14) == 10
+
+    def test_new_launch(self):
+        spec = scenario_for_product("Dipbrow Pomade (New Launch (Success))")
+        assert spec.initial_stock(500) == 0
+        assert spec.launch_day(365) == 335
@@ -0,0 +1,44 @@
+"""Tests for per-shop simulation config (src/shops.py)."""
+import json
+
+import pytest
+
+from src.shops import DEMO_PRODUCT_WHITELIST, DEMO_SHOP_ID, ShopConfig, load_shop_configs
+
+
+class TestShopConfig:
+    def test_from_dict(self):
+        config = ShopConfig.from_dict({
+            "webshop_id": "2001", "product_whitelist": [3, "4"], "history_days": 730, "seed": 9,
+            "archetype_overrides": {"4": "Lumpy"},
+        })
+        assert config == ShopConfig(2001, frozenset([3, 4]), 730, 9, {4: "Lumpy"})
+
+    def test_scenario_override(self):
+        config = ShopConfig(1, frozenset([1, 2]), archetype_overrides={2: "Seasonal Winter"})
+        assert config.scenario_for(1, "Mascara (Stable Slow)") == "Stable Slow"
+        assert config.scenario_for(2, "Mascara (Stable Slow)") == "Seasonal Winter"
+
+    def test_rejects_empty_whitelist_and_bad_horizon(self):
+        with pytest.raises(ValueError):
+            ShopConfig(1, frozenset())
+        with pytest.raises(ValueError):
+            ShopConfig(1, frozenset([1]), history_days=0)
+
+
+class TestLoadShopConfigs:
+    def test_default_is_demo_shop(self):
+        shops = load_shop_configs(None)
+        assert list(shops) == [DEMO_SHOP_ID]
+        assert shops[DEMO_SHOP_ID].product_whitelist == DEMO_PRODUCT_WHITELIST
+
+    def test_file_adds_and_overrides_shops(self, tmp_path):
+        path = tmp_path / "shops.json"
+        path.write_text(json.dumps({"shops": [
+            {"webshop_id": 2001, "product_whitelist": [1]},
+            {"webshop_id": 1380, "product_whitelist": [28666283], "seed": 1},
+        ]}))
+        shops = load_shop_configs(str(path))
+        assert sorted(shops) == [1380, 2001]
+        assert shops[1380].product_whitelist == frozenset([28666283]) and shops[1380].seed == 1
+        assert shops[2001].history_days == 365
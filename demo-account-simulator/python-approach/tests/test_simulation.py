@@ -1,5 +1,6 @@
 """Unit tests for DemandEngine and SupplyChainSimulator."""
 import random
+from datetime import datetime
 import numpy as np
 import pytest
 from src.simulation import DemandEngine, SupplyChainSimulator
@@ -80,6 +81,39 @@ class TestDemandEngine:
         assert qty >= 0
         assert qty >= base  # At peak, demand is base + (base * factor)
 
+    def test_get_demand_series_shape_and_dtype(self):
+        np.random.seed(42)
+        series = DemandEngine.get_demand_series("Stable Fast", 25, 365)
+        assert series.shape == (365,)
+        assert series.dtype.kind == "i"
+        assert (series >= 0).all()
+        assert 30 <= series.mean() <= 45  # 1.5 * 25 = 37.5 ± noise
+
+    def test_get_demand_series_obsolete_and_new_launch_cutoffs(self):
+        np.random.seed(42)
+        obsolete = DemandEngine.get_demand_series("Obsolete", 25, 365)
+        assert (obsolete[305:] == 0).all()
+        assert (obsolete[:305] > 0).all()
+        launch = DemandEngine.get_demand_series("New Launch Success", 25, 365)
+        assert (launch[:335] == 0).all()
+        assert launch[335:].sum() > 0
+
+    def test_get_demand_series_seasonal_peak(self):
+        np.random.seed(42)
+        series = DemandEngine.get_demand_series("Seasonal Summer", 12, 365)
+        assert series[160:180].mean() > 2 * series[:60].mean()
+
+    def test_get_demand_matrix_rows_follow_scenarios(self):
+        np.random.seed(42)
+        matrix = DemandEngine.get_demand_matrix(["Stable Slow", "Obsolete", "Sporadic"], [25, 25, 25], 365)
+        assert matrix.shape == (3, 365)
+        assert (matrix[1, 305:] == 0).all()
+        assert set(np.unique(matrix[2])) <= {0, 3}  # Sporadic: no additive noise
+
+    def test_get_demand_matrix_length_mismatch(self):
+        with pytest.raises(ValueError):
+            DemandEngine.get_demand_matrix(["Stable Fast"], [25, 12], 365)
+
 
 class TestSupplyChainSimulator:
     """Tests for SupplyChainSimulator.simulate_product."""
@@ -143,3 +177,41 @@ class TestSupplyChainSimulator:
         assert result["metrics"]["scenario"] == "Stable Fast"
         assert "total_sales" in result["metrics"]
         assert "missed_sales_days" in result["metrics"]
+
+    def test_seed_makes_products_independent_of_order(self, product_data):
+        other = dict(product_data, id=28666286, sku="SKU-DEMO-2")
+        start = datetime(2025, 1, 1)
+        sim = SupplyChainSimulator(history_days=60, start_date=start, seed=7)
+        first = sim.simulate_product(product_data, "Multi-Supplier (Lead Time Variance)")
+        sim.simulate_product(other, "Lumpy")
+        again = SupplyChainSimulator(history_days=60, start_date=start, seed=7).simulate_product(
+            product_data, "Multi-Supplier (Lead Time Variance)"
+        )
+        assert first == again
+        reseeded = SupplyChainSimulator(history_days=60, start_date=start, seed=8).simulate_product(
+            product_data, "Multi-Supplier (Lead Time Variance)"
+        )
+        assert reseeded["sales"] != first["sales"]
+
+    def test_roll_forward_continues_from_checkpoint(self, product_data):
+        sim = SupplyChainSimulator(history_days=60, start_date=datetime(2025, 1, 1), seed=3)
+        full = sim.simulate_product_columnar(product_data, "Multi-Supplier (Lead Time Variance)")
+        cp = full.checkpoint
+        assert (cp.next_day, cp.next_date) == (60, datetime(2025, 3, 2))
+        assert cp.on_hand == full.on_hand[-1]
+
+        nxt = sim.roll_forward(cp, 10)
+        assert nxt.start_date == cp.next_date and nxt.history_days == 10
+        assert nxt.stock_rows()[0]["date"] == "2025-03-02"
+        assert nxt.checkpoint.next_day == 70
+        # JSON round trip restores the same state, RNG stream included
+        again = sim.roll_forward(type(cp).from_json(cp.to_json()), 10)
+        assert (again.on_hand == nxt.on_hand).all() and (again.sold == nxt.sold).all()
+
+    def test_roll_forward_receives_orders_in_transit(self, product_data):
+        sim = SupplyChainSimulator(history_days=30, start_date=datetime(2025, 1, 1), seed=1)
+        cp = sim.simulate_product_columnar(product_data, "Stable Fast").checkpoint
+        cp.pending = [(cp.next_day, 10_000)]
+        nxt = sim.roll_forward(cp, 1)
+        assert nxt.on_hand[0] >= 10_000 + cp.on_hand - nxt.sold[0]
+        assert nxt.checkpoint.pending == []
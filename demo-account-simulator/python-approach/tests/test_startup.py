@@ -0,0 +1,52 @@
+"""Cold-start regression checks: import the app in a fresh interpreter, as a Cloud Run instance would."""
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Generous default for shared CI runners; tighten locally with STARTUP_BUDGET_SECONDS.
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "4.0"))
+APP_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import src.main
+print(json.dumps({"seconds": time.perf_counter() - started, "modules": sorted(sys.modules)}))
+"""
+
+
+def _cold_import(env_overrides=None):
+    env = dict(os.environ, **(env_overrides or {}))
+    env.pop("DATABASE_URL", None)
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - started
+    return wall, json.loads(out.stdout.strip().splitlines()[-1])
+
+
+class TestColdStart:
+    def test_import_within_budget(self):
+        # Best of 3 to absorb noisy neighbours; a real regression (e.g. a heavy eager import) shows in all runs.
+        wall = min(_cold_import()[0] for _ in range(3))
+        assert wall < STARTUP_BUDGET_SECONDS, f"cold import took {wall:.2f}s (budget {STARTUP_BUDGET_SECONDS}s)"
+
+    def test_heavy_modules_stay_lazy(self):
+        _, probe = _cold_import()
+        modules = set(probe["modules"])
+        assert "pandas" not in modules
+        assert "sqlalchemy.ext.asyncio" not in modules
+        assert "sqlalchemy.orm" not in modules
+
+    def test_profile_env_does_not_break_import(self):
+        _, probe = _cold_import({"STARTUP_PROFILE": "1"})
+        assert "src.startup" in probe["modules"]
+
+
+def test_warm_up_simulation_runs():
+    from src import main
+
+    main.warm_up_simulation()
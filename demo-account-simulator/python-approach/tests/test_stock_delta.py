@@ -0,0 +1,44 @@
+"""Unit tests for the stock delta diff (src/stock_delta.py)."""
+import datetime
+
+from src.stock_delta import changed_products, date_key, diff_stocks, group_series, series_fingerprint
+
+
+def _rows(product_id, values, webshop_id=1380):
+    return [
+        {"product_id": product_id, "webshop_id": webshop_id, "on_hand": v, "date": f"2025-01-{d + 1:02d}"}
+        for d, v in enumerate(values)
+    ]
+
+
+class TestFingerprint:
+    def test_date_key_normalizes(self):
+        expected = "2025-01-02 00:00:00"
+        assert date_key("2025-01-02") == expected
+        assert date_key(datetime.datetime(2025, 1, 2)) == expected
+        assert date_key(datetime.date(2025, 1, 2)) == expected
+
+    def test_fingerprint_ignores_date_type_and_order(self):
+        rows = _rows(1, [3, 4, 5])
+        as_datetimes = [dict(r, date=datetime.datetime.fromisoformat(r["date"])) for r in reversed(rows)]
+        assert series_fingerprint(group_series(rows)[1]) == series_fingerprint(group_series(as_datetimes)[1])
+
+    def test_fingerprint_sees_values(self):
+        assert series_fingerprint(group_series(_rows(1, [3, 4]))[1]) != series_fingerprint(group_series(_rows(1, [3, 5]))[1])
+
+
+class TestDiff:
+    def test_changed_products(self):
+        new = group_series(_rows(1, [1, 2]) + _rows(2, [1, 2]))
+        live = {1: series_fingerprint(new[1]), 2: "stale", 3: "gone"}
+        assert changed_products(new, live) == [2, 3]
+
+    def test_diff_stocks(self):
+        new = group_series(_rows(1, [1, 2]) + _rows(2, [1, 5, 6]))
+        live = group_series(_rows(1, [1, 2]) + _rows(2, [1, 2]) + _rows(3, [4]))
+        delta = diff_stocks(1380, new, live, [2, 3])
+        assert sorted((r["product_id"], r["date"], r["on_hand"]) for r in delta.upserts) == [
+            (2, "2025-01-02", 5), (2, "2025-01-03", 6)
+        ]
+        assert delta.deletes == [{"product_id": 3, "date": "2025-01-01"}]
+        assert delta.to_dict() == {"inserted": 1, "updated": 1, "deleted": 1, "unchanged_products": 1, "changed_products": 2}
@@ -3,47 +3,119 @@
 # hardcoded assembly product IDs. Output: { assembly_orders, item_deliveries } for build_assembly_order_api_bodies.
 # Inputs: fetch_product_meta.data, fetch_daily_sales.data, fetch_stocks.data
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+DEFAULT_LEAD_TIME = 14
+
+# Shop of the generated rows when fetch_product_meta does not return a webshop_id column (the original demo shop).
+DEFAULT_WEBSHOP_ID = 1380
 
 ASSEMBLY_PRODUCT_IDS = {29177521, 29177522, 29177523}
 
 
-def build_sales_map(daily_sales):
-    """sales_map[product_id][date_str] = units_sold."""
-    sales_map = {}
-    for row in daily_sales:
-        p_id = int(row["product_id"])
-        sale_date = row["sale_date"]
-        date_str = sale_date.strftime("%Y-%m-%d") if hasattr(sale_date, "strftime") else str(sale_date)[:10]
-        units_sold = int(row["units_sold"])
-        if p_id not in sales_map:
-            sales_map[p_id] = {}
-        sales_map[p_id][date_str] = sales_map[p_id].get(date_str, 0) + units_sold
-    return sales_map
-
-
-def build_stock_series(stocks_rows):
-    """Per product: list of (date_str, on_hand) sorted by date."""
-    by_product = {}
-    for row in stocks_rows:
-        p_id = int(row["product_id"])
-        d = row["stock_date"]
-        date_str = d.strftime("%Y-%m-%d") if hasattr(d, "strftime") else str(d)[:10]
-        on_hand = int(row["on_hand"])
-        if p_id not in by_product:
-            by_product[p_id] = []
-        by_product[p_id].append((date_str, on_hand))
-    for p_id in by_product:
-        by_product[p_id].sort(key=lambda x: x[0])
-    return by_product
-
-
-def infer_buy_orders_one_product(product_row, product_sales_map, product_stock_series):
-    """From existing stock series + sales, infer deliveries and buy orders. Returns (buy_orders, item_deliveries)."""
+def webshop_id_of(product_row):
+    return int(product_row.get("webshop_id") or DEFAULT_WEBSHOP_ID)
+
+
+def day_ordinal(value):
+    """Proleptic ordinal of a date, datetime or 'YYYY-MM-DD...' string."""
+    if hasattr(value, "toordinal"):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class DailyMatrix:
+    """Dense products × days unit counts: rows[row_of[product_id]][day - origin].
+    Mirrors python-approach/src/sales_matrix.py (keep in sync)."""
+
+    def __init__(self, entries, start_date=None, days=0):
+        """Sum (product_id, date, qty) entries into a matrix spanning the data and, if given, start_date + days."""
+        parsed = [(int(p), day_ordinal(d), int(q)) for p, d, q in entries]
+        bounds = [min(o for _, o, _ in parsed), max(o for _, o, _ in parsed)] if parsed else []
+        if start_date is not None:
+            bounds += [start_date.toordinal(), start_date.toordinal() + max(days, 1) - 1]
+        self.origin = min(bounds) if bounds else 0
+        self.days = max(bounds) - self.origin + 1 if bounds else 0
+        self.row_of = {p: i for i, p in enumerate(sorted({p for p, _, _ in parsed}))}
+        self.rows = [[0] * self.days for _ in self.row_of]
+        for p, o, q in parsed:
+            self.rows[self.row_of[p]][o - self.origin] += q
+        self._zeros = [0] * self.days
+
+    def day_index(self, value):
+        return day_ordinal(value) - self.origin
+
+    def row(self, product_id):
+        """Units per day for one product (zeros for products without entries)."""
+        i = self.row_of.get(product_id)
+        return self.rows[i] if i is not None else self._zeros
+
+    def window(self, product_id, start_date, days):
+        """Units for days [start_date, start_date + days), zero-padded outside the matrix."""
+        start = self.day_index(start_date)
+        row = self.row(product_id)
+        if 0 <= start and start + days <= self.days:
+            return row[start:start + days]
+        return [row[i] if 0 <= i < self.days else 0 for i in range(start, start + days)]
+
+    def total(self, product_id):
+        return sum(self.row(product_id))
+
+    def active_days(self, product_id):
+        return self.days - self.row(product_id).count(0)
+
+
+def load_sales_matrix(daily_sales, start_date=None, days=0):
+    """fetch_daily_sales rows (product_id, sale_date, units_sold) -> DailyMatrix."""
+    return DailyMatrix(((r["product_id"], r["sale_date"], r["units_sold"]) for r in daily_sales), start_date, days)
+
+
+class StockMatrix:
+    """Dense products × days on-hand from fetch_stocks, plus which days have a stock row.
+    Mirrors python-approach/src/inference.py (keep in sync)."""
+
+    def __init__(self, stocks_rows):
+        parsed = [(int(r["product_id"]), day_ordinal(r["stock_date"]), int(r["on_hand"])) for r in stocks_rows]
+        self.origin = min(o for _, o, _ in parsed) if parsed else 0
+        self.days = max(o for _, o, _ in parsed) - self.origin + 1 if parsed else 0
+        self.row_of = {p: i for i, p in enumerate(sorted({p for p, _, _ in parsed}))}
+        self.on_hand = [[0] * self.days for _ in self.row_of]
+        self.present = [[False] * self.days for _ in self.row_of]
+        for p, o, on_hand in parsed:
+            self.on_hand[self.row_of[p]][o - self.origin] = on_hand
+            self.present[self.row_of[p]][o - self.origin] = True
+
+
+def product_lead_times(products):
+    return {int(p["product_id"]): int(p.get("lead_time") or DEFAULT_LEAD_TIME) for p in products}
+
+
+def infer_deliveries(stocks, sales, lead_times):
+    """All products' deliveries in one pass: {product_id: [(day, placed_day, qty), ...]} where
+    qty = on_hand[day] - on_hand[previous stock day] + sales[day] > 0 and placed_day = day - lead time.
+    Days are offsets from stocks.origin. Mirrors python-approach/src/inference.py (keep in sync)."""
+    start = date.fromordinal(stocks.origin)
+    deliveries = {}
+    for p_id, i in stocks.row_of.items():
+        on_hand = stocks.on_hand[i]
+        sold = sales.window(p_id, start, stocks.days)
+        lead = lead_times.get(p_id, DEFAULT_LEAD_TIME)
+        stock_days = [d for d, ok in enumerate(stocks.present[i]) if ok]
+        deltas = [(d, on_hand[d] - on_hand[prev] + sold[d]) for prev, d in zip(stock_days, stock_days[1:])]
+        deliveries[p_id] = [(d, d - lead, qty) for d, qty in deltas if qty > 0]
+    return deliveries
+
+
+def day_timestamp(origin, day):
+    return date.fromordinal(origin + day).isoformat() + " 00:00:02"
+
+
+def buy_orders_for_product(product_row, product_deliveries, origin):
+    """Buy orders + item_deliveries for one product's inferred deliveries. Returns (buy_orders, item_deliveries)."""
     p_id = int(product_row["product_id"])
     product_uuid = str(product_row["product_uuid"])
     webshop_uuid = str(product_row["webshop_uuid"])
-    lead_time = int(product_row.get("lead_time") or 14)
+    webshop_id = webshop_id_of(product_row)
     unit_price = round(float(product_row.get("purchase_price") or 0), 2)
     supplier_id = product_row.get("supplier_id")
     supplier_uuid = product_row.get("supplier_uuid")
@@ -52,47 +124,26 @@ def infer_buy_orders_one_product(product_row, product_sales_map, product_stock_s
 
     buy_orders = []
     item_deliveries = []
-    series = product_stock_series or []
-    if len(series) < 2:
-        return [], []
-
-    for i in range(1, len(series)):
-        prev_date_str, prev_on_hand = series[i - 1]
-        curr_date_str, curr_on_hand = series[i]
-        sales_today = product_sales_map.get(curr_date_str, 0)
-        # delivery = curr_on_hand - (prev_on_hand - sales_today) = curr_on_hand - prev_on_hand + sales_today
-        delivery_qty = curr_on_hand - prev_on_hand + sales_today
-        if delivery_qty <= 0:
-            continue
-
-        delivered_at = curr_date_str + " 00:00:02"
-        try:
-            curr_dt = datetime.strptime(curr_date_str, "%Y-%m-%d")
-            placed_dt = curr_dt - timedelta(days=lead_time)
-            placed_ts = placed_dt.strftime("%Y-%m-%d") + " 00:00:02"
-            expected_date = curr_date_str + " 00:00:02"
-        except Exception:
-            placed_ts = curr_date_str + " 00:00:02"
-            expected_date = curr_date_str + " 00:00:02"
-
+    for day, placed_day, qty in product_deliveries:
+        delivered_at = day_timestamp(origin, day)
         order_index = len(buy_orders)
         buy_orders.append({
-            "webshop_id": 1380,
+            "webshop_id": webshop_id,
             "webshop_uuid": webshop_uuid,
             "supplier_id": int(supplier_id),
             "supplier_uuid": str(supplier_uuid),
-            "placed": placed_ts,
-            "expected_delivery_date": expected_date,
+            "placed": day_timestamp(origin, placed_day),
+            "expected_delivery_date": delivered_at,
             "product_id": p_id,
             "product_uuid": product_uuid,
-            "quantity": int(delivery_qty),
+            "quantity": int(qty),
             "unit_price": unit_price,
         })
         item_deliveries.append({
             "order_index": order_index,
             "product_id": p_id,
             "product_uuid": product_uuid,
-            "quantity": int(delivery_qty),
+            "quantity": int(qty),
             "delivered_at": delivered_at,
         })
 
@@ -121,7 +172,7 @@ def build_active_assembly_orders(assembly_product_rows, placed_start, placed_end
         if supplier_id is None or not supplier_uuid:
             continue
         orders.append({
-            "webshop_id": 1380,
+            "webshop_id": webshop_id_of(product_row),
             "webshop_uuid": str(product_row["webshop_uuid"]),
             "supplier_id": int(supplier_id),
             "supplier_uuid": str(supplier_uuid),
@@ -147,19 +198,19 @@ if not isinstance(daily_sales, list):
 if not isinstance(stocks_rows, list):
     stocks_rows = []
 
-sales_map = build_sales_map(daily_sales)
-stock_series = build_stock_series(stocks_rows)
+sales = load_sales_matrix(daily_sales)
+stocks = StockMatrix(r for r in stocks_rows if int(r["product_id"]) in ASSEMBLY_PRODUCT_IDS)
 
 all_buy_orders = []
 all_item_deliveries = []
 
 assembly_product_rows = [p for p in products if int(p["product_id"]) in ASSEMBLY_PRODUCT_IDS]
 
+# One batch pass over every product's stock + sales series, then rows per product in input order
+inferred = infer_deliveries(stocks, sales, product_lead_times(assembly_product_rows))
 for product_row in assembly_product_rows:
     p_id = int(product_row["product_id"])
-    product_sales_map = sales_map.get(p_id, {})
-    product_stock_series = stock_series.get(p_id, [])
-    bos, deliveries = infer_buy_orders_one_product(product_row, product_sales_map, product_stock_series)
+    bos, deliveries = buy_orders_for_product(product_row, inferred.get(p_id, []), stocks.origin)
     base_index = len(all_buy_orders)
     all_buy_orders.extend(bos)
     for d in deliveries:
@@ -3,32 +3,96 @@
 # All products from fetch_product_meta are simulated (including composed products / kits).
 # Stock is driven by real sales so the stock graph matches the sales graph; Stockout Prone gets one forced stockout in the last 3 months.
 
+import heapq
 import math
 import random
 from datetime import datetime, timedelta, date
 
+# Base seed for the per-product random streams: same seed -> same stocks / buy orders, whatever the product order.
+SIMULATION_SEED = 42
 
-def build_sales_map(daily_sales):
-    """Build nested dict sales_map[product_id][date_str] = units_sold.
-    date_str format YYYY-MM-DD to match (today - 365 + day).strftime("%Y-%m-%d").
-    """
-    sales_map = {}
-    for row in daily_sales:
-        p_id = int(row["product_id"])
-        sale_date = row["sale_date"]
-        if hasattr(sale_date, "strftime"):
-            date_str = sale_date.strftime("%Y-%m-%d")
-        else:
-            date_str = str(sale_date)[:10]
-        units_sold = int(row["units_sold"])
-        if p_id not in sales_map:
-            sales_map[p_id] = {}
-        sales_map[p_id][date_str] = sales_map[p_id].get(date_str, 0) + units_sold
-    return sales_map
+# Shop of the generated rows when fetch_product_meta does not return a webshop_id column (the original demo shop).
+DEFAULT_WEBSHOP_ID = 1380
+
+
+def webshop_id_of(product_row):
+    return int(product_row.get("webshop_id") or DEFAULT_WEBSHOP_ID)
+
+
+def day_ordinal(value):
+    """Proleptic ordinal of a date, datetime or 'YYYY-MM-DD...' string."""
+    if hasattr(value, "toordinal"):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class DailyMatrix:
+    """Dense products × days unit counts: rows[row_of[product_id]][day - origin].
+    Mirrors python-approach/src/sales_matrix.py (keep in sync)."""
+
+    def __init__(self, entries, start_date=None, days=0):
+        """Sum (product_id, date, qty) entries into a matrix spanning the data and, if given, start_date + days."""
+        parsed = [(int(p), day_ordinal(d), int(q)) for p, d, q in entries]
+        bounds = [min(o for _, o, _ in parsed), max(o for _, o, _ in parsed)] if parsed else []
+        if start_date is not None:
+            bounds += [start_date.toordinal(), start_date.toordinal() + max(days, 1) - 1]
+        self.origin = min(bounds) if bounds else 0
+        self.days = max(bounds) - self.origin + 1 if bounds else 0
+        self.row_of = {p: i for i, p in enumerate(sorted({p for p, _, _ in parsed}))}
+        self.rows = [[0] * self.days for _ in self.row_of]
+        for p, o, q in parsed:
+            self.rows[self.row_of[p]][o - self.origin] += q
+        self._zeros = [0] * self.days
+
+    def day_index(self, value):
+        return day_ordinal(value) - self.origin
+
+    def row(self, product_id):
+        """Units per day for one product (zeros for products without entries)."""
+        i = self.row_of.get(product_id)
+        return self.rows[i] if i is not None else self._zeros
+
+    def window(self, product_id, start_date, days):
+        """Units for days [start_date, start_date + days), zero-padded outside the matrix."""
+        start = self.day_index(start_date)
+        row = self.row(product_id)
+        if 0 <= start and start + days <= self.days:
+            return row[start:start + days]
+        return [row[i] if 0 <= i < self.days else 0 for i in range(start, start + days)]
+
+    def total(self, product_id):
+        return sum(self.row(product_id))
+
+    def active_days(self, product_id):
+        return self.days - self.row(product_id).count(0)
+
+
+def load_sales_matrix(daily_sales, start_date=None, days=0):
+    """fetch_daily_sales rows (product_id, sale_date, units_sold) -> DailyMatrix."""
+    return DailyMatrix(((r["product_id"], r["sale_date"], r["units_sold"]) for r in daily_sales), start_date, days)
+
+
+# Canonical archetype rules — mirrors ARCHETYPE_RULES in python-approach/src/scenarios.py (keep in sync).
+# (archetype, keywords that must all appear, keywords of which at least one must appear); first match wins.
+ARCHETYPE_RULES = (
+    ("stockout_prone", ("Stockout Prone",), ()),
+    ("seasonal_summer", ("Seasonal", "Summer"), ()),
+    ("seasonal_winter", ("Seasonal",), ("Winter", "Holiday")),
+    ("trend_down", ("Negative Trend",), ()),
+    ("trend_up", ("Trend",), ()),
+    ("step_up", ("Step Change", "Up"), ()),
+    ("step_down", ("Step Change", "Down"), ()),
+    ("new_launch", ("New Launch",), ()),
+    ("obsolete", (), ("Obsolete", "Dead")),
+    ("lumpy", (), ("Lumpy", "Sporadic")),
+    ("outlier", (), ("Outlier", "Influencer")),
+    ("container_filler", ("Container Filler",), ()),
+    ("micro_seasonal", ("Micro-Seasonality",), ()),
+)
 
 
 def parse_archetype(name):
-    """Extract text inside (...) and map to canonical archetype string.
+    """Extract text inside (...) and map to canonical archetype string via ARCHETYPE_RULES.
     Handles nested parens e.g. 'Product (Stockout Prone (Demand))' -> 'Stockout Prone (Demand)'.
     """
     if not name or "(" not in name or ")" not in name:
@@ -38,32 +102,9 @@ def parse_archetype(name):
     if start >= end:
         return "stable"
     extracted = name[start:end].strip()
-    if "Stockout Prone" in extracted:
-        return "stockout_prone"
-    if "Seasonal" in extracted and "Summer" in extracted:
-        return "seasonal_summer"
-    if "Seasonal" in extracted and ("Winter" in extracted or "Holiday" in extracted):
-        return "seasonal_winter"
-    if "Negative Trend" in extracted:
-        return "trend_down"
-    if "Positive Trend" in extracted or ("Trend" in extracted and "Negative" not in extracted):
-        return "trend"
-    if "Step Change" in extracted and "Up" in extracted:
-        return "step_up"
-    if "Step Change" in extracted and "Down" in extracted:
-        return "step_down"
-    if "New Launch" in extracted:
-        return "new_launch"
-    if "Obsolete" in extracted or "Dead" in extracted:
-        return "obsolete"
-    if "Lumpy" in extracted or "Sporadic" in extracted:
-        return "lumpy"
-    if "Outlier" in extracted or "Influencer" in extracted:
-        return "outlier"
-    if "Container Filler" in extracted:
-        return "container_filler"
-    if "Micro-Seasonality" in extracted:
-        return "micro_seasonal"
+    for archetype, all_of, any_of in ARCHETYPE_RULES:
+        if all(k in extracted for k in all_of) and (not any_of or any(k in extracted for k in any_of)):
+            return archetype
     return "stable"
 
 
@@ -72,41 +113,119 @@ def is_good_product(archetype):
     return archetype not in ("stockout_prone", "obsolete", "lumpy")
 
 
-def seasonal_rop_active(curr_date, archetype):
-    """Returns True if curr_date falls within 60 days before the archetype's peak.
-    seasonal_summer: peak July 15, window May 16 – July 15.
-    seasonal_winter: peak December 15, window October 16 – December 15.
-    """
-    if archetype == "seasonal_summer":
-        # May 16 – July 15
-        if curr_date.month < 5:
-            return False
-        if curr_date.month > 7:
-            return False
-        if curr_date.month == 5 and curr_date.day < 16:
-            return False
-        if curr_date.month == 7 and curr_date.day > 15:
-            return False
-        return True
-    if archetype == "seasonal_winter":
-        # October 16 – December 15
-        if curr_date.month < 10:
-            return False
-        if curr_date.month > 12:
-            return False
-        if curr_date.month == 10 and curr_date.day < 16:
-            return False
-        if curr_date.month == 12 and curr_date.day > 15:
-            return False
-        return True
-    return False
-
-
-def simulate_one_product(product_row, product_sales_map, today):
-    """Simulate 366 days of stock for one product. Returns (stock_rows, buy_orders, item_deliveries)."""
+SEASONAL_ROP_WINDOWS = {
+    "seasonal_summer": ((5, 16), (7, 15)),
+    "seasonal_winter": ((10, 16), (12, 15)),
+}
+MICRO_SEASONAL_MONTHS = (2, 3, 8, 9)
+
+
+class SimulationCalendar:
+    """Dates of the simulation horizon, built once per run and indexed by day by every product.
+    Mirrors python-approach/src/horizon.py (keep in sync)."""
+
+    def __init__(self, start_date, days):
+        self.start_date = start_date
+        self.days = days
+        dates = [start_date + timedelta(days=d) for d in range(days)]
+        self.sql_dates = [d.strftime("%Y-%m-%d") for d in dates]
+        self.sql_timestamps = [s + " 00:00:02" for s in self.sql_dates]
+        self.month = [d.month for d in dates]
+        self.day_of_month = [d.day for d in dates]
+
+    def timestamp_at(self, day):
+        """SQL timestamp for any day index; days past the horizon (deliveries) are computed."""
+        if 0 <= day < self.days:
+            return self.sql_timestamps[day]
+        return (self.start_date + timedelta(days=day)).strftime("%Y-%m-%d") + " 00:00:02"
+
+    def month_mask(self, months):
+        return [m in months for m in self.month]
+
+    def season_mask(self, archetype):
+        """True on the days inside the archetype's seasonal ROP window (all False for other archetypes)."""
+        if archetype == "micro_seasonal":
+            return self.month_mask(MICRO_SEASONAL_MONTHS)
+        window = SEASONAL_ROP_WINDOWS.get(archetype)
+        if window is None:
+            return [False] * self.days
+        (start_m, start_d), (end_m, end_d) = window
+        lo, hi = start_m * 100 + start_d, end_m * 100 + end_d
+        return [lo <= m * 100 + d <= hi for m, d in zip(self.month, self.day_of_month)]
+
+
+class InboundQueue:
+    """Pending deliveries: min-heap keyed by arrival day + running in-transit total.
+    Mirrors python-approach/src/inbound.py (keep in sync)."""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = 0  # tie-breaker: same-day arrivals come out in order placed
+        self.in_transit = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, arrival_day, qty, payload=None):
+        heapq.heappush(self._heap, (arrival_day, self._seq, qty, payload))
+        self._seq += 1
+        self.in_transit += qty
+
+    def pop_arrived(self, day):
+        """Remove and return (arrival_day, qty, payload) for every delivery with arrival_day <= day."""
+        arrived = []
+        heap = self._heap
+        while heap and heap[0][0] <= day:
+            arrival_day, _, qty, payload = heapq.heappop(heap)
+            self.in_transit -= qty
+            arrived.append((arrival_day, qty, payload))
+        return arrived
+
+    def receive(self, day):
+        """Remove every delivery due by `day` and return the total quantity received."""
+        heap = self._heap
+        received = 0
+        while heap and heap[0][0] <= day:
+            received += heapq.heappop(heap)[2]
+        self.in_transit -= received
+        return received
+
+
+def build_rop_schedule(archetype, lead_time, avg_daily, reorder_point, calendar):
+    """Active ROP for each day index, compiled once per product so the day loop only indexes a list."""
+    ltd = lead_time * avg_daily
+    in_season = calendar.season_mask(archetype)
+    schedule = []
+    for day in range(calendar.days):
+        active_rop = reorder_point
+        if in_season[day]:
+            active_rop = int(ltd * (2.0 if archetype == "micro_seasonal" else 2.5))
+        if archetype == "stockout_prone":
+            active_rop = int(ltd * 0.6)
+        if archetype == "container_filler":
+            active_rop = int(ltd * 3.0)
+        if archetype in ("step_up", "trend_up") and day >= 180:
+            active_rop = int(ltd * 2.5)
+        if archetype in ("step_down", "trend_down") and day >= 180:
+            active_rop = int(ltd * 0.8)
+        if archetype == "obsolete" and day > 305:
+            active_rop = -9999
+        schedule.append(active_rop)
+    return schedule
+
+
+def product_rng(seed, webshop_uuid, product_id):
+    """Independent random stream per (seed, shop, product); stdlib counterpart of python-approach/src/rng.py."""
+    return random.Random(f"{seed}:{webshop_uuid}:{product_id}")
+
+
+def simulate_one_product(product_row, sales, calendar, seed=SIMULATION_SEED):
+    """Simulate the calendar's days (366) of stock for one product. Returns (stock_rows, buy_orders, item_deliveries)."""
     p_id = int(product_row["product_id"])
     product_uuid = str(product_row["product_uuid"])
     webshop_uuid = str(product_row["webshop_uuid"])
+    webshop_id = webshop_id_of(product_row)
+    rng = product_rng(seed, webshop_uuid, p_id)
     lead_time = int(product_row["lead_time"] or 14)
     reorder_period = int(product_row["reorder_period"] or 30)
     starting_stock = int(product_row["starting_stock"] or 0)
@@ -115,7 +234,8 @@ def simulate_one_product(product_row, product_sales_map, today):
     supplier_uuid = str(product_row["supplier_uuid"]) if product_row.get("supplier_uuid") else None
     archetype = parse_archetype(product_row.get("product_name") or product_row.get("name") or "")
 
-    total_sold = sum(product_sales_map.values())
+    daily_units = sales.window(p_id, calendar.start_date, calendar.days)
+    total_sold = sales.total(p_id)
     avg_daily = max(1, total_sold // 366)
 
     if archetype == "stockout_prone":
@@ -138,7 +258,7 @@ def simulate_one_product(product_row, product_sales_map, today):
         sim_stock = starting_stock + int(avg_daily * lead_time * 2)
 
     # (delivery_day_index, qty, order_index) so we can emit item_deliveries when received
-    pending_deliveries = []
+    pending_deliveries = InboundQueue()
     stock_rows = []
     buy_orders = []
     item_deliveries = []
@@ -149,51 +269,32 @@ def simulate_one_product(product_row, product_sales_map, today):
     LAST_3M_START = 276
     force_stockout_day = 300 if archetype == "stockout_prone" else -1
 
-    start_date = today - timedelta(days=365)
-    for day in range(366):
-        curr_date = start_date + timedelta(days=day)
-        date_str = curr_date.strftime("%Y-%m-%d")
-        placed_ts = date_str + " 00:00:02"
+    # Compiled once per product: the day loop below only reads numbers / booleans
+    rop_schedule = build_rop_schedule(archetype, lead_time, avg_daily, reorder_point, calendar)
+    rop_boost_qty = int(7 * avg_daily)
+    boost_eligible = is_good_product(archetype)
+    sql_timestamps = calendar.sql_timestamps
+    for day in range(calendar.days):
+        placed_ts = sql_timestamps[day]
 
         # (a) Active ROP
-        active_rop = reorder_point
-        if seasonal_rop_active(curr_date, archetype):
-            active_rop = int(lead_time * avg_daily * 2.5)
-        if archetype == "stockout_prone":
-            active_rop = int(lead_time * avg_daily * 0.6)
-        if archetype == "container_filler":
-            active_rop = int(lead_time * avg_daily * 3.0)
-        if archetype == "micro_seasonal" and curr_date.month in (2, 3, 8, 9):
-            active_rop = int(lead_time * avg_daily * 2.0)
-        if archetype in ("step_up", "trend") and day >= 180:
-            active_rop = int(lead_time * avg_daily * 2.5)
-        if archetype in ("step_down", "trend_down") and day >= 180:
-            active_rop = int(lead_time * avg_daily * 0.8)
-        if archetype == "obsolete" and day > 305:
-            active_rop = -9999
+        active_rop = rop_schedule[day]
         if rop_boost_applied:
-            active_rop = active_rop + int(7 * avg_daily)
+            active_rop = active_rop + rop_boost_qty
 
         # (b) Process inbound deliveries and emit item_deliveries
-        still_pending = []
-        for entry in pending_deliveries:
-            delivery_day_index, qty, order_index = entry
-            if delivery_day_index <= day:
-                sim_stock += qty
-                delivery_date = start_date + timedelta(days=delivery_day_index)
-                item_deliveries.append({
-                    "order_index": order_index,
-                    "product_id": p_id,
-                    "product_uuid": product_uuid,
-                    "quantity": qty,
-                    "delivered_at": delivery_date.strftime("%Y-%m-%d") + " 00:00:02",
-                })
-            else:
-                still_pending.append(entry)
-        pending_deliveries = still_pending
+        for delivery_day_index, qty, order_index in pending_deliveries.pop_arrived(day):
+            sim_stock += qty
+            item_deliveries.append({
+                "order_index": order_index,
+                "product_id": p_id,
+                "product_uuid": product_uuid,
+                "quantity": qty,
+                "delivered_at": calendar.timestamp_at(delivery_day_index),
+            })
 
         # (c) Subtract sales
-        units_sold = product_sales_map.get(date_str, 0)
+        units_sold = daily_units[day]
         sold = min(units_sold, sim_stock)
         sim_stock = max(0, sim_stock - sold)
 
@@ -202,21 +303,20 @@ def simulate_one_product(product_row, product_sales_map, today):
             if not in_stockout:
                 stockout_count += 1
                 in_stockout = True
-            if is_good_product(archetype) and stockout_count >= 2 and not rop_boost_applied:
+            if boost_eligible and stockout_count >= 2 and not rop_boost_applied:
                 rop_boost_applied = True
         else:
             in_stockout = False
 
         # (e) ROP check and reorder — emit buy_order and track for delivery (include composed products if they have supplier)
-        incoming = sum(qty for (_, qty, _) in pending_deliveries)
-        if (sim_stock + incoming) < active_rop and supplier_id is not None and supplier_uuid:
-            variance = random.randint(-2, 3)
+        if (sim_stock + pending_deliveries.in_transit) < active_rop and supplier_id is not None and supplier_uuid:
+            variance = rng.randint(-2, 3)
             actual_lead = max(1, lead_time + variance)
             delivery_day = day + actual_lead
-            expected_date = (start_date + timedelta(days=delivery_day)).strftime("%Y-%m-%d") + " 00:00:02"
+            expected_date = calendar.timestamp_at(delivery_day)
             order_index = len(buy_orders)
             buy_orders.append({
-                "webshop_id": 1380,
+                "webshop_id": webshop_id,
                 "webshop_uuid": webshop_uuid,
                 "supplier_id": supplier_id,
                 "supplier_uuid": supplier_uuid,
@@ -227,7 +327,7 @@ def simulate_one_product(product_row, product_sales_map, today):
                 "quantity": reorder_qty,
                 "unit_price": round(unit_price, 2),
             })
-            pending_deliveries.append((delivery_day, reorder_qty, order_index))
+            pending_deliveries.push(delivery_day, reorder_qty, order_index)
 
         # Stockout Prone: force one day in the last 3 months to 0 so the stock graph clearly shows a stockout
         if force_stockout_day >= 0 and day == force_stockout_day:
@@ -237,10 +337,10 @@ def simulate_one_product(product_row, product_sales_map, today):
         stock_rows.append({
             "product_id": p_id,
             "product_uuid": product_uuid,
-            "webshop_id": 1380,
+            "webshop_id": webshop_id,
             "webshop_uuid": webshop_uuid,
             "on_hand": int(sim_stock),
-            "date": curr_date.strftime("%Y-%m-%d") + " 00:00:02",
+            "date": placed_ts,
         })
 
     return (stock_rows, buy_orders, item_deliveries)
@@ -255,16 +355,15 @@ if not isinstance(products, list):
 if not isinstance(daily_sales, list):
     daily_sales = []
 
-sales_map = build_sales_map(daily_sales)
 today = datetime.utcnow().date()
+calendar = SimulationCalendar(today - timedelta(days=365), 366)
+sales = load_sales_matrix(daily_sales, calendar.start_date, calendar.days)
 all_stocks = []
 all_buy_orders = []
 all_item_deliveries = []
 
 for product_row in products:
-    p_id = int(product_row["product_id"])
-    product_sales_map = sales_map.get(p_id, {})
-    stock_rows, buy_orders, item_deliveries = simulate_one_product(product_row, product_sales_map, today)
+    stock_rows, buy_orders, item_deliveries = simulate_one_product(product_row, sales, calendar)
     all_stocks.extend(stock_rows)
     base_index = len(all_buy_orders)
     all_buy_orders.extend(buy_orders)
@@ -2,40 +2,89 @@
 # Uses fetch_product_meta, fetch_daily_sales, fetch_bo_data, fetch_deliveries.
 # Returns { stocks, product_count, stock_rows }.
 
+import heapq
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-random.seed(42)
+# Base seed for the per-product random streams: same seed -> same stocks, whatever the product order.
+SIMULATION_SEED = 42
 
 ASSEMBLED_SUPPLIER_ID = 785255
 
+# Shop of the generated rows when fetch_product_meta does not return a webshop_id column (the original demo shop).
+DEFAULT_WEBSHOP_ID = 1380
 
-def build_sales_map(daily_sales):
-    sales_map = {}
-    for row in daily_sales:
-        p_id = int(row["product_id"])
-        d = row["sale_date"]
-        date_str = d.strftime("%Y-%m-%d") if hasattr(d, "strftime") else str(d)[:10]
-        p_sales = sales_map.setdefault(p_id, {})
-        p_sales[date_str] = p_sales.get(date_str, 0) + int(row["units_sold"])
-    return sales_map
 
+def webshop_id_of(product_row):
+    return int(product_row.get("webshop_id") or DEFAULT_WEBSHOP_ID)
+
+
+def day_ordinal(value):
+    """Proleptic ordinal of a date, datetime or 'YYYY-MM-DD...' string."""
+    if hasattr(value, "toordinal"):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class DailyMatrix:
+    """Dense products × days unit counts: rows[row_of[product_id]][day - origin].
+    Mirrors python-approach/src/sales_matrix.py (keep in sync)."""
+
+    def __init__(self, entries, start_date=None, days=0):
+        """Sum (product_id, date, qty) entries into a matrix spanning the data and, if given, start_date + days."""
+        parsed = [(int(p), day_ordinal(d), int(q)) for p, d, q in entries]
+        bounds = [min(o for _, o, _ in parsed), max(o for _, o, _ in parsed)] if parsed else []
+        if start_date is not None:
+            bounds += [start_date.toordinal(), start_date.toordinal() + max(days, 1) - 1]
+        self.origin = min(bounds) if bounds else 0
+        self.days = max(bounds) - self.origin + 1 if bounds else 0
+        self.row_of = {p: i for i, p in enumerate(sorted({p for p, _, _ in parsed}))}
+        self.rows = [[0] * self.days for _ in self.row_of]
+        for p, o, q in parsed:
+            self.rows[self.row_of[p]][o - self.origin] += q
+        self._zeros = [0] * self.days
+
+    def day_index(self, value):
+        return day_ordinal(value) - self.origin
+
+    def row(self, product_id):
+        """Units per day for one product (zeros for products without entries)."""
+        i = self.row_of.get(product_id)
+        return self.rows[i] if i is not None else self._zeros
+
+    def window(self, product_id, start_date, days):
+        """Units for days [start_date, start_date + days), zero-padded outside the matrix."""
+        start = self.day_index(start_date)
+        row = self.row(product_id)
+        if 0 <= start and start + days <= self.days:
+            return row[start:start + days]
+        return [row[i] if 0 <= i < self.days else 0 for i in range(start, start + days)]
+
+    def total(self, product_id):
+        return sum(self.row(product_id))
+
+    def active_days(self, product_id):
+        return self.days - self.row(product_id).count(0)
 
-def build_delivery_map(bo_data, delivery_data):
+
+def load_sales_matrix(daily_sales, start_date=None, days=0):
+    """fetch_daily_sales rows (product_id, sale_date, units_sold) -> DailyMatrix."""
+    return DailyMatrix(((r["product_id"], r["sale_date"], r["units_sold"]) for r in daily_sales), start_date, days)
+
+
+def build_delivery_matrix(bo_data, delivery_data, start_date, days):
+    """Delivered units per product per day; deliveries are mapped to products via their buy order line."""
     bol_to_product = {}
     for row in (bo_data or []):
         bol_to_product[int(row["bol_id"])] = int(row["webshop_product_id"])
 
-    delivery_map = {}
+    entries = []
     for row in (delivery_data or []):
         p_id = bol_to_product.get(int(row["buy_order_line_id"]))
         if p_id is None:
             continue
-        d = row["occurred"]
-        date_str = d.strftime("%Y-%m-%d") if hasattr(d, "strftime") else str(d)[:10]
-        p_del = delivery_map.setdefault(p_id, {})
-        p_del[date_str] = p_del.get(date_str, 0) + int(row["quantity"])
-    return delivery_map
+        entries.append((p_id, row["occurred"], row["quantity"]))
+    return DailyMatrix(entries, start_date, days)
 
 
 def deduplicate_products(products):
@@ -50,51 +99,163 @@ def deduplicate_products(products):
     return list(seen.values())
 
 
+# Canonical archetype rules — mirrors ARCHETYPE_RULES in python-approach/src/scenarios.py (keep in sync).
+# (archetype, keywords that must all appear, keywords of which at least one must appear); first match wins.
+ARCHETYPE_RULES = (
+    ("stockout_prone", ("Stockout Prone",), ()),
+    ("seasonal_summer", ("Seasonal", "Summer"), ()),
+    ("seasonal_winter", ("Seasonal",), ("Winter", "Holiday")),
+    ("trend_down", ("Negative Trend",), ()),
+    ("trend_up", ("Trend",), ()),
+    ("step_up", ("Step Change", "Up"), ()),
+    ("step_down", ("Step Change", "Down"), ()),
+    ("new_launch", ("New Launch",), ()),
+    ("obsolete", (), ("Obsolete", "Dead")),
+    ("lumpy", (), ("Lumpy", "Sporadic")),
+    ("outlier", (), ("Outlier", "Influencer")),
+    ("container_filler", ("Container Filler",), ()),
+    ("micro_seasonal", ("Micro-Seasonality",), ()),
+)
+
+
 def parse_archetype(name):
     if not name or "(" not in name or ")" not in name:
         return "stable"
     t = name[name.index("(") + 1 : name.rindex(")")].strip()
-    if "Stockout Prone" in t:
-        return "stockout_prone"
-    if "Seasonal" in t and "Summer" in t:
-        return "seasonal_summer"
-    if "Seasonal" in t and ("Winter" in t or "Holiday" in t):
-        return "seasonal_winter"
-    if "Negative Trend" in t:
-        return "trend_down"
-    if "Positive Trend" in t:
-        return "trend_up"
-    if "Step Change" in t and "Up" in t:
-        return "step_up"
-    if "Step Change" in t and "Down" in t:
-        return "step_down"
-    if "New Launch" in t:
-        return "new_launch"
-    if "Obsolete" in t or "Dead" in t:
-        return "obsolete"
-    if "Lumpy" in t or "Sporadic" in t:
-        return "lumpy"
-    if "Outlier" in t or "Influencer" in t:
-        return "outlier"
-    if "Container Filler" in t:
-        return "container_filler"
-    if "Micro-Seasonality" in t:
-        return "micro_seasonal"
+    for archetype, all_of, any_of in ARCHETYPE_RULES:
+        if all(k in t for k in all_of) and (not any_of or any(k in t for k in any_of)):
+            return archetype
     return "stable"
 
 
-def simulate_one_product(product_row, sales_map, del_map, today):
+SEASONAL_ROP_WINDOWS = {
+    "seasonal_summer": ((5, 16), (7, 15)),
+    "seasonal_winter": ((10, 16), (12, 15)),
+}
+MICRO_SEASONAL_MONTHS = (2, 3, 8, 9)
+
+
+class SimulationCalendar:
+    """Dates of the simulation horizon, built once per run and indexed by day by every product.
+    Mirrors python-approach/src/horizon.py (keep in sync)."""
+
+    def __init__(self, start_date, days):
+        self.start_date = start_date
+        self.days = days
+        dates = [start_date + timedelta(days=d) for d in range(days)]
+        self.sql_dates = [d.strftime("%Y-%m-%d") for d in dates]
+        self.sql_timestamps = [s + " 00:00:02" for s in self.sql_dates]
+        self.month = [d.month for d in dates]
+        self.day_of_month = [d.day for d in dates]
+
+    def timestamp_at(self, day):
+        """SQL timestamp for any day index; days past the horizon (deliveries) are computed."""
+        if 0 <= day < self.days:
+            return self.sql_timestamps[day]
+        return (self.start_date + timedelta(days=day)).strftime("%Y-%m-%d") + " 00:00:02"
+
+    def month_mask(self, months):
+        return [m in months for m in self.month]
+
+    def season_mask(self, archetype):
+        """True on the days inside the archetype's seasonal ROP window (all False for other archetypes)."""
+        if archetype == "micro_seasonal":
+            return self.month_mask(MICRO_SEASONAL_MONTHS)
+        window = SEASONAL_ROP_WINDOWS.get(archetype)
+        if window is None:
+            return [False] * self.days
+        (start_m, start_d), (end_m, end_d) = window
+        lo, hi = start_m * 100 + start_d, end_m * 100 + end_d
+        return [lo <= m * 100 + d <= hi for m, d in zip(self.month, self.day_of_month)]
+
+
+class InboundQueue:
+    """Pending deliveries: min-heap keyed by arrival day + running in-transit total.
+    Mirrors python-approach/src/inbound.py (keep in sync)."""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = 0  # tie-breaker: same-day arrivals come out in order placed
+        self.in_transit = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, arrival_day, qty, payload=None):
+        heapq.heappush(self._heap, (arrival_day, self._seq, qty, payload))
+        self._seq += 1
+        self.in_transit += qty
+
+    def pop_arrived(self, day):
+        """Remove and return (arrival_day, qty, payload) for every delivery with arrival_day <= day."""
+        arrived = []
+        heap = self._heap
+        while heap and heap[0][0] <= day:
+            arrival_day, _, qty, payload = heapq.heappop(heap)
+            self.in_transit -= qty
+            arrived.append((arrival_day, qty, payload))
+        return arrived
+
+    def receive(self, day):
+        """Remove every delivery due by `day` and return the total quantity received."""
+        heap = self._heap
+        received = 0
+        while heap and heap[0][0] <= day:
+            received += heapq.heappop(heap)[2]
+        self.in_transit -= received
+        return received
+
+
+def build_rop_schedule(archetype, lead_time, avg_daily, calendar):
+    """ROP for each day index, compiled once per product so the day loop only indexes a list.
+    Seasonal boosts here cover whole months (not the SEASONAL_ROP_WINDOWS used by simulate_stocks.py)."""
+    ltd = lead_time * avg_daily
+    schedule = []
+    for day in range(calendar.days):
+        m = calendar.month[day]
+        if archetype == "stockout_prone":
+            rop = int(ltd * 0.6)
+        elif archetype == "obsolete":
+            rop = -9999 if day > 305 else 0
+        elif archetype == "container_filler":
+            rop = int(ltd * 3.0)
+        elif archetype in ("seasonal_summer",) and m in (5, 6, 7):
+            rop = int(ltd * 2.5)
+        elif archetype in ("seasonal_winter",) and m in (10, 11, 12):
+            rop = int(ltd * 2.5)
+        elif archetype == "micro_seasonal" and m in (2, 3, 8, 9):
+            rop = int(ltd * 2.0)
+        elif archetype in ("step_up", "trend_up"):
+            rop = int(ltd * (1.8 if day < 180 else 2.5))
+        elif archetype in ("step_down", "trend_down"):
+            rop = int(ltd * (1.5 if day < 180 else 0.8))
+        else:
+            rop = int(ltd * 1.5)
+        schedule.append(rop)
+    return schedule
+
+
+def product_rng(seed, webshop_uuid, product_id):
+    """Independent random stream per (seed, shop, product); stdlib counterpart of python-approach/src/rng.py."""
+    return random.Random(f"{seed}:{webshop_uuid}:{product_id}")
+
+
+def simulate_one_product(product_row, sales, deliveries, calendar, seed=SIMULATION_SEED):
     p_id = int(product_row["product_id"])
     product_uuid = str(product_row["product_uuid"])
     webshop_uuid = str(product_row["webshop_uuid"])
+    webshop_id = webshop_id_of(product_row)
+    rng = product_rng(seed, webshop_uuid, p_id)
     lead_time = int(product_row["lead_time"] or 14)
     reorder_period = int(product_row["reorder_period"] or 30)
     starting_stock = int(product_row["starting_stock"] or 0)
     archetype = parse_archetype(product_row.get("product_name") or "")
 
-    start_date = today - timedelta(days=365)
-    total_sold = sum(sales_map.values())
-    avg_daily = max(1, total_sold // max(len(sales_map), 1))
+    sql_timestamps = calendar.sql_timestamps
+    daily_units = sales.window(p_id, calendar.start_date, calendar.days)
+    daily_deliveries = deliveries.window(p_id, calendar.start_date, calendar.days)
+    total_sold = sales.total(p_id)
+    avg_daily = max(1, total_sold // max(sales.active_days(p_id), 1))
     reorder_qty = max(1, int(avg_daily * reorder_period))
 
     # Starting stock
@@ -110,13 +271,12 @@ def simulate_one_product(product_row, sales_map, del_map, today):
     # Find launch day for new_launch
     launch_day = 0
     if archetype == "new_launch":
-        for d in range(366):
-            ds = (start_date + timedelta(days=d)).strftime("%Y-%m-%d")
-            if sales_map.get(ds, 0) > 0:
+        for d, units in enumerate(daily_units):
+            if units > 0:
                 launch_day = d
                 break
 
-    pending = []  # list of [delivery_day, qty]
+    pending = InboundQueue()  # in-sim orders keyed by delivery day
     stock_rows = []
     stockout_count = 0
     in_stockout = False
@@ -128,94 +288,73 @@ def simulate_one_product(product_row, sales_map, del_map, today):
     # Pick a day in the last 3 months to force stock to 0 (so the stock graph shows a clear dip)
     force_stockout_day = 300 if archetype == "stockout_prone" else -1  # ~1 month before "today"
 
-    for day in range(366):
-        curr_date = start_date + timedelta(days=day)
-        date_str = curr_date.strftime("%Y-%m-%d")
-        m = curr_date.month
+    # Compiled once per product: the day loop below only reads numbers / booleans
+    rop_schedule = build_rop_schedule(archetype, lead_time, avg_daily, calendar)
+    rop_boost_qty = int(7 * avg_daily)
+    is_new_launch = archetype == "new_launch"
+    is_stockout_prone = archetype == "stockout_prone"
+    apply_noise = archetype not in ("obsolete", "new_launch")
+    boost_eligible = archetype not in ("stockout_prone", "obsolete", "lumpy")
 
+    for day in range(calendar.days):
         # New launch: zero before launch day
-        if archetype == "new_launch" and day < launch_day:
+        if is_new_launch and day < launch_day:
             stock_rows.append({
                 "product_id": p_id,
                 "product_uuid": product_uuid,
-                "webshop_id": 1380,
+                "webshop_id": webshop_id,
                 "webshop_uuid": webshop_uuid,
                 "on_hand": 0,
-                "date": date_str + " 00:00:02",
+                "date": sql_timestamps[day],
             })
             continue
 
-        if archetype == "new_launch" and day == launch_day:
+        if is_new_launch and day == launch_day:
             sim_stock = max(starting_stock, int(avg_daily * reorder_period * 2))
 
         # (a) Actual deliveries from DB
-        actual = del_map.get(date_str, 0)
+        actual = daily_deliveries[day]
         sim_stock += actual
 
         # (b) Simulated pending deliveries (orders we placed in-sim that arrive today)
-        new_pending = []
-        for entry in pending:
-            if entry[0] <= day:
-                sim_stock += entry[1]
-            else:
-                new_pending.append(entry)
-        pending = new_pending
+        sim_stock += pending.receive(day)
 
         # (c) Sales
-        units_sold = sales_map.get(date_str, 0)
+        units_sold = daily_units[day]
         sold = min(units_sold, sim_stock)
         sim_stock -= sold
 
         # (d) Small noise
-        if archetype not in ("obsolete", "new_launch") and sim_stock > 2:
-            sim_stock = max(0, sim_stock + random.randint(-1, 1))
+        if apply_noise and sim_stock > 2:
+            sim_stock = max(0, sim_stock + rng.randint(-1, 1))
 
         # (e) Stockout tracking
         if sim_stock == 0 and sold < units_sold:
             if day >= LAST_3M_START:
                 had_stockout_in_last_3m = True
-            if not in_stockout and random.random() < 0.70:
+            if not in_stockout and rng.random() < 0.70:
                 stockout_count += 1
                 in_stockout = True
-            if archetype not in ("stockout_prone", "obsolete", "lumpy") and stockout_count >= 2 and not rop_boost:
+            if boost_eligible and stockout_count >= 2 and not rop_boost:
                 rop_boost = True
         else:
             in_stockout = False
 
         # (f) ROP
-        if archetype == "stockout_prone":
-            rop = int(lead_time * avg_daily * 0.6)
-        elif archetype == "obsolete":
-            rop = -9999 if day > 305 else 0
-        elif archetype == "container_filler":
-            rop = int(lead_time * avg_daily * 3.0)
-        elif archetype in ("seasonal_summer",) and m in (5, 6, 7):
-            rop = int(lead_time * avg_daily * 2.5)
-        elif archetype in ("seasonal_winter",) and m in (10, 11, 12):
-            rop = int(lead_time * avg_daily * 2.5)
-        elif archetype == "micro_seasonal" and m in (2, 3, 8, 9):
-            rop = int(lead_time * avg_daily * 2.0)
-        elif archetype in ("step_up", "trend_up"):
-            rop = int(lead_time * avg_daily * (1.8 if day < 180 else 2.5))
-        elif archetype in ("step_down", "trend_down"):
-            rop = int(lead_time * avg_daily * (1.5 if day < 180 else 0.8))
-        else:
-            rop = int(lead_time * avg_daily * 1.5)
-
+        rop = rop_schedule[day]
         if rop_boost:
-            rop += int(7 * avg_daily)
+            rop += rop_boost_qty
 
         # (g) Reorder if needed
         # Stockout Prone: in last 3 months, skip reorders until we've had at least one stockout (so we guarantee one)
         skip_reorder = (
-            archetype == "stockout_prone"
+            is_stockout_prone
             and day >= LAST_3M_START
             and not had_stockout_in_last_3m
         )
-        incoming = sum(e[1] for e in pending)
-        if not skip_reorder and (sim_stock + incoming) < rop and (day - last_reorder) >= reorder_period:
-            actual_lead = max(1, lead_time + random.randint(-2, 3))
-            pending.append([day + actual_lead, reorder_qty])
+        if not skip_reorder and (sim_stock + pending.in_transit) < rop and (day - last_reorder) >= reorder_period:
+            actual_lead = max(1, lead_time + rng.randint(-2, 3))
+            pending.push(day + actual_lead, reorder_qty)
             last_reorder = day
 
         # Stockout Prone: force one day in the last 3 months to 0 so the stock graph clearly shows a stockout
@@ -226,10 +365,10 @@ def simulate_one_product(product_row, sales_map, del_map, today):
         stock_rows.append({
             "product_id": p_id,
             "product_uuid": product_uuid,
-            "webshop_id": 1380,
+            "webshop_id": webshop_id,
             "webshop_uuid": webshop_uuid,
             "on_hand": int(sim_stock),
-            "date": date_str + " 00:00:02",
+            "date": sql_timestamps[day],
         })
 
     return stock_rows
@@ -251,19 +390,14 @@ if not isinstance(delivery_data, list):
     delivery_data = []
 
 products = deduplicate_products(products)
-sales_map = build_sales_map(daily_sales)
-delivery_map = build_delivery_map(bo_data, delivery_data)
 today = datetime.utcnow().date()
+calendar = SimulationCalendar(today - timedelta(days=365), 366)
+sales = load_sales_matrix(daily_sales, calendar.start_date, calendar.days)
+deliveries = build_delivery_matrix(bo_data, delivery_data, calendar.start_date, calendar.days)
 
 all_stocks = []
 for product_row in products:
-    p_id = int(product_row["product_id"])
-    rows = simulate_one_product(
-        product_row,
-        sales_map.get(p_id, {}),
-        delivery_map.get(p_id, {}),
-        today,
-    )
+    rows = simulate_one_product(product_row, sales, deliveries, calendar)
     all_stocks.extend(rows)
 
 return {"stocks": all_stocks, "product_count": len(products), "stock_rows": len(all_stocks)}